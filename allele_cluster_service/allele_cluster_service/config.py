@@ -5,7 +5,20 @@ from os import getenv
 # Redis variables
 REDIS_HOST = getenv("REDIS_HOST", "redis")
 REDIS_PORT = getenv("REDIS_PORT", "6379")
-REDIS_QUEUE = "allele_cluster"
+# Queues the worker listen to, in order of priority. Workers on hosts with
+# limited resources should only listen to the "allele_cluster" queues.
+REDIS_QUEUES = getenv(
+    "REDIS_QUEUES",
+    "allele_cluster,allele_cluster_large,allele_cluster_low,allele_cluster_large_low",
+).split(",")
+# Number of worker processes started by the service
+WORKER_CONCURRENCY = int(getenv("WORKER_CONCURRENCY", "1"))
+
+# Storage of job results, must match the configuration of the API
+RESULT_DIR = getenv("RESULT_DIR")
+RESULT_COMPRESS_THRESHOLD = int(getenv("RESULT_COMPRESS_THRESHOLD", 64 * 1024))
+RESULT_SPILL_THRESHOLD = int(getenv("RESULT_SPILL_THRESHOLD", 1024 * 1024))
+RESULT_SPILL_TTL = int(getenv("RESULT_SPILL_TTL", 24 * 60 * 60))
 
 # Logging configuration
 DICT_CONFIG = {
@@ -3,12 +3,15 @@
 # pylint: skip-file
 import argparse
 import gzip
+import heapq
 import logging
 import os
 import platform
 import re
 import sys
 import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields, replace
 from enum import Enum
 from glob import glob
 from importlib.resources import files
@@ -20,6 +23,8 @@ import numpy as np
 import psutil
 from ete3 import Tree
 from numba import jit
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree
 
 LOG = logging.getLogger(__name__)
 BIN_DIR = files("allele_cluster_service.bin")
@@ -33,6 +38,7 @@ class ClusterMethod(str, Enum):
     NEIGHBOR_JOINING = "NJ"
     RAPID_NJ = "RapidNJ"
     NINJA = "ninja"
+    MSTREE_APPROX = "MSTreeApprox"
 
 
 params = dict(
@@ -44,6 +50,11 @@ params = dict(
     wgMLST=False,
     n_proc=5,
     checkEnv=False,
+    # approximate minimum spanning tree, see approximate_minimum_spanning_tree
+    approx_rounds=16,
+    approx_loci=32,
+    approx_window=8,
+    approx_seed=0,
     NJ_Windows=BIN_DIR.joinpath("fastme.exe"),
     NJ_Darwin=BIN_DIR.joinpath("fastme-2.1.5-osx"),
     NJ_Linux=BIN_DIR.joinpath("fastme-2.1.5-linux64"),
@@ -91,6 +102,281 @@ def contemporary(a, b, c, n_loci):
     return p1 >= p2
 
 
+@jit(nopython=True)
+def _lexless(w1, d1, n1, w2, d2, n2):
+    """Compare two (weight, distance, node) tuples."""
+    if w1 != w2:
+        return w1 < w2
+    if d1 != d2:
+        return d1 < d2
+    return n1 < n2
+
+
+@jit(nopython=True)
+def _find(parent, node):
+    """Find the group of a node with path halving."""
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+
+@jit(nopython=True)
+def _group_members(root, size, head, next_member):
+    """Get the members of a group."""
+    members = np.empty(size[root], dtype=np.int64)
+    node = head[root]
+    for idx in range(members.size):
+        members[idx] = node
+        node = next_member[node]
+    return members
+
+
+@jit(nopython=True)
+def _lowest_three(ws, ds, nodes):
+    """Get the index of the three lowest (weight, distance, node) tuples in order."""
+    best = np.full(3, -1, dtype=np.int64)
+    n_best = 0
+    for idx in range(nodes.size):
+        pos = n_best
+        while pos > 0 and _lexless(
+            ws[idx],
+            ds[idx],
+            nodes[idx],
+            ws[best[pos - 1]],
+            ds[best[pos - 1]],
+            nodes[best[pos - 1]],
+        ):
+            pos -= 1
+        if pos < 3:
+            for jdx in range(min(n_best, 2), pos, -1):
+                best[jdx] = best[jdx - 1]
+            best[pos] = idx
+            n_best = min(n_best + 1, 3)
+    return best[:n_best]
+
+
+@jit(nopython=True)
+def _candidate_children(
+    node, other, is_source, dist, weights, tried, stamp, adj_head, adj_next, adj_to
+):
+    """Get children of node that are closer than twice the branch, in sorted order."""
+    cutoff = 2 * (dist[node, other] if is_source else dist[other, node])
+    n_child = 0
+    edge = adj_head[node]
+    while edge >= 0:
+        n_child += 1
+        edge = adj_next[edge]
+    nodes = np.empty(n_child, dtype=np.int64)
+    ds = np.empty(n_child, dtype=dist.dtype)
+    n_cand = 0
+    edge = adj_head[node]
+    while edge >= 0:
+        child = adj_to[edge]
+        d = dist[child, other] if is_source else dist[other, child]
+        if tried[child] != stamp and d < cutoff:
+            nodes[n_cand] = child
+            ds[n_cand] = d
+            n_cand += 1
+        edge = adj_next[edge]
+    nodes, ds = nodes[:n_cand], ds[:n_cand]
+    # order on (weight, distance, node)
+    order = np.argsort(nodes)
+    order = order[np.argsort(ds[order], kind="mergesort")]
+    order = order[np.argsort(weights[nodes[order]], kind="mergesort")]
+    return nodes[order], ds[order]
+
+
+@jit(nopython=True)
+def _recraft_branch(
+    src,
+    tgt,
+    dist,
+    weights,
+    n_loci,
+    near,
+    tried,
+    stamp,
+    parent,
+    size,
+    head,
+    next_member,
+    adj_head,
+    adj_next,
+    adj_to,
+):
+    """Move the ends of a branch to the most likely ancestors within their groups."""
+    a = np.empty(2, dtype=dist.dtype)
+    targets_root = _find(parent, tgt)
+    sources_root = _find(parent, src)
+    if size[sources_root] > 1:
+        sources = _group_members(sources_root, size, head, next_member)
+        ws, ds = weights[sources], np.empty(sources.size, dtype=dist.dtype)
+        for idx in range(sources.size):
+            ds[idx] = dist[sources[idx], tgt]
+        for idx in _lowest_three(ws, ds, sources):
+            s, d = sources[idx], ds[idx]
+            if s == src:
+                break
+            if d < near * dist[src, tgt]:
+                a[0], a[1] = dist[s, src], dist[src, s]
+                if contemporary(a, d, dist[src, tgt], n_loci):
+                    tried[src], src = stamp, s
+                    break
+        while tried[src] != stamp:
+            tried[src] = stamp
+            nodes, ds = _candidate_children(
+                src, tgt, True, dist, weights, tried, stamp, adj_head, adj_next, adj_to
+            )
+            for idx in range(nodes.size):
+                s, d, w = nodes[idx], ds[idx], weights[nodes[idx]]
+                if d < dist[src, tgt]:
+                    a[0], a[1] = dist[src, s], dist[s, src]
+                    if not contemporary(a, dist[src, tgt], d, n_loci):
+                        tried[src], src = stamp, s
+                        break
+                elif w < weights[src]:
+                    a[0], a[1] = dist[s, src], dist[src, s]
+                    if contemporary(a, d, dist[src, tgt], n_loci):
+                        tried[src], src = stamp, s
+                        break
+                tried[s] = stamp
+    if size[targets_root] > 1:
+        targets = _group_members(targets_root, size, head, next_member)
+        ws, ds = weights[targets], np.empty(targets.size, dtype=dist.dtype)
+        for idx in range(targets.size):
+            ds[idx] = dist[src, targets[idx]]
+        # NOTE: the last inspected candidate, t, is used when moving the target in
+        # the loop below. This is the behaviour of the GrapeTree implementation and
+        # it is kept to produce the same trees.
+        t = tgt
+        for idx in _lowest_three(ws, ds, targets):
+            t, d = targets[idx], ds[idx]
+            if t == tgt:
+                break
+            if d < near * dist[src, tgt]:
+                a[0], a[1] = dist[t, tgt], dist[tgt, t]
+                if contemporary(a, d, dist[src, tgt], n_loci):
+                    tried[tgt], tgt = stamp, t
+                    break
+        while tried[tgt] != stamp:
+            tried[tgt] = stamp
+            nodes, ds = _candidate_children(
+                tgt, src, False, dist, weights, tried, stamp, adj_head, adj_next, adj_to
+            )
+            for idx in range(nodes.size):
+                d, w = ds[idx], weights[nodes[idx]]
+                if d < dist[src, tgt]:
+                    a[0], a[1] = dist[tgt, t], dist[t, tgt]
+                    if not contemporary(a, dist[src, tgt], d, n_loci):
+                        tried[tgt], tgt = stamp, t
+                        break
+                elif w < weights[tgt]:
+                    a[0], a[1] = dist[t, tgt], dist[tgt, t]
+                    if contemporary(a, d, dist[src, tgt], n_loci):
+                        tried[tgt], tgt = stamp, t
+                        break
+                tried[t] = stamp
+    return src, tgt
+
+
+@jit(nopython=True)
+def _recraft_branches(sources, targets, lengths, dist, weights, n_loci, near):
+    """Recraft branches in order of length and join their groups.
+
+    Branches are processed in the given order until the length of a recrafted
+    branch exceeds the next one. The remaining branches are then kept in a heap
+    ordered on length, recrafted branches are placed before branches of equal
+    length.
+    """
+    n_node, n_branch = dist.shape[0], sources.size
+    # union-find with a linked list of the members of each group
+    parent, size = np.arange(n_node), np.ones(n_node, dtype=np.int64)
+    head, tail = np.arange(n_node), np.arange(n_node)
+    next_member = np.full(n_node, -1, dtype=np.int64)
+    # adjacency list of the joined branches
+    adj_head = np.full(n_node, -1, dtype=np.int64)
+    adj_next = np.empty(2 * n_branch, dtype=np.int64)
+    adj_to = np.empty(2 * n_branch, dtype=np.int64)
+    tried = np.full(n_node, -1, dtype=np.int64)
+    out_src = np.empty(n_branch, dtype=np.int64)
+    out_tgt = np.empty(n_branch, dtype=np.int64)
+
+    n_done, n_readded, n_recrafted, idx = 0, 0, 0, 0
+    heap = [(0.0, 0, 0, 0)]
+    heap.pop()
+    while n_done < n_branch:
+        if idx < n_branch:
+            src, tgt = sources[idx], targets[idx]
+        else:
+            _, _, src, tgt = heapq.heappop(heap)
+        src, tgt = _recraft_branch(
+            src,
+            tgt,
+            dist,
+            weights,
+            n_loci,
+            near,
+            tried,
+            n_recrafted,
+            parent,
+            size,
+            head,
+            next_member,
+            adj_head,
+            adj_next,
+            adj_to,
+        )
+        n_recrafted += 1
+        brlen = dist[src, tgt]
+        if idx < n_branch:
+            is_shortest = idx >= n_branch - 1 or lengths[idx + 1] >= brlen
+        else:
+            is_shortest = len(heap) == 0 or heap[0][0] >= brlen
+        if is_shortest:
+            # join the groups of source and target
+            root, other = _find(parent, src), _find(parent, tgt)
+            if size[root] < size[other]:
+                root, other = other, root
+            parent[other] = root
+            size[root] += size[other]
+            next_member[tail[root]] = head[other]
+            tail[root] = tail[other]
+            adj_to[2 * n_done], adj_next[2 * n_done] = tgt, adj_head[src]
+            adj_head[src] = 2 * n_done
+            adj_to[2 * n_done + 1], adj_next[2 * n_done + 1] = src, adj_head[tgt]
+            adj_head[tgt] = 2 * n_done + 1
+            out_src[n_done], out_tgt[n_done] = src, tgt
+            n_done += 1
+            if idx < n_branch:
+                idx += 1
+        else:
+            if idx < n_branch:
+                # stable sort of the remaining branches on their length
+                remaining = np.empty(n_branch - idx, dtype=np.float64)
+                remaining[0] = brlen
+                remaining[1:] = lengths[idx + 1 :]
+                order = np.argsort(remaining, kind="mergesort")
+                for rank in range(order.size):
+                    pos = order[rank]
+                    if pos == 0:
+                        heap.append((remaining[0], rank, src, tgt))
+                    else:
+                        heap.append(
+                            (
+                                remaining[pos],
+                                rank,
+                                sources[idx + pos],
+                                targets[idx + pos],
+                            )
+                        )
+                idx = n_branch
+            else:
+                n_readded += 1
+                heapq.heappush(heap, (np.float64(brlen), -n_readded, src, tgt))
+    return out_src, out_tgt
+
+
 def add_args():
     parser = argparse.ArgumentParser(
         description='For details, see "https://github.com/achtman-lab/GrapeTree/blob/master/README.md".\nIn brief, GrapeTree generates a NEWICK tree to the default output (screen) \nor a redirect output, e.g., a file. ',
@@ -107,7 +393,7 @@ def add_args():
         "--method",
         "-m",
         dest="tree",
-        help='"MSTreeV2" [DEFAULT]\n"MSTree"\n"NJ": FastME V2 NJ tree\n"RapidNJ": RapidNJ for very large datasets\n"ninja": Alternative NJ algorithm for very large datasets\n"distance": allelic distance matrix in PHYLIP format.',
+        help='"MSTreeV2" [DEFAULT]\n"MSTree"\n"NJ": FastME V2 NJ tree\n"RapidNJ": RapidNJ for very large datasets\n"ninja": Alternative NJ algorithm for very large datasets\n"MSTreeApprox": Approximate minimum spanning tree for very large datasets\n"distance": allelic distance matrix in PHYLIP format.',
         default="MSTreeV2",
     )
     parser.add_argument(
@@ -201,19 +487,26 @@ def add_args():
 def parallel_distance(callup):
     func, prof_file, sub_prefix, handle_missing, index_range = callup
     profiles = np.load(prof_file)
-    res = eval("distance_matrix." + func)(profiles, handle_missing, index_range)
+    res = getattr(distance_matrix, func)(profiles, handle_missing, index_range)
     subfile = sub_prefix.format(index_range[0])
     np.save(subfile, res)
     return subfile
 
 
+def _start_linkage(params):
+    """Report that the linkage of the profiles has started."""
+    if params.get("progress") is not None:
+        params["progress"].start("linkage")
+
+
 class distance_matrix(object):
     @staticmethod
-    def get_distance(func, profiles, handle_missing):
+    def get_distance(func, profiles, handle_missing, **params):
         from multiprocessing import Pool
 
         n_profile, n_allele = profiles.shape
         n_proc = min(int(params["n_proc"]), profiles.shape[0])
+        progress = params.get("progress")
         np.save(params["prof_file"], profiles)
         if n_proc > 1:
             pool = Pool(n_proc)
@@ -225,7 +518,8 @@ class distance_matrix(object):
                 dtype=int,
             )
             del profiles
-            subfiles = pool.map(
+            subfiles = []
+            for subfile in pool.imap(
                 parallel_distance,
                 [
                     [
@@ -237,7 +531,10 @@ class distance_matrix(object):
                     ]
                     for idx in indices
                 ],
-            )
+            ):
+                subfiles.append(subfile)
+                if progress is not None:
+                    progress.update(len(subfiles) / n_proc)
             pool.close()
             del pool
 
@@ -443,6 +740,128 @@ class distance_matrix(object):
         return weights
 
 
+@jit(nopython=True)
+def _pair_distances(profiles, presences, sources, targets, scaled):
+    """Allelic distance between pairs of profiles.
+
+    Only loci present in both profiles are compared. If scaled, the distance is
+    scaled to the number of loci in the same way as the symmetric pair_delete
+    distance.
+    """
+    n_loci = profiles.shape[1]
+    dist = np.empty(sources.size, dtype=np.float64)
+    for idx in range(sources.size):
+        s, t = sources[idx], targets[idx]
+        n_diff, n_comparable = 0, 0
+        for j in range(n_loci):
+            if presences[s, j] and presences[t, j]:
+                n_comparable += 1
+                if profiles[s, j] != profiles[t, j]:
+                    n_diff += 1
+        if scaled:
+            dist[idx] = (n_diff + 0.01) * n_loci / (n_comparable + 0.01)
+        else:
+            dist[idx] = n_diff
+    return dist
+
+
+def _sorted_window_candidates(profiles, n_rounds, n_loci, window, rng):
+    """Find pairs of similar profiles by sorting them on random subsets of loci.
+
+    In each round the profiles are sorted on a random subset of loci, in random
+    order, and each profile is paired with the next window profiles in the
+    sorted order. Missing alleles are given the most common allele of the locus
+    in the sort key, so a missing call does not separate a profile from its
+    relatives. Consecutive profiles are always paired, so the graph of the
+    candidate pairs is connected.
+    """
+    n_node = profiles.shape[0]
+    pairs = [np.empty(0, dtype=np.int64)]
+    for _ in range(n_rounds):
+        loci = rng.choice(profiles.shape[1], min(n_loci, profiles.shape[1]), False)
+        keys = profiles[:, loci]
+        for col in range(keys.shape[1]):
+            missing = keys[:, col] == 0
+            if missing.all() or not missing.any():
+                continue
+            alleles, counts = np.unique(keys[~missing, col], return_counts=True)
+            keys[missing, col] = alleles[np.argmax(counts)]
+        # the first locus is the primary sort key and ties are broken at random
+        order = np.lexsort([rng.random(n_node), *keys.T[::-1]])
+        for offset in range(1, min(window, n_node - 1) + 1):
+            src, tgt = order[:-offset], order[offset:]
+            pairs.append(np.minimum(src, tgt) * n_node + np.maximum(src, tgt))
+    pairs = np.unique(np.concatenate(pairs))
+    return pairs // n_node, pairs % n_node
+
+
+def _spanning_forest(sources, targets, dist, n_node):
+    """Get the minimum spanning forest of a sparse graph."""
+    # scipy treats edges with weight 0 as missing
+    graph = coo_matrix((dist + 1.0, (sources, targets)), shape=(n_node, n_node))
+    forest = minimum_spanning_tree(graph.tocsr()).tocoo()
+    return forest.row.astype(np.int64), forest.col.astype(np.int64)
+
+
+def approximate_minimum_spanning_tree(
+    profiles,
+    handle_missing="pair_delete",
+    n_rounds=16,
+    n_loci=32,
+    window=8,
+    seed=0,
+    progress=None,
+):
+    """Approximate minimum spanning tree of allele profiles without a distance matrix.
+
+    Candidate neighbours are found by sorting the profiles on random subsets of
+    loci, see _sorted_window_candidates, and the tree is the minimum spanning
+    tree of the graph of candidate pairs. The candidate graph is connected, so
+    the tree spans all profiles, and the number of candidates, and therefore
+    the runtime and memory, grows linearly with the number of profiles.
+
+    :param profiles: encoded allele profiles, 0 is missing
+    :type profiles: np.ndarray
+    :param handle_missing: how to handle missing alleles
+    :type handle_missing: str
+    :param n_rounds: number of sorting rounds, at least one
+    :type n_rounds: int
+    :param n_loci: number of loci sorted on in each round
+    :type n_loci: int
+    :param window: number of following profiles each profile is paired with
+    :type window: int
+    :param seed: random seed
+    :type seed: int
+    :param progress: reports the start of the linkage, see JobProgress
+    :type progress: JobProgress | None
+    :return: branches as [source, target, distance]
+    :rtype: list
+    """
+    if n_rounds < 1 or window < 1:
+        raise ValueError("At least one round and a window of one is required")
+    n_node = profiles.shape[0]
+    if handle_missing in ("as_allele",):
+        presences = np.ones(shape=profiles.shape, dtype=np.bool_)
+    elif handle_missing in ("pair_delete", "absolute_distance"):
+        presences = profiles > 0
+    else:
+        presences = np.repeat(
+            [np.sum(profiles > 0, 0) >= n_node], n_node, axis=0
+        ).astype(np.bool_)
+    scaled = handle_missing == "pair_delete"
+    rng = np.random.default_rng(seed)
+
+    sources, targets = _sorted_window_candidates(
+        profiles, n_rounds, n_loci, window, rng
+    )
+    dist = _pair_distances(profiles, presences, sources, targets, scaled)
+    if progress is not None:
+        progress.start("linkage")
+    sources, targets = _spanning_forest(sources, targets, dist, n_node)
+    dist = _pair_distances(profiles, presences, sources, targets, scaled)
+    return [[s, t, d] for s, t, d in zip(sources.tolist(), targets.tolist(), dist)]
+
+
 class methods(object):
     @staticmethod
     def _blockwise(dist, weight, **params):
@@ -564,106 +983,30 @@ class methods(object):
     def _branch_recraft(branches, dist, weights, n_loci):
         if n_loci is None:
             n_loci = np.max(dist)
-
-        group_id, groups, childrens = (
-            {b: b for br in branches for b in br[:2]},
-            {b: [b] for br in branches for b in br[:2]},
-            {b: [] for br in branches for b in br[:2]},
+        if len(branches) == 0:
+            return []
+
+        sources = np.array([br[0] for br in branches], dtype=np.int64)
+        targets = np.array([br[1] for br in branches], dtype=np.int64)
+        lengths = np.array([br[2] for br in branches], dtype=np.float64)
+        # process the shortest branches, between the most central nodes, first
+        br_weights = np.sort(np.vstack([weights[sources], weights[targets]]), axis=0)
+        order = np.lexsort([br_weights[1], br_weights[0], dist[sources, targets]])
+        # use the same precision as numpy when comparing with 1.5 times a distance
+        near = type(dist.dtype.type(1) * 1.5)(1.5)
+        sources, targets = _recraft_branches(
+            sources[order],
+            targets[order],
+            lengths[order],
+            dist,
+            np.asarray(weights, dtype=np.float64),
+            n_loci,
+            near,
         )
-        branches = sorted(
-            branches,
-            key=lambda br: [dist[br[0], br[1]]]
-            + sorted([weights[br[0]], weights[br[1]]]),
-        )
-        i = 0
-        while i < len(branches):
-            src, tgt, brlen = branches[i]
-
-            sources, targets = groups[group_id[src]], groups[group_id[tgt]]
-            tried = {}
-            if len(sources) > 1:
-                for w, d, s in sorted(
-                    zip(weights[sources], dist[sources, tgt], sources)
-                )[:3]:
-                    if s == src:
-                        break
-                    if d < 1.5 * dist[src, tgt]:
-                        if contemporary(
-                            [dist[s, src], dist[src, s]], d, dist[src, tgt], n_loci
-                        ):
-                            tried[src], src = s, s
-                            break
-                while src not in tried:
-                    tried[src] = src
-                    mid_nodes = sorted(
-                        [
-                            [weights[s], dist[s, tgt], s]
-                            for s in childrens[src]
-                            if s not in tried and dist[s, tgt] < 2 * dist[src, tgt]
-                        ]
-                    )
-                    for w, d, s in mid_nodes:
-                        if d < dist[src, tgt]:
-                            if not contemporary(
-                                [dist[src, s], dist[s, src]], dist[src, tgt], d, n_loci
-                            ):
-                                tried[src], src = s, s
-                                break
-                        elif w < weights[src]:
-                            if contemporary(
-                                [dist[s, src], dist[src, s]], d, dist[src, tgt], n_loci
-                            ):
-                                tried[src], src = s, s
-                                break
-                        tried[s] = src
-            if len(targets) > 1:
-                for w, d, t in sorted(
-                    zip(weights[targets], dist[src, targets], targets)
-                )[:3]:
-                    if t == tgt:
-                        break
-                    if d < 1.5 * dist[src, tgt]:
-                        if contemporary(
-                            [dist[t, tgt], dist[tgt, t]], d, dist[src, tgt], n_loci
-                        ):
-                            tried[tgt], tgt = t, t
-                            break
-                while tgt not in tried:
-                    tried[tgt] = tgt
-                    mid_nodes = sorted(
-                        [
-                            [weights[t], dist[src, t], t]
-                            for t in childrens[tgt]
-                            if t not in tried and dist[src, t] < 2 * dist[src, tgt]
-                        ]
-                    )
-                    for w, d, s in mid_nodes:
-                        if d < dist[src, tgt]:
-                            if not contemporary(
-                                [dist[tgt, t], dist[t, tgt]], dist[src, tgt], d, n_loci
-                            ):
-                                tried[tgt], tgt = t, t
-                                break
-                        elif w < weights[tgt]:
-                            if contemporary(
-                                [dist[t, tgt], dist[tgt, t]], d, dist[src, tgt], n_loci
-                            ):
-                                tried[tgt], tgt = t, t
-                                break
-                        tried[t] = tgt
-            brlen = dist[src, tgt]
-            branches[i] = [src, tgt, brlen]
-            if i >= len(branches) - 1 or branches[i + 1][2] >= brlen:
-                tid = group_id[tgt]
-                for t in targets:
-                    group_id[t] = group_id[src]
-                groups[group_id[src]].extend(groups.pop(tid, []))
-                childrens[src].append(tgt)
-                childrens[tgt].append(src)
-                i += 1
-            else:
-                branches[i:] = sorted(branches[i:], key=lambda br: br[2])
-        return branches
+        return [
+            [src, tgt, dist[src, tgt]]
+            for src, tgt in zip(sources.tolist(), targets.tolist())
+        ]
 
     @staticmethod
     def _network2tree(branches, names):
@@ -720,12 +1063,15 @@ class methods(object):
         **params
     ):
         n_loci = profiles.shape[1]
-        dist = distance_matrix.get_distance(matrix_type, profiles, handle_missing)
-        weight = eval("distance_matrix." + heuristic)(
+        dist = distance_matrix.get_distance(
+            matrix_type, profiles, handle_missing, **params
+        )
+        _start_linkage(params)
+        weight = getattr(distance_matrix, heuristic)(
             dist, [len(embeded[n]) for n in names]
         )
 
-        tree = eval("methods._" + matrix_type)(dist, weight, **params)
+        tree = getattr(methods, "_" + matrix_type)(dist, weight, **params)
         del dist
         if branch_recraft:
             tree = methods._branch_recraft(
@@ -738,6 +1084,33 @@ class methods(object):
         tree = methods._network2tree(tree, names)
         return tree
 
+    @staticmethod
+    def MSTreeApprox(
+        names,
+        profiles,
+        embeded,
+        handle_missing="pair_delete",
+        approx_rounds=16,
+        approx_loci=32,
+        approx_window=8,
+        approx_seed=0,
+        **params
+    ):
+        tree = approximate_minimum_spanning_tree(
+            profiles,
+            handle_missing=handle_missing,
+            n_rounds=approx_rounds,
+            n_loci=approx_loci,
+            window=approx_window,
+            seed=approx_seed,
+            progress=params.get("progress"),
+        )
+        tree = distance_matrix.symmetric_link(
+            profiles, tree, handle_missing=handle_missing
+        )
+        tree = methods._network2tree(tree, names)
+        return tree
+
     @staticmethod
     def goeBurst(names, profiles, embeded, handle_missing="pair_delete", **params):
         goeburst = Popen([params["goeburst_Linux"]] + ["-t"], stdin=PIPE, stdout=PIPE)
@@ -780,7 +1153,9 @@ class methods(object):
             names.append(n)
             indices.append(i)
         indices = np.array(indices)
-        d = distance_matrix.get_distance(matrix_type, profiles, handle_missing)
+        d = distance_matrix.get_distance(
+            matrix_type, profiles, handle_missing, **params
+        )
         if handle_missing != "absolute_distance" and matrix_type != "blockwise":
             d /= profiles.shape[1]
 
@@ -796,7 +1171,10 @@ class methods(object):
 
     @staticmethod
     def fastme(names, profiles, embeded, handle_missing="pair_delete", **params):
-        dist = distance_matrix.get_distance("symmetric", profiles, handle_missing)
+        dist = distance_matrix.get_distance(
+            "symmetric", profiles, handle_missing, **params
+        )
+        _start_linkage(params)
 
         dist_file = params["tempfix"] + "dist.list"
         with open(dist_file, "w") as fout:
@@ -848,7 +1226,10 @@ class methods(object):
         if len(np.unique(profiles, axis=0)) < 4:
             raise ValueError("NJ cannot compute tree with less than 4 unique taxa.")
 
-        dist = distance_matrix.get_distance("symmetric", profiles, handle_missing)
+        dist = distance_matrix.get_distance(
+            "symmetric", profiles, handle_missing, **params
+        )
+        _start_linkage(params)
 
         dist_file = params["tempfix"] + "dist.list"
         with open(dist_file, "w") as fout:
@@ -894,7 +1275,10 @@ class methods(object):
 
     @staticmethod
     def RapidNJ(names, profiles, embeded, handle_missing="pair_delete", **params):
-        dist = distance_matrix.get_distance("symmetric", profiles, handle_missing)
+        dist = distance_matrix.get_distance(
+            "symmetric", profiles, handle_missing, **params
+        )
+        _start_linkage(params)
 
         dist_file = params["tempfix"] + "dist.list"
         with open(dist_file, "w") as fout:
@@ -936,7 +1320,10 @@ class methods(object):
 
     @staticmethod
     def ninja(names, profiles, embeded, handle_missing="pair_delete", **params):
-        dist = distance_matrix.get_distance("symmetric", profiles, handle_missing)
+        dist = distance_matrix.get_distance(
+            "symmetric", profiles, handle_missing, **params
+        )
+        _start_linkage(params)
         dist = dist / profiles.shape[1]
         dist_file = params["tempfix"] + "dist.list"
         with open(dist_file, "w") as fout:
@@ -999,91 +1386,139 @@ class methods(object):
         return tree
 
 
-def nonredundant(names, profiles):
-    encoded_profile = np.array(
-        [np.unique(p, return_inverse=True)[1] + 1 for p in profiles.T]
-    ).T
-    encoded_profile[(profiles == "0") | (profiles == "N") | (profiles == "-")] = 0
-    if params["handle_missing"] == "complete_delete":
-        encoded_profile = encoded_profile[:, np.sum(encoded_profile == 0, 0) > 0]
-    names = names[np.lexsort(encoded_profile.T)]
-    profiles = encoded_profile[np.lexsort(encoded_profile.T)]
-    presence = np.sum(profiles > 0, 1) > 0
-    names, profiles = names[presence], profiles[presence]
-
-    uniqueness = np.concatenate([[1], np.sum(np.diff(profiles, axis=0) != 0, 1) > 0])
-
-    embeded = {names[0]: []}
-    embeded_group = embeded[names[0]]
-    for n, u in zip(names, uniqueness):
-        if u == 0:
-            embeded_group.append(n)
-        else:
-            embeded[n] = [n]
-            embeded_group = embeded[n]
-    names = names[uniqueness > 0]
-    profiles = profiles[uniqueness > 0]
-    return names, profiles, embeded
+@jit(nopython=True)
+def _row_hashes(profiles):
+    """Hash the rows of an integer matrix to 64-bit values."""
+    n_row, n_col = profiles.shape
+    hashes = np.empty(n_row, dtype=np.uint64)
+    for i in range(n_row):
+        h = np.uint64(14695981039346656037)
+        for j in range(n_col):
+            # splitmix64 finalizer of each value, combined FNV-style
+            x = np.uint64(profiles[i, j]) + np.uint64(0x9E3779B97F4A7C15)
+            x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            x = x ^ (x >> np.uint64(31))
+            h = (h ^ x) * np.uint64(1099511628211)
+        hashes[i] = h
+    return hashes
 
 
-def backend(**args):
-    """
-    paramters :
-        profile: input file or the content of the file as a string. Can be either profile or fasta. Headings start with an '#' will be ignored.
-        method: MSTreeV2, MSTree or NJ
-        matrix_type: asymmetric or symmetric
-        heuristic: harmonic or eBurst
-        branch_recraft: T or F
+@jit(nopython=True)
+def _pack_strings(chars):
+    """Pack strings of up to 8 latin-1 characters into integers in sort order.
 
-    Outputs :
-        A string of a NEWICK tree
+    Return None if some string can't be packed.
+    """
+    n_row, n_col, width = chars.shape
+    codes = np.zeros((n_row, n_col), dtype=np.uint64)
+    for i in range(n_row):
+        for j in range(n_col):
+            code = np.uint64(0)
+            for k in range(width):
+                char = chars[i, j, k]
+                if char > 255 or (k >= 8 and char > 0):
+                    return None
+                if k < 8:
+                    code |= np.uint64(char) << np.uint64(8 * (7 - k))
+            codes[i, j] = code
+    return codes
+
+
+def _string_order_codes(profiles):
+    """Encode allele strings as integers that sort in the same order as the strings.
+
+    Returns the codes and a mask of missing alleles, "0", "N" and "-".
+    """
+    profiles = np.ascontiguousarray(profiles, dtype=str)
+    chars = profiles.view(np.uint32).reshape(*profiles.shape, -1)
+    codes = _pack_strings(chars)
+    if codes is None:
+        _, codes = np.unique(profiles, return_inverse=True)
+        codes = codes.reshape(profiles.shape)
+        missing = (profiles == "0") | (profiles == "N") | (profiles == "-")
+    else:
+        missing = np.isin(codes, [ord(c) << 56 for c in "0N-"])
+    return codes, missing
 
-    Examples :
-        To run MSTreeV2, use :
-        backend(profile=<filename>, method='MSTreeV2')
 
-        OR simply
-        backend(profile=<filename>)
+def _column_ranks(codes):
+    """Replace values with their rank among the unique values of the column, from 1."""
+    codes = np.ascontiguousarray(codes.T)
+    order = np.argsort(codes, axis=1)
+    sorted_codes = np.take_along_axis(codes, order, axis=1)
+    is_new = np.ones(codes.shape, dtype=np.int64)
+    is_new[:, 1:] = sorted_codes[:, 1:] != sorted_codes[:, :-1]
+    ranks = np.empty(codes.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, np.cumsum(is_new, axis=1), axis=1)
+    return ranks.T
 
-        To run a standard minimum spanning tree :
-        backend(profile=<filename>, method='MSTree')
 
-        To run a NJ tree (using FastME 2.0) :
-        backend(profile=<filename>, method='NJ')
+def nonredundant(names, profiles, handle_missing="pair_delete"):
+    """Collapse samples with identical profiles.
 
-        To run a RapidNJ tree :
-        backend(profile=<filename>, method='RapidNJ')
+    String alleles are encoded per locus by their sort order, with "0", "N" and "-"
+    as missing (0). Integer profiles are used as they are, with values below 1 as
+    missing.
 
-        To obtain a standard distance matrix :
-        backend(profile=<filename>, method='distance')
+    Returns the names and profiles of the unique profiles, sorted on the profile,
+    and the samples represented by each unique profile.
     """
-    global params
-    params.update(args)
-    if params["method"] == "MSTreeV2":
-        params["method"] = "MSTree"
-        params["matrix_type"] = "asymmetric"
-        params["heuristic"] = "harmonic"
-        params["branch_recraft"] = True
+    if np.issubdtype(profiles.dtype, np.integer):
+        encoded_profile = np.where(profiles > 0, profiles, 0).astype(np.int64)
+    else:
+        codes, missing = _string_order_codes(profiles)
+        encoded_profile = _column_ranks(codes)
+        encoded_profile[missing] = 0
+    if handle_missing == "complete_delete":
+        encoded_profile = encoded_profile[:, np.sum(encoded_profile == 0, 0) > 0]
+    presence = np.sum(encoded_profile > 0, 1) > 0
+    names, encoded_profile = names[presence], encoded_profile[presence]
 
-    if params["wgMLST"] and params["matrix_type"] == "asymmetric":
-        matrix_type = "asymmetric_wgMLST"
+    # group identical profiles on their hash and verify the groups
+    _, first, group = np.unique(
+        _row_hashes(encoded_profile), return_index=True, return_inverse=True
+    )
+    group = group.reshape(-1)
+    if not np.array_equal(encoded_profile, encoded_profile[first[group]]):
+        LOG.warning("Hash collision when collapsing identical profiles")
+        _, first, group = np.unique(
+            encoded_profile, axis=0, return_index=True, return_inverse=True
+        )
+        group = group.reshape(-1)
+    members = np.split(
+        names[np.argsort(group, kind="stable")], np.cumsum(np.bincount(group))[:-1]
+    )
+
+    order = np.lexsort(encoded_profile[first].T)
+    embeded = {names[first[g]]: list(members[g]) for g in order}
+    return names[first[order]], encoded_profile[first[order]], embeded
+
+
+def parse_profile(profile):
+    """Read allele profiles in tsv or fasta format.
 
+    :param profile: path to a file, or the content of the file, with profiles
+    :type profile: str
+    :return: sample names and profiles as arrays of strings
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
     names, profiles = [], []
     try:
-        if params["profile"][-3:].lower().endswith(".gz"):
+        if profile[-3:].lower().endswith(".gz"):
             fin = (
-                gzip.open(params["profile"], "rt").readlines()
-                if os.path.isfile(params["profile"])
-                else params["profile"].split("\n")
+                gzip.open(profile, "rt").readlines()
+                if os.path.isfile(profile)
+                else profile.split("\n")
             )
         else:
             fin = (
-                open(params["profile"]).readlines()
-                if os.path.isfile(params["profile"])
-                else params["profile"].split("\n")
+                open(profile).readlines()
+                if os.path.isfile(profile)
+                else profile.split("\n")
             )
     except:
-        fin = params["profile"].split("\n")
+        fin = profile.split("\n")
 
     allele_cols = None
     for line_id, line in enumerate(fin):
@@ -1137,16 +1572,221 @@ def backend(**args):
                 profiles.append(np.array(part)[allele_cols])
             else:
                 profiles.append(part[1:])
-    del fin, line, line_id, part, header
-    profiles = np.char.upper(np.array(profiles, dtype=str))
-    names = [re.sub(r"[\(\)\ \,\"\';]", "_", n) for n in names]
-    names, profiles, embeded = nonredundant(np.array(names), np.array(profiles))
-    if int(params.get("checkEnv", False)):
+    return np.array(names), np.array(profiles, dtype=str)
+
+
+@dataclass(frozen=True)
+class ClusterConfig:
+    """Options for clustering, see add_args for a description of each option."""
+
+    method: str = "MSTreeV2"
+    matrix_type: str = "symmetric"
+    heuristic: str = "eBurst"
+    handle_missing: str = "pair_delete"
+    branch_recraft: bool = False
+    wgMLST: bool = False
+    n_proc: int = 5
+    approx_rounds: int = 16
+    approx_loci: int = 32
+    approx_window: int = 8
+    approx_seed: int = 0
+    # directory where temporary files are written, defaults to the home directory
+    tmp_dir: str | None = None
+
+    @classmethod
+    def from_params(cls, **options):
+        """Create config from keyword options, unknown options are ignored."""
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: val for key, val in options.items() if key in names})
+
+    def method_params(self):
+        """Get the parameters that are passed to the clustering method."""
+        method_params = {**params, **asdict(self)}
+        if self.method == "MSTreeV2":
+            method_params.update(
+                method="MSTree",
+                matrix_type="asymmetric",
+                heuristic="harmonic",
+                branch_recraft=True,
+            )
+        return method_params
+
+
+def _run_cluster(config, names, profiles):
+    """Run a clustering job, used by executors of the ClusterEngine."""
+    return ClusterEngine(config).cluster(names, profiles)
+
+
+class ClusterEngine(object):
+    """Cluster allele profiles.
+
+    The engine does not modify any module level state and each job writes its
+    temporary files to a separate directory. Multiple jobs can therefore run
+    concurrently, either by calling cluster from several threads or by
+    submitting jobs to the executor of the engine.
+
+    Examples :
+        engine = ClusterEngine(ClusterConfig(method="MSTreeV2"))
+        newick = engine.cluster(names, profiles)
+
+        with ClusterEngine(max_workers=4) as engine:
+            jobs = [engine.submit(names, profiles, method=m) for m in ("MSTree", "NJ")]
+            trees = [job.result() for job in jobs]
+    """
+
+    def __init__(self, config=None, max_workers=1, use_processes=False):
+        self.config = config or ClusterConfig()
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def _get_config(self, options):
+        return replace(self.config, **options) if options else self.config
+
+    def submit(self, names, profiles, **options):
+        """Submit clustering to the executor of the engine.
+
+        :return: future with the result of cluster
+        :rtype: concurrent.futures.Future
+        """
+        if self._executor is None:
+            executor = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = executor(max_workers=self.max_workers)
+        return self._executor.submit(
+            _run_cluster, self._get_config(options), names, profiles
+        )
+
+    def shutdown(self, wait=True):
+        """Shutdown the executor of the engine."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def cluster_profile(self, profile, progress=None, **options):
+        """Cluster profiles in tsv or fasta format, see parse_profile."""
+        if progress is not None:
+            progress.start("parse")
+        names, profiles = parse_profile(profile)
+        return self.cluster(names, profiles, progress=progress, **options)
+
+    def cluster(self, names, profiles, progress=None, **options):
+        """Cluster allele profiles.
+
+        :param names: sample names
+        :type names: Sequence[str]
+        :param profiles: profiles as strings or integers, with samples as rows
+        :type profiles: np.ndarray
+        :param progress: reports the stage of the clustering, see JobProgress
+        :type progress: JobProgress | None
+        :return: tree in newick format or distance matrix in PHYLIP format
+        :rtype: str
+        """
+        config = self._get_config(options)
+        names, profiles, embeded = self.prepare(names, profiles, config)
+        return self.run(names, profiles, embeded, config, progress=progress)
+
+    @staticmethod
+    def prepare(names, profiles, config):
+        """Sanitize names and collapse samples with identical profiles."""
+        profiles = np.asarray(profiles)
+        if not np.issubdtype(profiles.dtype, np.integer):
+            profiles = np.char.upper(profiles.astype(str))
+        names = np.array([re.sub(r"[\(\)\ \,\"\';]", "_", n) for n in names])
+        return nonredundant(names, profiles, handle_missing=config.handle_missing)
+
+    @staticmethod
+    def run(names, profiles, embeded, config, progress=None):
+        """Cluster non-redundant profiles, see prepare."""
+        method_params = config.method_params()
+        method_params["progress"] = progress
+        if progress is not None:
+            progress.start("distance")
+        tmp_dir = config.tmp_dir or os.path.expanduser("~")
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as job_dir:
+            tempfix = os.path.join(job_dir, "job")
+            method_params.update(
+                tempfix=tempfix,
+                prof_file=tempfix + ".prof.npy",
+                dist_file=tempfix + ".dist.npy",
+                dist_subfile=tempfix + ".dist.{0}.npy",
+            )
+            tre = getattr(methods, method_params["method"])(
+                names, profiles, embeded, **method_params
+            )
+        if progress is not None:
+            progress.start("newick")
+        if method_params["method"] == "distance":
+            return "\n".join(tre)
+
+        maxDist = 0.0
+        for node in tre.iter_descendants():
+            if node.dist > maxDist:
+                maxDist = node.dist
+        if maxDist > 3:
+            for node in tre.iter_descendants("postorder"):
+                if node.dist < 0.1 and node.dist > 0:
+                    for s in node.get_sisters():
+                        s.dist += node.dist
+                    node.dist = 0
+        for leaf in tre.get_leaves():
+            embeded_group = embeded[leaf.name]
+            if len(embeded_group) > 1:
+                leaf.name = ""
+                for n in embeded_group:
+                    leaf.add_child(name=n, dist=0.0)
+        return tre.write(format=1).replace("'", "")
+
+
+def backend(**args):
+    """
+    paramters :
+        profile: input file or the content of the file as a string. Can be either profile or fasta. Headings start with an '#' will be ignored.
+        method: MSTreeV2, MSTree or NJ
+        matrix_type: asymmetric or symmetric
+        heuristic: harmonic or eBurst
+        branch_recraft: T or F
+
+    Outputs :
+        A string of a NEWICK tree
+
+    Examples :
+        To run MSTreeV2, use :
+        backend(profile=<filename>, method='MSTreeV2')
+
+        OR simply
+        backend(profile=<filename>)
+
+        To run a standard minimum spanning tree :
+        backend(profile=<filename>, method='MSTree')
+
+        To run a NJ tree (using FastME 2.0) :
+        backend(profile=<filename>, method='NJ')
+
+        To run a RapidNJ tree :
+        backend(profile=<filename>, method='RapidNJ')
+
+        To obtain a standard distance matrix :
+        backend(profile=<filename>, method='distance')
+
+    The module level params are not modified, use ClusterEngine to run
+    several jobs in the same process.
+    """
+    config = ClusterConfig.from_params(**args)
+    names, profiles = parse_profile(args["profile"])
+    names, profiles, embeded = ClusterEngine.prepare(names, profiles, config)
+    if int(args.get("checkEnv", False)):
+        method_params = config.method_params()
         time, memory = estimate_Consumption(
             platform.system(),
-            params["method"],
-            params["matrix_type"],
-            int(params["n_proc"]),
+            method_params["method"],
+            method_params["matrix_type"],
+            int(config.n_proc),
             profiles.shape[1],
             profiles.shape[0],
         )
@@ -1156,43 +1796,7 @@ def backend(**args):
         return json.dumps(
             dict(time=time, memory=memory, affordable=free_memory >= memory)
         )
-    with tempfile.NamedTemporaryFile(delete=True, dir=os.path.expanduser("~")) as f:
-        params["tempfix"] = f.name
-        params["prof_file"] = params["tempfix"] + ".prof.npy"
-        params["dist_file"] = params["tempfix"] + ".dist.npy"
-        params["dist_subfile"] = params["tempfix"] + ".dist.{0}.npy"
-        tre = eval("methods." + params["method"])(names, profiles, embeded, **params)
-        if params["method"] != "distance":
-            maxDist = 0.0
-            for node in tre.iter_descendants():
-                if node.dist > maxDist:
-                    maxDist = node.dist
-            if maxDist > 3:
-                for node in tre.iter_descendants("postorder"):
-                    if node.dist < 0.1 and node.dist > 0:
-                        for s in node.get_sisters():
-                            s.dist += node.dist
-                        node.dist = 0
-            for leaf in tre.get_leaves():
-                embeded_group = embeded[leaf.name]
-                if len(embeded_group) > 1:
-                    leaf.name = ""
-                    for n in embeded_group:
-                        leaf.add_child(name=n, dist=0.0)
-
-            for fname in (params["prof_file"], params["dist_file"]):
-                try:
-                    os.unlink(fname)
-                except:
-                    pass
-            return tre.write(format=1).replace("'", "")
-        else:
-            for fname in (params["prof_file"], params["dist_file"]):
-                try:
-                    os.unlink(fname)
-                except:
-                    pass
-            return "\n".join(tre)
+    return ClusterEngine.run(names, profiles, embeded, config)
 
 
 def estimate_Consumption(platform, method, matrix, n_proc, n_loci, n_profile):
@@ -1227,6 +1831,9 @@ def estimate_Consumption(platform, method, matrix, n_proc, n_loci, n_profile):
                     + 2.52492e-9 * n_loci * n_profile * n_profile / n_proc
                 )
                 memory = 66.297 * n_profile * n_profile + 429570000
+    elif method == "MSTreeApprox":
+        time = 9.11e-7 * n_loci * n_profile + 1.61
+        memory = 175.0 * n_loci * n_profile + 19192.5 * n_profile + 186142820
     elif method == "NJ":
         if platform == "Windows":
             time = 1.149e-8 * n_profile * n_profile * n_profile
@@ -0,0 +1,87 @@
+"""Report progress of the current job in the rq job meta data.
+
+This module is identical in all worker services.
+"""
+
+import time
+
+from rq import get_current_job
+
+from .events import publish_job_status
+
+
+class JobProgress:
+    """Report the stage, fraction done and elapsed time per stage of a job.
+
+    The progress is stored in job.meta["progress"] which is exposed by the job
+    status in the API, and published on the events channel of the job so the API
+    can push it to clients. Nothing is saved when used outside of a worker.
+
+    Examples :
+        progress = JobProgress()
+        progress.start("distance")
+        for i, chunk in enumerate(chunks):
+            ...
+            progress.update((i + 1) / len(chunks))
+        progress.start("linkage")
+        ...
+        progress.finish()
+    """
+
+    def __init__(self, job=None, min_interval: float = 1.0):
+        """Setup progress reporting for a job, defaults to the current job.
+
+        :param min_interval: Minimum time between saves of fraction updates, in seconds
+        """
+        self.job = job if job is not None else get_current_job()
+        self.min_interval = min_interval
+        self.stages = []
+        self.fraction = 0.0
+        self._stage_start = time.perf_counter()
+        self._last_save = 0.0
+
+    @property
+    def stage(self) -> str | None:
+        """Name of the current stage."""
+        return self.stages[-1]["name"] if self.stages else None
+
+    def start(self, stage: str):
+        """Finish the current stage and start a new one."""
+        self._finish_stage()
+        self.stages.append({"name": stage, "elapsed": None})
+        self._stage_start = time.perf_counter()
+        self.fraction = 0.0
+        self._save(force=True)
+
+    def update(self, fraction: float):
+        """Update the fraction done of the current stage."""
+        self.fraction = min(max(float(fraction), 0.0), 1.0)
+        self._save()
+
+    def finish(self):
+        """Finish the last stage."""
+        self._finish_stage()
+        self.fraction = 1.0
+        self._save(force=True)
+
+    def _finish_stage(self):
+        if self.stages and self.stages[-1]["elapsed"] is None:
+            self.stages[-1]["elapsed"] = time.perf_counter() - self._stage_start
+
+    def _save(self, force: bool = False):
+        now = time.perf_counter()
+        if self.job is None or (
+            not force and now - self._last_save < self.min_interval
+        ):
+            return
+        self._last_save = now
+        self.job.meta["progress"] = {
+            "stage": self.stage,
+            "fraction": self.fraction,
+            "elapsed": now - self._stage_start,
+            "stages": [dict(stage) for stage in self.stages],
+        }
+        self.job.save_meta()
+        publish_job_status(
+            self.job.connection, self.job, progress=self.job.meta["progress"]
+        )
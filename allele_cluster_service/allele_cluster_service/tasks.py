@@ -2,10 +2,14 @@
 
 import logging
 
-from .ms_trees import ClusterMethod, backend
+from .ms_trees import ClusterEngine, ClusterMethod
+from .progress import JobProgress
 
 LOG = logging.getLogger(__name__)
 
+# the engine is reused by all jobs processed by the worker
+ENGINE = ClusterEngine()
+
 
 def cluster(profile: str, method: str) -> str:
     """
@@ -25,5 +29,7 @@ def cluster(profile: str, method: str) -> str:
         msg = f'"{method}" is not a valid cluster method'
         LOG.error(msg)
         raise ValueError(msg) from error
-    newick = backend(profile=profile, method=method.value)
+    progress = JobProgress()
+    newick = ENGINE.cluster_profile(profile, progress=progress, method=method.value)
+    progress.finish()
     return newick
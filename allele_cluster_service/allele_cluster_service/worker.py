@@ -2,26 +2,59 @@
 
 import logging
 from logging.config import dictConfig
+from multiprocessing import Process
 
 from redis import Redis
-from rq import Connection, Queue, Worker
+from rq import Connection, Queue, SimpleWorker
 
 from . import config
+from .events import PublishingWorkerMixin
+from .serializer import ResultSerializer
 
 dictConfig(config.DICT_CONFIG)
 LOG = logging.getLogger(__name__)
 
+# serializer of jobs and results, must be the same as the API use
+serializer = ResultSerializer(
+    result_dir=config.RESULT_DIR,
+    compress_threshold=config.RESULT_COMPRESS_THRESHOLD,
+    spill_threshold=config.RESULT_SPILL_THRESHOLD,
+    spill_ttl=config.RESULT_SPILL_TTL,
+)
 
-def create_app():
-    """Start a new worker instance."""
-    LOG.info("Preparing to start worker")
-    LOG.info("Setup redis connection: %s:%s", config.REDIS_HOST, config.REDIS_PORT)
 
+class PublishingWorker(PublishingWorkerMixin, SimpleWorker):
+    """Worker that publish job status transitions with redis pub/sub."""
+
+
+def start_worker():
+    """Start a worker that process jobs in its own process.
+
+    The worker does not fork for each job which lets jobs reuse the imported
+    modules, compiled functions and the cluster engine.
+    """
+    LOG.info("Setup redis connection: %s:%s", config.REDIS_HOST, config.REDIS_PORT)
     redis = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT)
 
     # start worker with json serializer
     LOG.info("Starting worker...")
     with Connection(redis):
-        queue = Queue(config.REDIS_QUEUE)
-        worker = Worker([queue], connection=redis)
+        LOG.info("Listening to queues: %s", ", ".join(config.REDIS_QUEUES))
+        queues = [
+            Queue(name.strip(), serializer=serializer) for name in config.REDIS_QUEUES
+        ]
+        worker = PublishingWorker(queues, connection=redis, serializer=serializer)
         worker.work()
+
+
+def create_app():
+    """Start new worker instances."""
+    LOG.info("Preparing to start %d worker(s)", config.WORKER_CONCURRENCY)
+    if config.WORKER_CONCURRENCY <= 1:
+        start_worker()
+        return
+    workers = [Process(target=start_worker) for _ in range(config.WORKER_CONCURRENCY)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
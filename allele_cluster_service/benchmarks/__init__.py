@@ -0,0 +1 @@
+"""Benchmarks for the allele cluster service."""
@@ -0,0 +1,93 @@
+"""Benchmark the approximate minimum spanning tree used by MSTreeApprox.
+
+Reports the runtime and recall of the approximate tree against the exact
+minimum spanning tree, computed from all pairwise distances, on synthetic
+profiles. Recall is the fraction of approximate branches that are part of
+the exact tree and the weight ratio is the total length of the approximate
+tree over the length of the exact tree.
+
+The clonal scenario has clonal complexes of about 100 samples with 0.5%
+differing loci. The divergent scenario has 10% differing loci and 3% missing
+alleles, where few profiles share long runs of identical alleles.
+
+Usage:
+    python -m benchmarks.bench_approx_mst --sizes 1000 2000 5000
+    python -m benchmarks.bench_approx_mst --sizes 5000 --scenarios divergent
+    python -m benchmarks.bench_approx_mst --sizes 50000 --no-exact
+"""
+
+import argparse
+import time
+
+import numpy as np
+from allele_cluster_service.ms_trees import (
+    _pair_distances,
+    _spanning_forest,
+    approximate_minimum_spanning_tree,
+)
+
+from .synthetic import simulate_allele_matrix
+
+SCENARIOS = {
+    "clonal": {"mutation_rate": 0.005, "missing_rate": 0.01},
+    "divergent": {"mutation_rate": 0.1, "missing_rate": 0.03},
+}
+
+
+def exact_minimum_spanning_tree(profiles):
+    """Minimum spanning tree from all pairwise pair_delete distances."""
+    sources, targets = np.triu_indices(profiles.shape[0], 1)
+    dist = _pair_distances(profiles, profiles > 0, sources, targets, True)
+    sources, targets = _spanning_forest(sources, targets, dist, profiles.shape[0])
+    weights = _pair_distances(profiles, profiles > 0, sources, targets, True)
+    return sources, targets, weights
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 2000, 5000])
+    parser.add_argument("--loci", type=int, default=3000)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--no-exact", dest="exact", action="store_false")
+    args = parser.parse_args()
+
+    # compile numba functions before timing
+    approximate_minimum_spanning_tree(simulate_allele_matrix(10, 10))
+
+    print("scenario\tsamples\tapprox (s)\texact (s)\trecall\tweight ratio")
+    for scenario in args.scenarios:
+        for n_samples in args.sizes:
+            run_scenario(scenario, n_samples, args.loci, args.exact)
+
+
+def run_scenario(scenario, n_samples, n_loci, exact):
+    """Time the approximate tree on one scenario and compare with the exact tree."""
+    profiles = simulate_allele_matrix(
+        n_samples, n_loci, n_clusters=max(n_samples // 100, 2), **SCENARIOS[scenario]
+    )
+    profiles = np.unique(profiles, axis=0)
+
+    start = time.perf_counter()
+    approx = approximate_minimum_spanning_tree(profiles)
+    approx_time = time.perf_counter() - start
+    if not exact:
+        print(f"{scenario}\t{n_samples}\t{approx_time:.2f}\t-\t-\t-")
+        return
+
+    start = time.perf_counter()
+    sources, targets, weights = exact_minimum_spanning_tree(profiles)
+    exact_time = time.perf_counter() - start
+    exact_edges = {frozenset(br) for br in zip(sources.tolist(), targets.tolist())}
+    recall = np.mean([frozenset(br[:2]) in exact_edges for br in approx])
+    ratio = sum(br[2] for br in approx) / np.sum(weights)
+    print(
+        f"{scenario}\t{n_samples}\t{approx_time:.2f}\t{exact_time:.2f}"
+        f"\t{recall:.3f}\t{ratio:.4f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
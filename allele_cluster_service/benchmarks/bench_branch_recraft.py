@@ -0,0 +1,206 @@
+"""Benchmark branch recrafting used by MSTreeV2.
+
+Compares the numba implementation of methods._branch_recraft with the pure
+Python implementation it replaced, on synthetic profiles, and verifies that
+both produce the same branches.
+
+Usage:
+    python -m benchmarks.bench_branch_recraft --sizes 500 1000 2000
+"""
+
+import argparse
+import copy
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from allele_cluster_service.ms_trees import (
+    contemporary,
+    distance_matrix,
+    methods,
+    params,
+)
+
+from .synthetic import simulate_allele_matrix
+
+
+def legacy_branch_recraft(branches, dist, weights, n_loci):
+    """Pure Python branch recrafting from GrapeTree."""
+    if n_loci is None:
+        n_loci = np.max(dist)
+
+    group_id, groups, childrens = (
+        {b: b for br in branches for b in br[:2]},
+        {b: [b] for br in branches for b in br[:2]},
+        {b: [] for br in branches for b in br[:2]},
+    )
+    branches = sorted(
+        branches,
+        key=lambda br: [dist[br[0], br[1]]] + sorted([weights[br[0]], weights[br[1]]]),
+    )
+    i = 0
+    while i < len(branches):
+        src, tgt, brlen = branches[i]
+
+        sources, targets = groups[group_id[src]], groups[group_id[tgt]]
+        tried = {}
+        if len(sources) > 1:
+            for w, d, s in sorted(zip(weights[sources], dist[sources, tgt], sources))[
+                :3
+            ]:
+                if s == src:
+                    break
+                if d < 1.5 * dist[src, tgt]:
+                    if contemporary(
+                        [dist[s, src], dist[src, s]], d, dist[src, tgt], n_loci
+                    ):
+                        tried[src], src = s, s
+                        break
+            while src not in tried:
+                tried[src] = src
+                mid_nodes = sorted(
+                    [
+                        [weights[s], dist[s, tgt], s]
+                        for s in childrens[src]
+                        if s not in tried and dist[s, tgt] < 2 * dist[src, tgt]
+                    ]
+                )
+                for w, d, s in mid_nodes:
+                    if d < dist[src, tgt]:
+                        if not contemporary(
+                            [dist[src, s], dist[s, src]], dist[src, tgt], d, n_loci
+                        ):
+                            tried[src], src = s, s
+                            break
+                    elif w < weights[src]:
+                        if contemporary(
+                            [dist[s, src], dist[src, s]], d, dist[src, tgt], n_loci
+                        ):
+                            tried[src], src = s, s
+                            break
+                    tried[s] = src
+        if len(targets) > 1:
+            for w, d, t in sorted(zip(weights[targets], dist[src, targets], targets))[
+                :3
+            ]:
+                if t == tgt:
+                    break
+                if d < 1.5 * dist[src, tgt]:
+                    if contemporary(
+                        [dist[t, tgt], dist[tgt, t]], d, dist[src, tgt], n_loci
+                    ):
+                        tried[tgt], tgt = t, t
+                        break
+            while tgt not in tried:
+                tried[tgt] = tgt
+                mid_nodes = sorted(
+                    [
+                        [weights[t], dist[src, t], t]
+                        for t in childrens[tgt]
+                        if t not in tried and dist[src, t] < 2 * dist[src, tgt]
+                    ]
+                )
+                for w, d, s in mid_nodes:
+                    if d < dist[src, tgt]:
+                        if not contemporary(
+                            [dist[tgt, t], dist[t, tgt]], dist[src, tgt], d, n_loci
+                        ):
+                            tried[tgt], tgt = t, t
+                            break
+                    elif w < weights[tgt]:
+                        if contemporary(
+                            [dist[t, tgt], dist[tgt, t]], d, dist[src, tgt], n_loci
+                        ):
+                            tried[tgt], tgt = t, t
+                            break
+                    tried[t] = tgt
+        brlen = dist[src, tgt]
+        branches[i] = [src, tgt, brlen]
+        if i >= len(branches) - 1 or branches[i + 1][2] >= brlen:
+            tid = group_id[tgt]
+            for t in targets:
+                group_id[t] = group_id[src]
+            groups[group_id[src]].extend(groups.pop(tid, []))
+            childrens[src].append(tgt)
+            childrens[tgt].append(src)
+            i += 1
+        else:
+            branches[i:] = sorted(branches[i:], key=lambda br: br[2])
+    return branches
+
+
+def recraft_input(n_samples: int, n_loci: int, seed: int = 0):
+    """Build the input to branch recrafting in the same way as MSTreeV2."""
+    profiles = simulate_allele_matrix(
+        n_samples, n_loci, n_clusters=max(n_samples // 50, 2), seed=seed
+    )
+    profiles = np.unique(profiles, axis=0)
+    dist = distance_matrix.asymmetric(profiles)
+    weights = distance_matrix.harmonic(dist, [1] * dist.shape[0])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tempfix = str(Path(tmp_dir) / "bench")
+        tree_params = {
+            **params,
+            "tempfix": tempfix,
+            "dist_file": tempfix + ".dist.npy",
+        }
+        np.save(tree_params["dist_file"], dist)
+        branches = methods._asymmetric(dist.copy(), weights, **tree_params)
+    return branches, dist, weights, profiles.shape[1]
+
+
+def run_benchmark(n_samples: int, n_loci: int, repeats: int = 3):
+    """Time both implementations and check that they produce the same branches."""
+    branches, dist, weights, n_loci = recraft_input(n_samples, n_loci)
+    # compile numba functions before timing
+    methods._branch_recraft(copy.deepcopy(branches), dist, weights, n_loci)
+
+    timings = {}
+    results = {}
+    for name, func in [
+        ("legacy", legacy_branch_recraft),
+        ("numba", methods._branch_recraft),
+    ]:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results[name] = func(copy.deepcopy(branches), dist, weights, n_loci)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    identical = [br[:2] for br in results["legacy"]] == [
+        br[:2] for br in results["numba"]
+    ] and np.array_equal(
+        [br[2] for br in results["legacy"]], [br[2] for br in results["numba"]]
+    )
+    # number of branches that were moved by the recrafting
+    original = {frozenset(br[:2]) for br in branches}
+    n_moved = sum(frozenset(br[:2]) not in original for br in results["numba"])
+    return timings, identical, n_moved, dist.shape[0]
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[500, 1000, 2000])
+    parser.add_argument("--loci", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print("samples\tunique\tmoved\tlegacy (s)\tnumba (s)\tspeedup\tidentical")
+    all_identical = True
+    for n_samples in args.sizes:
+        timings, identical, n_moved, n_unique = run_benchmark(
+            n_samples, args.loci, args.repeats
+        )
+        all_identical &= identical
+        print(
+            f"{n_samples}\t{n_unique}\t{n_moved}\t{timings['legacy']:.3f}\t{timings['numba']:.3f}\t"
+            f"{timings['legacy'] / timings['numba']:.1f}x\t{identical}"
+        )
+    if not all_identical:
+        raise SystemExit("Branch recrafting produced different branches")
+
+
+if __name__ == "__main__":
+    main()
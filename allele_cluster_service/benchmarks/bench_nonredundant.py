@@ -0,0 +1,93 @@
+"""Benchmark collapsing of identical profiles.
+
+Compares ms_trees.nonredundant with the per-locus encoding it replaced, on
+string and integer coded profiles, and verifies that the output is the same.
+
+Usage:
+    python -m benchmarks.bench_nonredundant --samples 5000 --loci 3000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from allele_cluster_service.ms_trees import nonredundant, params
+
+from .synthetic import simulate_allele_matrix
+
+
+def legacy_nonredundant(names, profiles):
+    """Collapse identical profiles by encoding and sorting each locus."""
+    encoded_profile = np.array(
+        [np.unique(p, return_inverse=True)[1] + 1 for p in profiles.T]
+    ).T
+    encoded_profile[(profiles == "0") | (profiles == "N") | (profiles == "-")] = 0
+    if params["handle_missing"] == "complete_delete":
+        encoded_profile = encoded_profile[:, np.sum(encoded_profile == 0, 0) > 0]
+    names = names[np.lexsort(encoded_profile.T)]
+    profiles = encoded_profile[np.lexsort(encoded_profile.T)]
+    presence = np.sum(profiles > 0, 1) > 0
+    names, profiles = names[presence], profiles[presence]
+
+    uniqueness = np.concatenate([[1], np.sum(np.diff(profiles, axis=0) != 0, 1) > 0])
+
+    embeded = {names[0]: []}
+    embeded_group = embeded[names[0]]
+    for n, u in zip(names, uniqueness):
+        if u == 0:
+            embeded_group.append(n)
+        else:
+            embeded[n] = [n]
+            embeded_group = embeded[n]
+    names = names[uniqueness > 0]
+    profiles = profiles[uniqueness > 0]
+    return names, profiles, embeded
+
+
+def timed(func, *args):
+    """Call function and return the result and the runtime."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--loci", type=int, default=3000)
+    parser.add_argument("--duplicated", type=float, default=0.1)
+    args = parser.parse_args()
+
+    alleles = simulate_allele_matrix(
+        args.samples, args.loci, n_clusters=max(args.samples // 100, 2)
+    )
+    n_dup = int(args.samples * args.duplicated)
+    alleles = np.vstack([alleles, alleles[:n_dup]])
+    # same representation as the profiles parsed by the backend
+    profiles = np.array(
+        [["-" if a == 0 else str(a) for a in row] for row in alleles.tolist()]
+    )
+    names = np.array([f"sample_{i}" for i in range(alleles.shape[0])])
+    # compile numba functions before timing
+    nonredundant(names[:2], profiles[:2])
+
+    legacy, legacy_time = timed(legacy_nonredundant, names, profiles)
+    result, new_time = timed(nonredundant, names, profiles)
+    _, int_time = timed(nonredundant, names, alleles)
+    identical = (
+        np.array_equal(legacy[0], result[0])
+        and np.array_equal(legacy[1], result[1])
+        and list(legacy[2].items()) == list(result[2].items())
+    )
+    print(f"profiles: {alleles.shape[0]}, loci: {args.loci}, unique: {len(result[0])}")
+    print(f"legacy:\t{legacy_time:.2f}s")
+    print(f"string:\t{new_time:.2f}s ({legacy_time / new_time:.1f}x)")
+    print(f"integer:\t{int_time:.2f}s ({legacy_time / int_time:.1f}x)")
+    print(f"identical: {identical}")
+    if not identical:
+        raise SystemExit("Collapsing of profiles produced different output")
+
+
+if __name__ == "__main__":
+    main()
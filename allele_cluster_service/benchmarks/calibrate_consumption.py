@@ -0,0 +1,114 @@
+"""Calibrate the runtime and memory models used for admission control.
+
+The API predicts the resource consumption of allele clustering jobs before
+they are enqueued. This script runs the clustering backend on synthetic data
+of increasing size, measures wall time and peak memory and fits the
+coefficients of the API consumption models with non-negative least squares.
+
+Usage:
+    python -m benchmarks.calibrate_consumption --output calibration.json
+
+Pass the output file to the API with ALLELE_CLUSTER_CALIBRATION_FILE.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import resource
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from allele_cluster_service.ms_trees import backend, params
+from scipy.optimize import nnls
+
+from .synthetic import simulate_profiles
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_METHODS = ["MSTree", "MSTreeV2", "NJ", "RapidNJ", "MSTreeApprox"]
+DEFAULT_SIZES = [50, 100, 200, 400, 800]
+DEFAULT_LOCI = [500, 2000]
+
+
+def _run_backend(profile: str, method: str, queue: mp.Queue):
+    """Run backend and report runtime and peak memory of the process tree."""
+    start = time.perf_counter()
+    backend(profile=profile, method=method)
+    runtime = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    ) * 1024
+    queue.put((runtime, peak))
+
+
+def measure(method: str, n_samples: int, n_loci: int) -> Tuple[float, float]:
+    """Measure runtime and peak memory of one clustering job in a fresh process."""
+    profile = simulate_profiles(n_samples, n_loci, n_clusters=n_samples // 5 + 1)
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_backend, args=(profile, method, queue))
+    proc.start()
+    runtime, peak = queue.get()
+    proc.join()
+    return runtime, peak
+
+
+def fit(
+    observations: List[Tuple[int, int, float, float]], n_proc: int
+) -> Dict[str, float]:
+    """Fit model coefficients from observations of (n, n_loci, runtime, memory)."""
+    obs = np.array(observations, dtype=float)
+    n, n_loci, runtime, memory = obs.T
+    time_features = np.column_stack(
+        [n_loci * n, n**2, n_loci * n**2 / n_proc, n**3, np.ones_like(n)]
+    )
+    memory_features = np.column_stack([n, n_loci * n, n**2, n**3, np.ones_like(n)])
+    time_coef, _ = nnls(time_features, runtime)
+    memory_coef, _ = nnls(memory_features, memory)
+    return {
+        "time_loci_linear": time_coef[0],
+        "time_quadratic": time_coef[1],
+        "time_loci": time_coef[2],
+        "time_cubic": time_coef[3],
+        "time_const": time_coef[4],
+        "memory_linear": memory_coef[0],
+        "memory_loci_linear": memory_coef[1],
+        "memory_quadratic": memory_coef[2],
+        "memory_cubic": memory_coef[3],
+        "memory_const": memory_coef[4],
+    }
+
+
+def main():
+    """Run calibration."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", "-o", default="calibration.json")
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--loci", nargs="+", type=int, default=DEFAULT_LOCI)
+    args = parser.parse_args()
+
+    calibration = {}
+    for method in args.methods:
+        observations = []
+        for n_loci in args.loci:
+            for n_samples in args.sizes:
+                runtime, peak = measure(method, n_samples, n_loci)
+                print(
+                    f"{method}\tn={n_samples}\tloci={n_loci}\t"
+                    f"time={runtime:.2f}s\tmemory={peak / 1024**2:.0f}MB"
+                )
+                observations.append((n_samples, n_loci, runtime, peak))
+        calibration[method] = fit(observations, n_proc=params["n_proc"])
+
+    with open(args.output, "w", encoding="utf-8") as out:
+        json.dump(calibration, out, indent=2)
+    print(f"Wrote calibration to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Generate synthetic allele profiles for benchmarking."""
+
+import numpy as np
+
+
+def simulate_allele_matrix(
+    n_samples: int,
+    n_loci: int,
+    n_clusters: int = 10,
+    mutation_rate: float = 0.02,
+    missing_rate: float = 0.01,
+    seed: int = 0,
+) -> np.ndarray:
+    """Simulate clonal allele profiles as an integer matrix, missing alleles are 0.
+
+    Samples are derived from a few founder profiles by mutating a fraction of
+    the loci.
+
+    :param n_samples: Number of samples
+    :type n_samples: int
+    :param n_loci: Number of loci
+    :type n_loci: int
+    :param n_clusters: Number of founder profiles
+    :type n_clusters: int
+    :param mutation_rate: Fraction of loci that differs from the founder
+    :type mutation_rate: float
+    :param missing_rate: Fraction of loci that are missing
+    :type missing_rate: float
+    :param seed: Random seed
+    :type seed: int
+    :return: allele matrix with samples as rows
+    :rtype: np.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    founders = rng.integers(1, 50, size=(n_clusters, n_loci))
+    profiles = founders[rng.integers(0, n_clusters, size=n_samples)]
+    mutated = rng.random(profiles.shape) < mutation_rate
+    profiles = np.where(mutated, rng.integers(50, 5000, size=profiles.shape), profiles)
+    profiles[rng.random(profiles.shape) < missing_rate] = 0
+    return profiles
+
+
+def simulate_profiles(
+    n_samples: int,
+    n_loci: int,
+    n_clusters: int = 10,
+    mutation_rate: float = 0.02,
+    missing_rate: float = 0.01,
+    seed: int = 0,
+) -> str:
+    """Simulate clonal allele profiles and return them as a tsv table.
+
+    Missing alleles are encoded with "-", see simulate_allele_matrix.
+
+    :param n_samples: Number of samples
+    :type n_samples: int
+    :param n_loci: Number of loci
+    :type n_loci: int
+    :param n_clusters: Number of founder profiles
+    :type n_clusters: int
+    :param mutation_rate: Fraction of loci that differs from the founder
+    :type mutation_rate: float
+    :param missing_rate: Fraction of loci that are missing
+    :type missing_rate: float
+    :param seed: Random seed
+    :type seed: int
+    :return: tsv representation of the profiles
+    :rtype: str
+    """
+    profiles = simulate_allele_matrix(
+        n_samples, n_loci, n_clusters, mutation_rate, missing_rate, seed
+    ).astype(str)
+    profiles[profiles == "0"] = "-"
+
+    header = "\t".join(["#Name", *[f"locus_{i}" for i in range(n_loci)]])
+    rows = ["\t".join([f"sample_{i}", *row]) for i, row in enumerate(profiles.tolist())]
+    return "\n".join([header, *rows]) + "\n"
@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 
 import pandas as pd
@@ -18,3 +19,18 @@ def mlst_profiles_different():
     """Samples with the same MLST profile."""
     path = DATA_DIR / "mlst_different_profile.csv"
     return pd.read_csv(path).to_csv(sep="\t", index=False)
+
+
+@pytest.fixture()
+def cgmlst_profiles():
+    """Simulated cgMLST profiles with missing alleles and duplicated samples."""
+    path = DATA_DIR / "cgmlst_profiles.csv"
+    return pd.read_csv(path).to_csv(sep="\t", index=False)
+
+
+@pytest.fixture()
+def cgmlst_expected_trees():
+    """Trees of the simulated cgMLST profiles in newick format."""
+    path = DATA_DIR / "cgmlst_profiles_trees.json"
+    with open(path) as inpt:
+        return json.load(inpt)
@@ -1,7 +1,23 @@
 """Test cluster samples using ms_tree."""
 
+import json
+from io import StringIO
+
+import numpy as np
+import pandas as pd
 import pytest
+from allele_cluster_service.ms_trees import (
+    ClusterConfig,
+    ClusterEngine,
+    _pair_distances,
+    approximate_minimum_spanning_tree,
+    params,
+    parse_profile,
+)
+from allele_cluster_service.progress import JobProgress
 from allele_cluster_service.tasks import cluster
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree
 
 
 @pytest.mark.parametrize(
@@ -38,7 +54,10 @@ def test_cluster_task_w_nj_n_same_mlst_profile(mlst_profiles_all_same):
 @pytest.mark.parametrize(
     "cluster_method,expected",
     [
-        ("MSTree", "(DRR237264:2,DRR237262:1,DRR237260:1,DRR237263:1,DRR237261:0);"),
+        (
+            "MSTree",
+            "((DRR237262:1,DRR237260:1,DRR237263:1,DRR237261:0):2,DRR237264:0);",
+        ),
         ("MSTreeV2", "(DRR237264:2,DRR237262:1,DRR237260:1,DRR237263:1,DRR237261:0);"),
         (
             "NJ",
@@ -56,3 +75,100 @@ def test_cluster_task_different_mlst_profile(
     """Test task cluster using samples with different MLST profile."""
     newick = cluster(profile=mlst_profiles_different, method=cluster_method)
     assert newick == expected
+
+
+@pytest.mark.parametrize(
+    "cluster_method", ["MSTree", "MSTreeV2", "NJ", "RapidNJ", "MSTreeApprox"]
+)
+def test_cluster_task_cgmlst_profiles(
+    cgmlst_profiles, cgmlst_expected_trees, cluster_method
+):
+    """Test that clustering of cgMLST profiles produce the same trees."""
+    newick = cluster(profile=cgmlst_profiles, method=cluster_method)
+    assert newick == cgmlst_expected_trees[cluster_method]
+
+
+@pytest.mark.parametrize("missing_rate", [0, 0.2])
+def test_approximate_minimum_spanning_tree(cgmlst_profiles, missing_rate):
+    """Test that the approximate tree is close to the minimum spanning tree."""
+    profiles = pd.read_csv(StringIO(cgmlst_profiles), sep="\t", index_col=0)
+    profiles = profiles.replace("-", 0).astype(int).drop_duplicates().to_numpy()
+    # missing alleles must not separate profiles from their relatives
+    rng = np.random.default_rng(0)
+    profiles[rng.random(profiles.shape) < missing_rate] = 0
+    n_profiles = profiles.shape[0]
+
+    tree = approximate_minimum_spanning_tree(profiles)
+    # the exact minimum spanning tree from all pairwise distances
+    sources, targets = np.triu_indices(n_profiles, 1)
+    dist = _pair_distances(profiles, profiles > 0, sources, targets, True)
+    exact = minimum_spanning_tree(
+        coo_matrix((dist + 1, (sources, targets)), shape=(n_profiles, n_profiles))
+    )
+
+    # the approximate tree should span all profiles
+    assert len(tree) == n_profiles - 1
+    assert len({node for br in tree for node in br[:2]}) == n_profiles
+    # and be of about the same length as the exact tree
+    exact_length = exact.sum() - exact.nnz
+    assert sum(br[2] for br in tree) <= 1.05 * exact_length
+
+
+def test_cluster_engine_concurrent_jobs(cgmlst_profiles, cgmlst_expected_trees):
+    """Test that jobs running concurrently in the same process are independent."""
+    defaults = dict(params)
+    names, profiles = parse_profile(cgmlst_profiles)
+    methods = ["MSTreeV2", "MSTree", "RapidNJ", "MSTreeV2", "MSTree"]
+    with ClusterEngine(ClusterConfig(n_proc=1), max_workers=3) as engine:
+        jobs = [engine.submit(names, profiles, method=method) for method in methods]
+        trees = [job.result() for job in jobs]
+    assert trees == [cgmlst_expected_trees[method] for method in methods]
+    # the module level defaults are left untouched
+    assert params == defaults
+
+
+@pytest.mark.parametrize("method", ["MSTreeV2", "MSTreeApprox"])
+def test_cluster_progress(cgmlst_profiles, cgmlst_expected_trees, method):
+    """Test that the stages of a clustering job are reported and published."""
+
+    class Connection:
+        def __init__(self):
+            self.messages = []
+
+        def publish(self, channel, message):
+            self.messages.append((channel, json.loads(message)))
+
+    class Job:
+        def __init__(self):
+            self.id = "job-1"
+            self.meta = {}
+            self.connection = Connection()
+
+        def save_meta(self):
+            pass
+
+        def get_status(self, refresh=True):
+            return "started"
+
+    job = Job()
+    progress = JobProgress(job)
+    newick = ClusterEngine().cluster_profile(
+        cgmlst_profiles, progress=progress, method=method, n_proc=2
+    )
+    progress.finish()
+    assert newick == cgmlst_expected_trees[method]
+
+    stages = job.meta["progress"]["stages"]
+    assert [stage["name"] for stage in stages] == [
+        "parse",
+        "distance",
+        "linkage",
+        "newick",
+    ]
+    assert all(stage["elapsed"] >= 0 for stage in stages)
+    assert job.meta["progress"]["fraction"] == 1.0
+    # each saved change of the progress is published
+    channel, message = job.connection.messages[-1]
+    assert channel == "bonsai:job:job-1"
+    assert message["progress"] == job.meta["progress"]
+    assert len(job.connection.messages) >= len(stages) + 1
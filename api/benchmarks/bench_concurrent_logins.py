@@ -0,0 +1,101 @@
+"""Load test of concurrent logins.
+
+Simulates a login burst against a running API by sending concurrent token
+requests and measures the latency of logins and of an unrelated endpoint
+while the logins are processed. Use a local test account, failed logins are
+as expensive as successful ones.
+
+Usage:
+    python -m benchmarks.bench_concurrent_logins --url http://localhost:8000 \\
+        --username admin --password admin --concurrency 50 --logins 500
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def summarize(name: str, latencies: List[float]) -> str:
+    """Format count, p50 and p99 of latencies in milliseconds."""
+    pct = statistics.quantiles(latencies, n=100)
+    return f"{name}\t{len(latencies)}\t{pct[49]:.1f}\t{pct[98]:.1f}"
+
+
+async def login(
+    client: httpx.AsyncClient,
+    username: str,
+    password: str,
+    queue: asyncio.Queue,
+    latencies: List[float],
+    failed: List[int],
+):
+    """Log in until the queue of logins is empty."""
+    while not queue.empty():
+        queue.get_nowait()
+        start = time.perf_counter()
+        resp = await client.post(
+            "/token", data={"username": username, "password": password}
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        if resp.status_code != 200:
+            failed.append(resp.status_code)
+
+
+async def ping(client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float]):
+    """Measure latency of an unrelated endpoint until stopped."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def run(args):
+    """Run the load test."""
+    queue = asyncio.Queue()
+    for _ in range(args.logins):
+        queue.put_nowait(None)
+    login_latencies, ping_latencies, failed = [], [], []
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=60
+    ) as client:
+        stop = asyncio.Event()
+        pinger = asyncio.create_task(ping(client, stop, ping_latencies))
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[
+                login(
+                    client, args.username, args.password, queue, login_latencies, failed
+                )
+                for _ in range(args.concurrency)
+            ]
+        )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await pinger
+
+    print(f"logins: {args.logins}, concurrency: {args.concurrency}")
+    print(f"throughput: {args.logins / elapsed:.1f} logins/s, failed: {len(failed)}")
+    print("endpoint\trequests\tp50 (ms)\tp99 (ms)")
+    print(summarize("/token", login_latencies))
+    print(summarize("/", ping_latencies))
+
+
+def main():
+    """Run load test."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark latency of unrelated requests while jobs are submitted.
+
+Blocking redis calls in async endpoints stall the event loop, which delays
+every other request handled by the same API process. The benchmark serves a
+small app in-process and measures the latency of a trivial endpoint while
+clients submit jobs and poll their status, either with blocking calls on the
+event loop or with enqueue offloaded to a thread pool and status lookups on
+the async redis connection.
+
+Jobs are enqueued to a separate queue that no worker listens to and are
+removed when the benchmark is done. It requires a running redis server, set
+REDIS_HOST and REDIS_PORT to use another server than the API default.
+
+Usage:
+    python -m benchmarks.bench_event_loop_latency --clients 20 --duration 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from itertools import count
+from typing import List
+
+import httpx
+from bonsai_api.redis.queue import (
+    _to_job_status,
+    check_redis_job_status,
+    enqueue_unique,
+    redis,
+    serializer,
+)
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from rq import Queue
+from rq.job import Job
+
+QUEUE_NAME = "bonsai_benchmark"
+TASK = "benchmarks.noop"
+
+
+def create_app(queue: Queue) -> FastAPI:
+    """Create app with an unrelated endpoint and blocking and non-blocking job routes."""
+    app = FastAPI()
+    counter = count()
+
+    @app.get("/ping")
+    async def ping():
+        return {"pong": True}
+
+    @app.post("/blocking/submit")
+    async def blocking_submit():
+        job = enqueue_unique(queue, TASK, job_timeout=60, n=next(counter))
+        return {"id": job.id}
+
+    @app.get("/blocking/status/{job_id}")
+    async def blocking_status(job_id: str):
+        job = Job.fetch(job_id, connection=redis.connection, serializer=serializer)
+        return _to_job_status(job)
+
+    @app.post("/async/submit")
+    async def async_submit():
+        job = await run_in_threadpool(
+            enqueue_unique, queue, TASK, job_timeout=60, n=next(counter)
+        )
+        return {"id": job.id}
+
+    @app.get("/async/status/{job_id}")
+    async def async_status(job_id: str):
+        return await check_redis_job_status(job_id)
+
+    return app
+
+
+async def submit_jobs(client: httpx.AsyncClient, mode: str, stop: asyncio.Event):
+    """Submit jobs and check their status until stopped."""
+    while not stop.is_set():
+        resp = await client.post(f"/{mode}/submit")
+        job_id = resp.json()["id"]
+        for _ in range(3):
+            await client.get(f"/{mode}/status/{job_id}")
+
+
+async def measure_ping(client: httpx.AsyncClient, duration: float) -> List[float]:
+    """Measure latency of the unrelated endpoint, in milliseconds."""
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        await client.get("/ping")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def run(mode: str | None, n_clients: int, duration: float) -> List[float]:
+    """Measure ping latency while n clients submit jobs in the given mode."""
+    queue = Queue(QUEUE_NAME, connection=redis.connection, serializer=serializer)
+    transport = httpx.ASGITransport(app=create_app(queue))
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        stop = asyncio.Event()
+        submitters = []
+        if mode is not None:
+            submitters = [
+                asyncio.create_task(submit_jobs(client, mode, stop))
+                for _ in range(n_clients)
+            ]
+        latencies = await measure_ping(client, duration)
+        stop.set()
+        await asyncio.gather(*submitters)
+    # remove benchmark jobs
+    queue.empty()
+    return latencies
+
+
+def percentile(values: List[float], pct: int) -> float:
+    """Get percentile of values."""
+    return statistics.quantiles(values, n=100)[pct - 1]
+
+
+async def run_all(n_clients: int, duration: float):
+    """Measure ping latency when idle and with blocking and non-blocking submission."""
+    print(f"clients: {n_clients}, duration: {duration}s per mode")
+    print("mode\trequests\tp50 (ms)\tp99 (ms)")
+    # run all modes on the same event loop as the async connection pool is bound to it
+    for mode in [None, "blocking", "async"]:
+        latencies = await run(mode, n_clients, duration)
+        print(
+            f"{mode or 'idle'}\t{len(latencies)}\t"
+            f"{percentile(latencies, 50):.2f}\t{percentile(latencies, 99):.2f}"
+        )
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per mode")
+    args = parser.parse_args()
+    asyncio.run(run_all(args.clients, args.duration))
+
+
+if __name__ == "__main__":
+    main()
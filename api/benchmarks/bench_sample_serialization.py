@@ -0,0 +1,78 @@
+"""Benchmark the CPU cost of serializing a sample read from the database.
+
+A validated read constructs SampleInDatabase from the stored document, which
+discriminates the unions of every prediction result and variant, and FastAPI
+then validates and serializes it again as the response model. A trusted read
+fills in missing optional fields and serializes the document with orjson.
+
+The stored document is created from a pipeline result the same way as when a
+sample is uploaded, so no database is needed.
+
+Usage:
+    python -m benchmarks.bench_sample_serialization --repeats 200 \
+        tests/data/test_mtuberculosis_1.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict
+
+import orjson
+from bonsai_api.crud.sample import _sample_in_create, sample_document_from_db
+from bonsai_api.models.sample import SampleInDatabase
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from prp.models import PipelineResult
+
+
+def validated_read(document: Dict[str, Any]) -> bytes:
+    """Validate the document and serialize it as the response model."""
+    sample = SampleInDatabase(**document)
+    # FastAPI validates the returned object against the response model
+    response = SampleInDatabase.model_validate(sample.model_dump())
+    return JSONResponse(jsonable_encoder(response, by_alias=False)).body
+
+
+def trusted_read(document: Dict[str, Any]) -> bytes:
+    """Serialize the stored document without validating it."""
+    return ORJSONResponse(sample_document_from_db(document)).body
+
+
+def measure(func: Callable[[Dict[str, Any]], bytes], document, repeats: int):
+    """Time each call of the function, in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(document)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("result", type=argparse.FileType(), help="PRP result")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    result = PipelineResult(**json.load(args.result))
+    document = jsonable_encoder(_sample_in_create(result), by_alias=False)
+    document["_id"] = "0" * 24
+    size = len(orjson.dumps(document))
+
+    print(f"document size: {size / 1024:.1f} KiB, repeats: {args.repeats}")
+    print("read\tmean (ms)\tp50 (ms)\tp99 (ms)")
+    for name, func in [("validated", validated_read), ("trusted", trusted_read)]:
+        func(document)  # warm up
+        timings = sorted(measure(func, document, args.repeats))
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        print(
+            f"{name}\t{statistics.mean(timings):.3f}\t"
+            f"{statistics.median(timings):.3f}\t{p99:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
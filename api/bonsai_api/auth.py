@@ -1,6 +1,10 @@
 """Authentication."""
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Callable
 
 from jose import jwt
 from passlib.context import CryptContext
@@ -9,6 +13,18 @@ from .config import ALGORITHM, settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# password hashing and LDAP binds are slow and blocking, they run in a separate
+# bounded pool to not stall the event loop or exhaust the shared thread pool
+auth_executor = ThreadPoolExecutor(
+    max_workers=settings.auth_max_workers, thread_name_prefix="auth"
+)
+
+
+async def run_in_auth_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking authentication function in the authentication thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(auth_executor, partial(func, *args, **kwargs))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify if provided passwords are correct"""
@@ -2,9 +2,13 @@
 
 import asyncio
 import json
+import os
 import random
 import string
+import time
+from concurrent.futures import ProcessPoolExecutor
 from logging import getLogger
+from multiprocessing import get_context
 
 import click
 from pymongo.errors import DuplicateKeyError
@@ -12,14 +16,12 @@ from pymongo.errors import DuplicateKeyError
 from .__version__ import VERSION as version
 from .config import USER_ROLES
 from .crud.group import create_group as create_group_in_db
-from .crud.sample import get_sample, get_samples, update_sample
-from .crud.tags import compute_phenotype_tags
+from .crud.sample import get_sample, update_tags_of_all_samples
 from .crud.user import create_user as create_user_in_db
 from .db.index import INDEXES
 from .db.utils import get_db_connection
 from .io import sample_to_kmlims
 from .models.group import GroupInCreate, pred_res_cols
-from .models.sample import SampleInCreate
 from .models.user import UserInputCreate
 
 LOG = getLogger(__name__)
@@ -165,22 +167,47 @@ def export(ctx, sample_id, output):  # pylint: disable=unused-argument
 
 
 @cli.command()
+@click.option(
+    "-w",
+    "--workers",
+    default=os.cpu_count(),
+    show_default=True,
+    help="Processes computing tags.",
+)
+@click.option(
+    "-b", "--batch-size", default=500, show_default=True, help="Samples per update."
+)
 @click.pass_obj
-def update_tags(ctx):  # pylint: disable=unused-argument
+def update_tags(ctx, workers, batch_size):  # pylint: disable=unused-argument
     """Update the tags for samples in the database."""
     LOG.info("Updating tags...")
+
+    async def _update_tags(db, executor, prog_bar):
+        n_updated, n_failed = 0, 0
+        async for updated, failed in update_tags_of_all_samples(
+            db, executor, batch_size=batch_size, max_pending=workers + 1
+        ):
+            n_updated += updated
+            n_failed += failed
+            prog_bar.update(updated + failed)
+        return n_updated, n_failed
+
+    start_time = time.perf_counter()
     loop = asyncio.get_event_loop()
-    with get_db_connection() as db:
-        func = get_samples(db)
-        samples = loop.run_until_complete(func)
-    with click.progressbar(
-        samples.data, length=samples.records_filtered, label="Updating tags"
-    ) as prog_bar:
-        for sample in prog_bar:
-            upd_tags = compute_phenotype_tags(sample)
-            upd_sample = SampleInCreate(**{**sample.model_dump(), "tags": upd_tags})
-            # update sample as sync function
-            loop = asyncio.get_event_loop()
-            func = update_sample(db, upd_sample)
-            samples = loop.run_until_complete(func)
-    click.secho("Updated tags for all samples", fg="green")
+    # spawn workers to not copy the database connection
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+    with get_db_connection() as db, executor:
+        n_samples = loop.run_until_complete(
+            db.sample_collection.estimated_document_count()
+        )
+        with click.progressbar(length=n_samples, label="Updating tags") as prog_bar:
+            func = _update_tags(db, executor, prog_bar)
+            n_updated, n_failed = loop.run_until_complete(func)
+    elapsed = time.perf_counter() - start_time
+    click.secho(
+        f"Updated tags for {n_updated} samples in {elapsed:.1f}s "
+        f"({(n_updated + n_failed) / elapsed:.1f} samples/s)",
+        fg="green",
+    )
+    if n_failed > 0:
+        click.secho(f"Could not compute tags for {n_failed} samples", fg="yellow")
@@ -28,14 +28,57 @@ class Settings(BaseSettings):
     # Redis connection
     redis_host: str = "redis"
     redis_port: str = "6379"
+    redis_max_connections: int = 50  # async connection pool used by the API
+
+    # Allele clustering capacity, used for routing and admission of clustering jobs.
+    # Jobs predicted to fit within the small job limits are sent to the
+    # "allele_cluster" queue, larger jobs to "allele_cluster_large" and jobs
+    # exceeding the max limits are rejected.
+    allele_cluster_n_proc: int = 5
+    allele_cluster_small_job_runtime: int = 10 * 60  # seconds
+    allele_cluster_small_job_memory: int = 4 * 1024**3  # bytes
+    allele_cluster_max_runtime: int = 6 * 60 * 60  # seconds
+    allele_cluster_max_memory: int = 32 * 1024**3  # bytes
+    # coefficients fitted by the allele cluster service benchmark suite
+    allele_cluster_calibration_file: str | None = None
+
+    # Storage of job results, large results are compressed and results above the
+    # spill threshold are written to a directory shared with the workers
+    result_dir: str | None = None
+    result_compress_threshold: int = 64 * 1024  # bytes
+    result_spill_threshold: int = 1024 * 1024  # bytes
+    result_spill_ttl: int = 24 * 60 * 60  # seconds
+
+    # Cache of clustering results, entries are removed when a sample is changed
+    cluster_cache_ttl: int = 24 * 60 * 60  # seconds
+    cluster_cache_max_entries: int = 1000
+    cluster_cache_max_result_size: int = 5 * 1024**2  # bytes
+
+    # Bulk upload of samples, uploaded results are validated in batches in a
+    # process pool
+    bulk_upload_workers: int = 2  # 0 validates in a thread of the API process
+    bulk_upload_batch_size: int = 32
+    bulk_upload_max_pending: int = 4  # batches held in memory at once
+
+    # Return samples as they are stored without validating them again, they are
+    # validated when they are created or updated
+    trusted_reads: bool = True
 
     # Reference genome and annotations for IGV
     reference_genomes_dir: str = "/tmp/reference_genomes"
     annotations_dir: str = "/tmp/annotations"
+    # In-memory cache of index and annotation files and of the start of alignments
+    file_cache_max_size: int = 256 * 1024**2  # bytes, 0 disables the cache
+    file_cache_max_file_size: int = 8 * 1024**2  # bytes
+    file_cache_head_size: int = 1024**2  # bytes
     # authentication options
     secret_key: str = "not-so-secret"  # openssl rand -hex 32
     access_token_expire_minutes: int = 180  # expiration time for accesst token
     api_authentication: bool = True
+    # time authenticated users are cached in each API process
+    user_cache_ttl: int = 30  # seconds
+    # threads for verifying passwords and LDAP binds, bounds concurrent logins
+    auth_max_workers: int = 4
     # LDAP login Settings
     # If LDAP is not configured it will fallback on local authentication
     ldap_search_attr: str = "mail"
@@ -47,6 +90,7 @@ class Settings(BaseSettings):
     ldap_bind_dn: str | None = None
     ldap_secret: str | None = None
     ldap_connection_timeout: int = 10
+    ldap_pool_size: int = 4  # reused service connections
     ldap_read_only: bool = False
     ldap_valid_names: str | None = None
     ldap_private_key_password: str | None = None
@@ -106,8 +150,11 @@ USER_ROLES = {
         "locations:write",
     ],
     "uploader": [
-        "groups:write" "samples:write",
+        "groups:write",
+        "samples:write",
     ],
 }
+# permissions of each role, precomputed for the permission checks of each request
+ROLE_PERMISSIONS = {role: frozenset(perms) for role, perms in USER_ROLES.items()}
 
 settings = Settings()
@@ -7,3 +7,7 @@ class EntryNotFound(Exception):
 
 class UpdateDocumentError(Exception):
     """Sample not in database error"""
+
+
+class UpdateConflictError(Exception):
+    """Document was modified by another request error"""
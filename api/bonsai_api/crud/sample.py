@@ -1,41 +1,89 @@
 """Functions for performing CURD operations on sample collection."""
 
+import asyncio
+import json
 import logging
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import datetime
-from itertools import groupby
-from typing import Any, Dict, List, Sequence
+from functools import lru_cache
+from multiprocessing import get_context
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    NamedTuple,
+    Sequence,
+    Tuple,
+    get_args,
+    get_origin,
+)
 
 from bson.objectid import ObjectId
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from prp.models import PipelineResult
 from prp.models.phenotype import AnnotationType, ElementType, PhenotypeInfo
-from prp.models.tags import TagList
 from prp.parse.typing import replace_cgmlst_errors
+from pydantic import TypeAdapter
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
 
+from ..config import settings
 from ..crud.location import get_location
-from ..crud.tags import compute_phenotype_tags
+from ..crud.tags import compute_phenotype_tags, compute_tags_for_documents
 from ..db import Database
 from ..models.antibiotics import ANTIBIOTICS
 from ..models.base import MultipleRecordsResponseModel, RWModel
 from ..models.location import LocationOutputDatabase
 from ..models.qc import QcClassification, VariantAnnotation
 from ..models.sample import (
+    SAMPLE_VIEW_FIELDS,
     Comment,
     CommentInDatabase,
     MultipleSampleRecordsResponseModel,
     SampleInCreate,
     SampleInDatabase,
+    SampleProjection,
     SampleSummary,
+    SampleTagInput,
+    SampleView,
 )
+from ..redis.cluster_cache import invalidate_samples
 from ..redis.minhash import (
     schedule_remove_genome_signature,
     schedule_remove_genome_signature_from_index,
 )
 from ..utils import format_error_message
-from .errors import EntryNotFound, UpdateDocumentError
+from .errors import EntryNotFound, UpdateConflictError, UpdateDocumentError
 
 LOG = logging.getLogger(__name__)
 CURRENT_SCHEMA_VERSION = 1
+# fields that can not be changed with update_sample_fields
+PROTECTED_SAMPLE_FIELDS = {"sample_id", "created_at", "modified_at"}
+# attempts to annotate variants of a sample that is concurrently modified
+VARIANT_ANNOTATION_ATTEMPTS = 3
+
+# defaults of the optional fields, used when documents are read without validation
+SAMPLE_FIELD_DEFAULTS: Dict[str, Any] = jsonable_encoder(
+    {
+        name: field.get_default(call_default_factory=True)
+        for name, field in SampleInDatabase.model_fields.items()
+        if not field.is_required()
+    },
+    by_alias=False,
+)
+
+# validating uploaded results is CPU bound and is done in separate processes to
+# not stall the event loop, they are spawned to not inherit its connections
+sample_executor = (
+    ProcessPoolExecutor(
+        max_workers=settings.bulk_upload_workers, mp_context=get_context("spawn")
+    )
+    if settings.bulk_upload_workers > 0
+    else None
+)
 
 
 class TypingProfileAggregate(RWModel):  # pylint: disable=too-few-public-methods
@@ -325,42 +373,71 @@ async def get_samples(
     limit: int = 0,
     skip: int = 0,
     include: List[str] | None = None,
-) -> List[SampleInDatabase]:
-    """Get samples from database."""
+    fields: Sequence[str] | None = None,
+    compute_tags: bool = False,
+) -> MultipleSampleRecordsResponseModel | MultipleRecordsResponseModel:
+    """Get samples from database.
+
+    Samples are filtered on sample id and paginated in the query. If fields are
+    given only those are fetched and the samples are returned as documents
+    instead of validated samples. The stored tags are returned unless
+    compute_tags is set, then tags are computed for the returned samples.
+
+    :param db: Database connection
+    :type db: Database
+    :param limit: Max number of samples, 0 for no limit
+    :type limit: int
+    :param skip: Number of samples to skip
+    :type skip: int
+    :param include: Only get samples with these ids
+    :type include: List[str] | None
+    :param fields: Only get these fields
+    :type fields: Sequence[str] | None
+    :param compute_tags: Compute the tags instead of using the stored tags
+    :type compute_tags: bool
+    :return: Samples and the number of samples matching the query
+    :rtype: MultipleSampleRecordsResponseModel | MultipleRecordsResponseModel
+    """
+    query = {} if include is None else {"sample_id": {"$in": list(include)}}
+    n_samples = await db.sample_collection.count_documents(query)
 
-    # get number of samples in collection
-    n_samples = await db.sample_collection.count_documents({})
+    projection = None if fields is None else {field: 1 for field in fields}
+    # sort on id for stable pagination
+    cursor = db.sample_collection.find(
+        query, projection, limit=limit, skip=skip, sort=[("_id", ASCENDING)]
+    )
+    if fields is not None:
+        records = [{"id": str(samp.pop("_id")), **samp} async for samp in cursor]
+        return MultipleRecordsResponseModel(data=records, records_total=n_samples)
 
-    cursor = db.sample_collection.find(limit=limit, skip=skip)
     samp_objs = []
-    for samp in await cursor.to_list(None):
-        inserted_id = samp["_id"]
-        sample = SampleInDatabase(
-            id=str(inserted_id),
-            **samp,
-        )
-        # Compute tags
-        tags: TagList = compute_phenotype_tags(sample)
-        sample.tags = tags
-        if include is not None and sample.sample_id not in include:
-            continue
+    async for samp in cursor:
+        sample = SampleInDatabase(id=str(samp["_id"]), **samp)
+        if compute_tags:
+            sample.tags = compute_phenotype_tags(sample)
         samp_objs.append(sample)
     return MultipleSampleRecordsResponseModel(data=samp_objs, records_total=n_samples)
 
 
-async def create_sample(db: Database, sample: PipelineResult) -> SampleInDatabase:
-    """Create a new sample document in database from structured input."""
-    # validate data format
+def _sample_in_create(sample: PipelineResult, **fields) -> SampleInCreate:
+    """Create the database representation of a pipeline result."""
     try:
         tags = compute_phenotype_tags(sample)
     except ValueError as error:
         LOG.warning("Error when creating tags... skipping. %s", error)
         tags = []
-    sample_db_fmt = SampleInCreate(
+    return SampleInCreate(
         in_collections=[],
         tags=tags,
+        **fields,
         **sample.model_dump(),
     )
+
+
+async def create_sample(db: Database, sample: PipelineResult) -> SampleInDatabase:
+    """Create a new sample document in database from structured input."""
+    # validate data format
+    sample_db_fmt = _sample_in_create(sample)
     # store data in database
     doc = await db.sample_collection.insert_one(
         jsonable_encoder(sample_db_fmt, by_alias=False)
@@ -375,6 +452,175 @@ async def create_sample(db: Database, sample: PipelineResult) -> SampleInDatabas
     return db_obj
 
 
+class PreparedSample(NamedTuple):
+    """Sample document created from an uploaded result, or why it is invalid."""
+
+    sample_id: str | None
+    document: Dict[str, Any] | None = None
+    signature: bytes | None = None
+    error: str | None = None
+
+
+def prepare_samples(lines: Sequence[bytes]) -> List[PreparedSample]:
+    """Validate pipeline results and encode them as sample documents.
+
+    Each line is a JSON encoded pipeline result that can also include the
+    minhash signature of the sample, "minhash_signature", and the path to its
+    SKA index, "ska_index". The function is CPU bound and is run in a process
+    pool by the bulk upload.
+
+    :param lines: JSON encoded pipeline results
+    :type lines: Sequence[bytes]
+    :return: Prepared sample for each line
+    :rtype: List[PreparedSample]
+    """
+    prepared = []
+    for line in lines:
+        sample_id = None
+        try:
+            result = json.loads(line)
+            if not isinstance(result, dict):
+                raise ValueError("Pipeline result must be a JSON object")
+            if isinstance(result.get("sample_id"), str):
+                sample_id = result["sample_id"]
+            signature = result.pop("minhash_signature", None)
+            ska_index = result.pop("ska_index", None)
+            sample = PipelineResult.model_validate(result)
+            document = jsonable_encoder(
+                _sample_in_create(sample, ska_index=ska_index), by_alias=False
+            )
+        except ValueError as error:
+            prepared.append(PreparedSample(sample_id=sample_id, error=str(error)))
+            continue
+        if signature is not None and not isinstance(signature, str):
+            # signature was included as JSON and not as a string
+            signature = json.dumps(signature)
+        prepared.append(
+            PreparedSample(
+                sample_id=sample.sample_id,
+                document=document,
+                signature=None if signature is None else signature.encode("utf-8"),
+            )
+        )
+    return prepared
+
+
+async def prepare_samples_in_executor(lines: Sequence[bytes]) -> List[PreparedSample]:
+    """Prepare samples in the process pool, or in a thread if it is disabled."""
+    if sample_executor is None:
+        return await run_in_threadpool(prepare_samples, lines)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(sample_executor, prepare_samples, lines)
+
+
+async def create_samples(
+    db: Database, samples: Sequence[PreparedSample]
+) -> Dict[int, str]:
+    """Insert multiple prepared samples in one unordered batch.
+
+    All valid samples are inserted even if some of them could not be.
+
+    :param db: Database connection
+    :type db: Database
+    :param samples: Samples prepared for insertion
+    :type samples: Sequence[PreparedSample]
+    :return: Error message of each sample that was not inserted, by its position
+    :rtype: Dict[int, str]
+    """
+    positions = [
+        idx for idx, sample in enumerate(samples) if sample.document is not None
+    ]
+    if len(positions) == 0:
+        return {}
+    try:
+        await db.sample_collection.insert_many(
+            [samples[idx].document for idx in positions], ordered=False
+        )
+    except BulkWriteError as error:
+        return {
+            positions[write_error["index"]]: write_error["errmsg"]
+            for write_error in error.details["writeErrors"]
+        }
+    return {}
+
+
+async def add_genome_signature_jobs(db: Database, jobs: Dict[str, str]) -> None:
+    """Store the id of the job that adds the genome signature of each sample.
+
+    :param db: Database connection
+    :type db: Database
+    :param jobs: Signature job id of each sample
+    :type jobs: Dict[str, str]
+    """
+    if len(jobs) == 0:
+        return
+    modified_at = datetime.now()
+    await db.sample_collection.bulk_write(
+        [
+            UpdateOne(
+                {"sample_id": sample_id, "genome_signature": None},
+                {"$set": {"genome_signature": job_id, "modified_at": modified_at}},
+            )
+            for sample_id, job_id in jobs.items()
+        ],
+        ordered=False,
+    )
+
+
+async def update_tags_of_all_samples(
+    db: Database, executor: Executor, batch_size: int = 500, max_pending: int = 4
+) -> AsyncIterator[Tuple[int, int]]:
+    """Recompute the tags of all samples.
+
+    Samples are streamed from the database with only the fields the tags are
+    computed from. The tags of each batch are computed in the executor and
+    written with one bulk write, and at most max_pending batches are held in
+    memory at once.
+
+    :param db: Database connection
+    :type db: Database
+    :param executor: Executor the tags are computed in
+    :type executor: Executor
+    :param batch_size: Number of samples in each batch
+    :type batch_size: int
+    :param max_pending: Max number of batches that are computed concurrently
+    :type max_pending: int
+    :return: Number of updated samples and of samples without tags for each batch
+    :rtype: AsyncIterator[Tuple[int, int]]
+    """
+    loop = asyncio.get_running_loop()
+
+    async def _write_tags(pending_batch) -> Tuple[int, int]:
+        results = await pending_batch
+        updates = [
+            UpdateOne({"_id": doc_id}, {"$set": {"tags": tags}})
+            for doc_id, tags in results
+            if tags is not None
+        ]
+        if updates:
+            await db.sample_collection.bulk_write(updates, ordered=False)
+        return len(updates), len(results) - len(updates)
+
+    projection = {field: 1 for field in SampleTagInput.model_fields}
+    cursor = db.sample_collection.find({}, projection, batch_size=batch_size)
+    pending, batch = deque(), []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) == batch_size:
+            pending.append(
+                loop.run_in_executor(executor, compute_tags_for_documents, batch)
+            )
+            batch = []
+        if len(pending) == max_pending:
+            yield await _write_tags(pending.popleft())
+    if batch:
+        pending.append(
+            loop.run_in_executor(executor, compute_tags_for_documents, batch)
+        )
+    while pending:
+        yield await _write_tags(pending.popleft())
+
+
 async def update_sample(db: Database, updated_data: SampleInCreate) -> bool:
     """Replace an existing sample in the database with an updated version."""
     sample_id = updated_data.sample_id
@@ -395,6 +641,8 @@ async def update_sample(db: Database, updated_data: SampleInCreate) -> bool:
 
     # verify that only one sample found and one document was modified
     is_updated = doc.matched_count == 1 and doc.modified_count == 1
+    if is_updated:
+        await run_in_threadpool(invalidate_samples, [sample_id])
     return is_updated
 
 
@@ -415,6 +663,8 @@ async def delete_samples(db: Database, sample_ids: List[str]) -> bool:
     all_deleted = resp.deleted_count == len(sample_ids)
     LOG.info("Removing samples: %s; status: %s", ", ".join(sample_ids), all_deleted)
 
+    await run_in_threadpool(invalidate_samples, sample_ids)
+
     # remove sample from group if sample was deleted
     resp = await db.sample_group_collection.update_many(
         {"included_samples": {"$in": sample_ids}},  # filter
@@ -436,20 +686,119 @@ async def delete_samples(db: Database, sample_ids: List[str]) -> bool:
 
     # remove signature from database and reindex database
     if result["n_deleted"] > 0:
-        # remove signatures
+        # remove signatures, enqueued in a thread to not block the event loop
         job_ids = []
         for sample_id in sample_ids:
-            submitted_job = schedule_remove_genome_signature(sample_id)
+            submitted_job = await run_in_threadpool(
+                schedule_remove_genome_signature, sample_id
+            )
             job_ids.append(submitted_job.id)
         result["remove_signature_jobs"] = job_ids
         # remove reindex
-        index_job = schedule_remove_genome_signature_from_index(
-            sample_ids, depends_on=job_ids
+        index_job = await run_in_threadpool(
+            schedule_remove_genome_signature_from_index, sample_ids, depends_on=job_ids
         )
         result["update_index_job"] = index_job.id
     return result
 
 
+async def get_sample_fields(
+    db: Database, sample_id: str, fields: Sequence[str]
+) -> Dict[str, Any]:
+    """Get a subset of the fields of a sample without validating the whole sample.
+
+    The modified_at timestamp is always included to be used with
+    update_sample_fields.
+
+    :raises EntryNotFound: if the sample is not in the database
+    """
+    projection = {field: 1 for field in [*fields, "modified_at"]}
+    projection["_id"] = 0
+    db_obj = await db.sample_collection.find_one({"sample_id": sample_id}, projection)
+    if db_obj is None:
+        raise EntryNotFound(f"Sample {sample_id} not in database")
+    return db_obj
+
+
+@lru_cache(maxsize=None)
+def _sample_field_validator(field: str, is_item: bool) -> TypeAdapter:
+    """Get validator for a field of a sample, or for items of a list field."""
+    if field not in SampleInCreate.model_fields or field in PROTECTED_SAMPLE_FIELDS:
+        raise ValueError(f"Sample field {field} can not be updated")
+    annotation = SampleInCreate.model_fields[field].annotation
+    if is_item:
+        if get_origin(annotation) not in (list, List):
+            raise ValueError(f"Sample field {field} is not a list")
+        annotation = get_args(annotation)[0]
+    return TypeAdapter(annotation)
+
+
+def _db_timestamp() -> datetime:
+    """Get the current time with the millisecond precision of mongodb."""
+    now = datetime.now()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+async def update_sample_fields(
+    db: Database,
+    sample_id: str,
+    set_fields: Dict[str, Any] | None = None,
+    push_fields: Dict[str, Any] | None = None,
+    expected_modified_at: datetime | None = None,
+    expected_fields: Dict[str, Any] | None = None,
+) -> datetime:
+    """Update fields of a sample without replacing the whole document.
+
+    Only the updated values are validated, against the type of the field in
+    the sample model. If expected_modified_at is given the sample is only
+    updated if it has not been modified since, and if expected_fields is given
+    only if the fields still have the expected values.
+
+    :param db: Database connection
+    :type db: Database
+    :param sample_id: Sample id
+    :type sample_id: str
+    :param set_fields: Values of fields to set
+    :type set_fields: Dict[str, Any] | None
+    :param push_fields: Values to append to list fields
+    :type push_fields: Dict[str, Any] | None
+    :param expected_modified_at: Time the sample was last modified
+    :type expected_modified_at: datetime | None
+    :param expected_fields: Values the fields must have for the sample to be updated
+    :type expected_fields: Dict[str, Any] | None
+    :raises ValueError: if a field does not exist or has the wrong type
+    :raises EntryNotFound: if the sample is not in the database
+    :raises UpdateConflictError: if the sample has been modified since expected_modified_at
+        or the fields do not have the expected values
+    :return: The new modified_at timestamp
+    :rtype: datetime
+    """
+    now = _db_timestamp()
+    update = {"$set": {"modified_at": now}}
+    for field, value in (set_fields or {}).items():
+        value = _sample_field_validator(field, False).validate_python(value)
+        update["$set"][field] = jsonable_encoder(value, by_alias=False)
+    for field, value in (push_fields or {}).items():
+        value = _sample_field_validator(field, True).validate_python(value)
+        update.setdefault("$push", {})[field] = jsonable_encoder(value, by_alias=False)
+
+    query = {"sample_id": sample_id, **(expected_fields or {})}
+    if expected_modified_at is not None:
+        query["modified_at"] = expected_modified_at
+    resp = await db.sample_collection.update_one(query, update)
+    if resp.matched_count == 0:
+        is_conditional = expected_modified_at is not None or bool(expected_fields)
+        if is_conditional and await db.sample_collection.find_one(
+            {"sample_id": sample_id}, {"_id": 1}
+        ):
+            raise UpdateConflictError(
+                f"Sample {sample_id} has been modified by another request"
+            )
+        raise EntryNotFound(f"Sample {sample_id} not in database")
+    await run_in_threadpool(invalidate_samples, [sample_id])
+    return now
+
+
 async def get_sample(db: Database, sample_id: str) -> SampleInDatabase:
     """Get sample with sample_id."""
     db_obj: SampleInDatabase = await db.sample_collection.find_one(
@@ -466,6 +815,118 @@ async def get_sample(db: Database, sample_id: str) -> SampleInDatabase:
     return sample_obj
 
 
+def resolve_sample_fields(
+    view: SampleView | None = None,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+) -> List[str] | None:
+    """Get the fields of a sample to read from a named view and field lists.
+
+    The fields of the view and the included fields are combined, or all fields
+    are used if neither is given, before the excluded fields are removed. The
+    sample id is always included.
+
+    :param view: Named subset of fields
+    :type view: SampleView | None
+    :param include: Fields to include
+    :type include: Sequence[str]
+    :param exclude: Fields to exclude
+    :type exclude: Sequence[str]
+    :raises ValueError: if a field is not a field of a sample
+    :return: Fields to read, or None to read the complete sample
+    :rtype: List[str] | None
+    """
+    all_fields = [name for name in SampleProjection.model_fields if name != "id"]
+    unknown = set(include).union(exclude).difference(all_fields)
+    if unknown:
+        raise ValueError(f"Unknown sample fields: {', '.join(sorted(unknown))}")
+    if view is None and len(include) == 0 and len(exclude) == 0:
+        return None
+
+    fields = set(include)
+    if view is not None:
+        fields.update(SAMPLE_VIEW_FIELDS[view])
+    if len(fields) == 0:
+        fields.update(all_fields)
+    fields.difference_update(exclude)
+    fields.add("sample_id")
+    # keep the order of the model fields
+    return [name for name in all_fields if name in fields]
+
+
+async def get_sample_projection(
+    db: Database, sample_id: str, fields: Sequence[str]
+) -> SampleProjection:
+    """Get a sample with only a subset of its fields.
+
+    :param db: Database connection
+    :type db: Database
+    :param sample_id: Sample id
+    :type sample_id: str
+    :param fields: Fields to read
+    :type fields: Sequence[str]
+    :raises EntryNotFound: if the sample is not in the database
+    :return: Sample with the given fields
+    :rtype: SampleProjection
+    """
+    projection = {field: 1 for field in fields}
+    db_obj = await db.sample_collection.find_one({"sample_id": sample_id}, projection)
+    if db_obj is None:
+        raise EntryNotFound(f"Sample {sample_id} not in database")
+    return SampleProjection(id=str(db_obj.pop("_id")), **db_obj)
+
+
+def sample_document_from_db(
+    db_obj: Dict[str, Any], fields: Sequence[str] | None = None
+) -> Dict[str, Any]:
+    """Create a sample document from a stored document, without validating it.
+
+    Documents are validated when they are created or updated, so for reads it
+    is enough to fill in optional fields that are missing and drop fields that
+    are not part of the sample model. The document can be serialized directly
+    with orjson.
+
+    :param db_obj: Document as stored in the database
+    :type db_obj: Dict[str, Any]
+    :param fields: Only include these fields, missing fields are set to None
+    :type fields: Sequence[str] | None
+    :return: Sample document
+    :rtype: Dict[str, Any]
+    """
+    if fields is None:
+        document = {**SAMPLE_FIELD_DEFAULTS}
+        fields = SampleInDatabase.model_fields
+    else:
+        document = dict.fromkeys(fields)
+    document.update((key, value) for key, value in db_obj.items() if key in fields)
+    document["id"] = str(db_obj["_id"])
+    return document
+
+
+async def get_sample_document(
+    db: Database, sample_id: str, fields: Sequence[str] | None = None
+) -> Dict[str, Any]:
+    """Get a sample as it is stored in the database, without validating it.
+
+    See sample_document_from_db.
+
+    :param db: Database connection
+    :type db: Database
+    :param sample_id: Sample id
+    :type sample_id: str
+    :param fields: Only read these fields, missing fields are set to None
+    :type fields: Sequence[str] | None
+    :raises EntryNotFound: if the sample is not in the database
+    :return: Sample document
+    :rtype: Dict[str, Any]
+    """
+    projection = None if fields is None else {field: 1 for field in fields}
+    db_obj = await db.sample_collection.find_one({"sample_id": sample_id}, projection)
+    if db_obj is None:
+        raise EntryNotFound(f"Sample {sample_id} not in database")
+    return sample_document_from_db(db_obj, fields)
+
+
 async def add_comment(
     db: Database, sample_id: str, comment: Comment
 ) -> List[CommentInDatabase]:
@@ -543,144 +1004,135 @@ async def update_sample_qc_classification(
     return classification
 
 
-def update_variant_verificaton(variant, info):
-    """Update variant with selected annotations."""
-
-    if info.verified is not None:
-        LOG.debug("cals: %s", info)
-        variant = variant.model_copy(
-            update={"verified": info.verified, "reason": info.reason}
+def annotated_phenotypes(info: VariantAnnotation, username: str) -> List[PhenotypeInfo]:
+    """Create phenotypes annotated by a user."""
+    antibiotics_lookup = {ant.name: ant for ant in ANTIBIOTICS}
+    annotated_pheno = []
+    for phenotype in info.phenotypes or []:
+        # uppdate phenotypic annotation
+        if phenotype in antibiotics_lookup:
+            group = antibiotics_lookup[phenotype].family
+        else:
+            group = ""
+        annotated_pheno.append(
+            PhenotypeInfo(
+                name=phenotype,
+                group=group,
+                type=ElementType.AMR,
+                resistance_level=info.resistance_lvl,
+                annotation_type=AnnotationType.USER,
+                annotation_author=username,
+            )
         )
-    return variant
-
-
-def update_variant_phenotype(variant, info, username):
-    """Update variant with selected annotations"""
-
-    predicted_pheno = [
-        phe
-        for phe in variant.phenotypes
-        if phe.annotation_type == AnnotationType.TOOL.value
-    ]
-    if info.phenotypes is not None:
-        annotated_pheno = []
-        antibiotics_lookup = {ant.name: ant for ant in ANTIBIOTICS}
-        for phenotype in info.phenotypes:
-            # uppdate phenotypic annotation
-            if phenotype in antibiotics_lookup:
-                pheno = PhenotypeInfo(
-                    name=phenotype,
-                    group=antibiotics_lookup[phenotype].family,
-                    type=ElementType.AMR,
-                    resistance_level=info.resistance_lvl,
-                    annotation_type=AnnotationType.USER,
-                    annotation_author=username,
-                )
-            else:
-                pheno = PhenotypeInfo(
-                    name=phenotype,
-                    group="",
-                    type=ElementType.AMR,
-                    resistance_level=info.resistance_lvl,
-                    annotation_type=AnnotationType.USER,
-                    annotation_author=username,
-                )
-            annotated_pheno.append(pheno)
-        # update variant info
-        variant = variant.model_copy(
-            update={
-                "phenotypes": predicted_pheno + annotated_pheno,
+    return annotated_pheno
+
+
+def variant_annotation_updates(
+    sample_id: str, info: VariantAnnotation, username: str, modified_at: datetime
+) -> List[UpdateOne]:
+    """Create updates that annotate variants in place.
+
+    Variants are identified by "<software or variant type>-<variant id>" and are
+    updated with positional operators and array filters. Verification is set
+    and user annotated phenotypes are replaced while the phenotypes predicted
+    by the software are kept.
+
+    A field can not be pulled from and pushed to in the same update, so the
+    user annotated phenotypes are removed by the first update and the new ones
+    added by a second. The second update only matches the sample if it has not
+    been modified since the first update set modified_at.
+
+    :param sample_id: Sample id
+    :type sample_id: str
+    :param info: Variant annotation
+    :type info: VariantAnnotation
+    :param username: Name of the annotating user
+    :type username: str
+    :param modified_at: Time of the update, with millisecond precision
+    :type modified_at: datetime
+    :return: Ordered list of updates, empty if there is nothing to update
+    :rtype: List[UpdateOne]
+    """
+    variant_id_gr = defaultdict(list)
+    for variant_id in info.variant_ids:
+        group, variant_no = variant_id.split("-")[:2]
+        variant_id_gr[group].append(int(variant_no))
+
+    set_fields, pull_fields, push_fields = {}, {}, {}
+    array_filters = []
+    phenotypes = jsonable_encoder(annotated_phenotypes(info, username), by_alias=False)
+    for idx, (group, variant_ids) in enumerate(variant_id_gr.items()):
+        if group in ("snv_variants", "sv_variants"):
+            path = f"{group}.$[var{idx}]"
+        else:
+            # variants predicted by a software
+            path = f"element_type_result.$[res{idx}].result.variants.$[var{idx}]"
+            array_filters.append({f"res{idx}.software": group})
+        array_filters.append({f"var{idx}.id": {"$in": variant_ids}})
+        if info.verified is not None:
+            set_fields[f"{path}.verified"] = jsonable_encoder(info.verified)
+            set_fields[f"{path}.reason"] = jsonable_encoder(info.reason)
+        if info.phenotypes is not None:
+            pull_fields[f"{path}.phenotypes"] = {
+                "annotation_type": {"$ne": AnnotationType.TOOL.value}
             }
+            push_fields[f"{path}.phenotypes"] = {"$each": phenotypes}
+
+    if len(set_fields) == 0 and len(pull_fields) == 0:
+        return []
+    update = {"$set": {"modified_at": modified_at, **set_fields}}
+    if pull_fields:
+        update["$pull"] = pull_fields
+    updates = [UpdateOne({"sample_id": sample_id}, update, array_filters=array_filters)]
+    if push_fields:
+        updates.append(
+            UpdateOne(
+                {"sample_id": sample_id, "modified_at": modified_at},
+                {"$push": push_fields},
+                array_filters=array_filters,
+            )
         )
-    return variant
+    return updates
 
 
 async def update_variant_annotation_for_sample(
     db: Database, sample_id: str, classification: VariantAnnotation, username: str
 ) -> SampleInDatabase:
-    """Update annotations of variants for a sample."""
-    sample_info = await get_sample(db=db, sample_id=sample_id)
-    # create variant group lookup table
-    variant_id_gr = {
-        gr_name: [int(id.split("-")[1]) for id in ids]
-        for gr_name, ids in groupby(
-            classification.variant_ids, key=lambda variant: variant.split("-")[0]
-        )
-    }
-    # update element type results
-    upd_results = []
-    for pred_res in sample_info.element_type_result:
-        # just store results that are not modified
-        LOG.debug(
-            "sw: %s; gr_sw: %s; sw not in gr ? %s",
-            pred_res.software.value,
-            list(variant_id_gr),
-            pred_res.software.value not in variant_id_gr,
+    """Update annotations of variants for a sample.
+
+    Only the annotated variants are changed in the database, without reading
+    and writing back the other results of the sample. If the sample is modified
+    between removing the old and adding the new phenotypes, the annotation is
+    applied again so the variants never keep only the removal. Other requests
+    can read the sample in between the two updates.
+
+    :raises EntryNotFound: if the sample is not in the database
+    :raises UpdateDocumentError: if the sample was not modified
+    :raises UpdateConflictError: if the sample was modified by other requests
+        in every attempt
+    """
+    for _ in range(VARIANT_ANNOTATION_ATTEMPTS):
+        updates = variant_annotation_updates(
+            sample_id, classification, username, modified_at=_db_timestamp()
         )
-        if pred_res.software.value not in variant_id_gr:
-            upd_results.append(pred_res)
-            continue
-        # update individual variants
-        upd_variants = []
-        for variant in pred_res.result.variants:
-            # update varaint if its id is in the list
-            if variant.id in variant_id_gr[pred_res.software.value]:
-                variant = update_variant_verificaton(variant, classification)
-                variant = update_variant_phenotype(variant, classification, username)
-            upd_variants.append(variant)
-
-        # update prediction and add to list of updated results
-        upd_results.append(
-            pred_res.model_copy(
-                update={
-                    "result": pred_res.result.model_copy(
-                        update={"variants": upd_variants}
-                    )
-                }
-            )
+        if len(updates) == 0:
+            break
+        resp = await db.sample_collection.bulk_write(updates, ordered=True)
+        # verify successful update
+        # if sample is not fund
+        if resp.matched_count == 0:
+            raise EntryNotFound(sample_id)
+        # if not modifed
+        if resp.modified_count == 0:
+            raise UpdateDocumentError(sample_id)
+        if resp.matched_count == len(updates):
+            break
+        LOG.debug("Sample %s was modified while annotated, retrying", sample_id)
+    else:
+        raise UpdateConflictError(
+            f"Sample {sample_id} has been modified by another request"
         )
-    updated_data = {"element_type_result": upd_results}
-    # update SV variants
-    for variant_type in ["snv_variants", "sv_variants"]:
-        if variant_type in variant_id_gr:
-            upd_variants = []
-            for variant in getattr(sample_info, variant_type):
-                if variant.id in variant_id_gr[variant_type]:
-                    # update variant classification and annotation
-                    LOG.error(
-                        "CLS: %s; Variant before update: %s", classification, variant
-                    )
-                    variant = update_variant_verificaton(variant, classification)
-                    variant = update_variant_phenotype(
-                        variant, classification, username
-                    )
-                    LOG.error("Variant after update: %s", variant)
-                upd_variants.append(variant)
-            updated_data[variant_type] = upd_variants
-
-    # update phenotypic prediction information in the database
-    update_obj = await db.sample_collection.update_one(
-        {"sample_id": sample_id},
-        {
-            "$set": {
-                "modified_at": datetime.now(),
-                **{
-                    key: jsonable_encoder(value, by_alias=False)
-                    for key, value in updated_data.items()
-                },
-            }
-        },
-    )
-    # verify successful update
-    # if sample is not fund
-    if not update_obj.matched_count == 1:
-        raise EntryNotFound(sample_id)
-    # if not modifed
-    if not update_obj.modified_count == 1:
-        raise UpdateDocumentError(sample_id)
-    # make a copy of updated result and return it
-    upd_sample_info = sample_info.model_copy(update=updated_data)
-    return upd_sample_info
+    return await get_sample(db=db, sample_id=sample_id)
 
 
 async def add_location(
@@ -757,6 +1209,24 @@ async def get_typing_profiles(
     return results
 
 
+async def get_sample_data_versions(
+    db: Database, sample_ids: Sequence[str]
+) -> Dict[str, str | None]:
+    """Get the data version of samples, used for identifying cached results.
+
+    Samples that are not in the database have the version None.
+    """
+    versions = {sample_id: None for sample_id in sample_ids}
+    projection = {"_id": 0, "sample_id": 1, "modified_at": 1}
+    cursor = db.sample_collection.find({"sample_id": {"$in": sample_ids}}, projection)
+    async for sample in cursor:
+        modified_at = sample.get("modified_at")
+        versions[sample["sample_id"]] = (
+            None if modified_at is None else str(modified_at)
+        )
+    return versions
+
+
 async def get_signature_path_for_samples(
     db: Database, sample_ids: list[str]
 ) -> TypingProfileOutput:
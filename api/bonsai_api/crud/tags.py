@@ -1,11 +1,14 @@
 """Functions for computing tags."""
 
 import logging
+from typing import Any, Dict, List, Sequence, Tuple
 
+from fastapi.encoders import jsonable_encoder
 from prp.models.phenotype import ElementType, ElementTypeResult
 from prp.models.typing import TypingMethod
+from pydantic import ValidationError
 
-from ..models.sample import SampleInDatabase
+from ..models.sample import SampleInDatabase, SampleTagInput
 from ..models.tags import (
     ResistanceTag,
     Tag,
@@ -183,3 +186,28 @@ def compute_phenotype_tags(sample: SampleInDatabase) -> TagList:
         if major_spp in tag_func["species"]:
             tag_func["func"](tags, sample)
     return tags
+
+
+def compute_tags_for_documents(
+    documents: Sequence[Dict[str, Any]],
+) -> List[Tuple[Any, List[Dict[str, Any]] | None]]:
+    """Compute the tags of sample documents projected to the fields of SampleTagInput.
+
+    The function is CPU bound and is run in a process pool when the tags of
+    all samples are updated.
+
+    :param documents: Sample documents
+    :type documents: Sequence[Dict[str, Any]]
+    :return: Document id and encoded tags, or None if the tags could not be computed
+    :rtype: List[Tuple[Any, List[Dict[str, Any]] | None]]
+    """
+    results = []
+    for document in documents:
+        try:
+            tags = compute_phenotype_tags(SampleTagInput.model_validate(document))
+        except (ValueError, ValidationError) as error:
+            LOG.warning("Could not compute tags for %s; %s", document["_id"], error)
+            results.append((document["_id"], None))
+            continue
+        results.append((document["_id"], jsonable_encoder(tags)))
+    return results
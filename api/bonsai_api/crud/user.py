@@ -1,15 +1,17 @@
 """User CRUD operations."""
 
 import logging
-from typing import Annotated, List
+import time
+from functools import lru_cache
+from typing import Annotated, Dict, FrozenSet, List, Tuple
 
 from fastapi import Depends, HTTPException, Security, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from jose import JWTError, jwt
 
-from ..auth import get_password_hash, verify_password
-from ..config import ALGORITHM, USER_ROLES, settings
+from ..auth import get_password_hash, run_in_auth_executor, verify_password
+from ..config import ALGORITHM, ROLE_PERMISSIONS, settings
 from ..db import Database, get_db
 from ..extensions.ldap_extension import ldap_connection
 from ..models.auth import TokenData
@@ -24,6 +26,45 @@ from .errors import EntryNotFound, UpdateDocumentError
 LOG = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", scopes={})
 
+# authenticated users by username, with the time they were cached
+USER_CACHE_MAX_ENTRIES = 1000
+_user_cache: Dict[str, Tuple[float, UserInputDatabase]] = {}
+
+
+def get_cached_user(username: str) -> UserInputDatabase | None:
+    """Get authenticated user from the cache if it has not expired."""
+    entry = _user_cache.get(username)
+    if entry is None:
+        return None
+    cached_at, user = entry
+    if time.monotonic() - cached_at > settings.user_cache_ttl:
+        _user_cache.pop(username, None)
+        return None
+    return user
+
+
+def cache_user(user: UserInputDatabase) -> None:
+    """Add authenticated user to the cache."""
+    if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+        # remove the oldest entry, dicts keep insertion order
+        _user_cache.pop(next(iter(_user_cache)), None)
+    _user_cache[user.username] = (time.monotonic(), user)
+
+
+def invalidate_cached_user(username: str) -> None:
+    """Remove user from the cache when it has been changed.
+
+    Each API process has its own cache, other processes use the old user
+    information until it expires.
+    """
+    _user_cache.pop(username, None)
+
+
+@lru_cache(maxsize=128)
+def get_role_permissions(roles: Tuple[str, ...]) -> FrozenSet[str]:
+    """Get the combined permissions of a set of roles."""
+    return frozenset().union(*(ROLE_PERMISSIONS.get(role, ()) for role in roles))
+
 
 async def get_user(db_obj: Database, username: str) -> UserInputDatabase:
     """Get user from database"""
@@ -37,6 +78,7 @@ async def get_user(db_obj: Database, username: str) -> UserInputDatabase:
 async def delete_user(db_obj: Database, username: str):
     """Delete user from the database"""
     resp = await db_obj.user_collection.delete_one({"username": username})
+    invalidate_cached_user(username)
     if resp.deleted_count == 0:
         raise EntryNotFound(username)
     return username
@@ -49,7 +91,9 @@ async def update_user(db_obj: Database, username: str, user: UserInputCreate):
     if len(user.password) > 0:
         # create hash for new password
         LOG.info("Changed password for %s", username)
-        new_user_info["hashed_password"] = get_password_hash(user.password)
+        new_user_info["hashed_password"] = await run_in_auth_executor(
+            get_password_hash, user.password
+        )
 
     user_in_db = await get_user(db_obj, username=username)
     # update changed fields in created user object
@@ -57,6 +101,7 @@ async def update_user(db_obj: Database, username: str, user: UserInputCreate):
     resp = await db_obj.user_collection.replace_one(
         {"username": username}, upd_user_info.model_dump()
     )
+    invalidate_cached_user(username)
     if resp.matched_count == 0:
         raise EntryNotFound(username)
     if resp.modified_count == 0:
@@ -66,7 +111,7 @@ async def update_user(db_obj: Database, username: str, user: UserInputCreate):
 async def create_user(db_obj: Database, user: UserInputCreate) -> UserOutputDatabase:
     """Create new user in the database."""
     # create hash for password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_in_auth_executor(get_password_hash, user.password)
     user_db_fmt: UserInputDatabase = UserInputDatabase(
         hashed_password=hashed_password, **user.model_dump()
     )
@@ -104,10 +149,14 @@ async def authenticate_user(db_obj: Database, username: str, password: str) -> b
 
     # use authenticate users with an LDAP server
     if settings.use_ldap_auth:
-        is_authenticated = ldap_connection.authenticate(username, password)
+        is_authenticated = await run_in_auth_executor(
+            ldap_connection.authenticate, username, password
+        )
     else:
         # use username and password to authenticate users
-        is_authenticated = verify_password(password, user.hashed_password)
+        is_authenticated = await run_in_auth_executor(
+            verify_password, password, user.hashed_password
+        )
     return is_authenticated
 
 
@@ -141,14 +190,16 @@ async def get_current_user(
     except JWTError as error:
         raise credentials_exception from error
 
-    try:
-        user: UserOutputDatabase = await get_user(db, username=token_data.username)
-    except EntryNotFound as error:
-        raise credentials_exception from error
+    # use cached user to avoid querying the database on every request
+    user = get_cached_user(token_data.username)
+    if user is None:
+        try:
+            user = await get_user(db, username=token_data.username)
+        except EntryNotFound as error:
+            raise credentials_exception from error
+        cache_user(user)
+    users_all_permissions = get_role_permissions(tuple(user.roles))
     for scope in security_scopes.scopes:
-        users_all_permissions = {
-            perm for user_role in user.roles for perm in USER_ROLES.get(user_role, [])
-        }
         if not scope in users_all_permissions:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -159,7 +210,6 @@ async def get_current_user(
 
 
 async def get_current_active_user(
-    db: Database = Depends(get_db),
     current_user: UserOutputDatabase = Security(get_current_user, scopes=["users:me"]),
 ) -> UserOutputDatabase | None:
     """Get current active user."""
@@ -198,6 +248,7 @@ async def add_samples_to_user_basket(
         },
     )
 
+    invalidate_cached_user(current_user.username)
     # verify update
     if not update_obj.matched_count == 1:
         raise EntryNotFound(current_user.username)
@@ -225,6 +276,7 @@ async def remove_samples_from_user_basket(
         },
     )
 
+    invalidate_cached_user(current_user.username)
     # verify update
     if not update_obj.matched_count == 1:
         raise EntryNotFound(current_user.username)
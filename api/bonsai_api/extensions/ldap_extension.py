@@ -4,6 +4,10 @@ Implementation is inspired from, https://github.com/ContinuumIO/flask-ldap-login
 """
 
 import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator
 
 from ldap3 import (
     ALL,
@@ -18,6 +22,7 @@ from ldap3 import (
 )
 from ldap3.core.exceptions import (
     LDAPBindError,
+    LDAPException,
     LDAPInvalidDnError,
     LDAPInvalidFilterError,
 )
@@ -49,11 +54,22 @@ def is_valid_dn(username: str) -> bool:
 
 
 class LDAPConnection:
-    """Manage connection and authentication to a LDAP server."""
+    """Manage connection and authentication to a LDAP server.
 
-    def __init__(self) -> None:
+    Service connections, bound with the BIND_DN, are kept in a pool and reused
+    between logins. User credentials are verified by rebinding a pooled
+    connection as the user, and the connection is rebound as the service
+    account before it is returned to the pool. A connection is only used by
+    one thread at a time.
+    """
+
+    def __init__(self, pool_size: int = settings.ldap_pool_size) -> None:
         self.ldap_connection = None
         self.ldap_server = None
+        self.pool_size = pool_size
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+        self._n_connections = 0
+        self._pool_lock = threading.Lock()
 
     def init_app(self):
         # setup TLS
@@ -104,16 +120,76 @@ class LDAPConnection:
         )
         return ldap_conn
 
-    @property
-    def connection(self):
-        if self.ldap_connection is None:
-            self.ldap_connection = self.connect(
+    def _connect_service_account(self):
+        """Connect to the LDAP server as the BIND_DN user."""
+        return self.connect(
+            user=settings.ldap_bind_dn,
+            password=settings.ldap_secret,
+            anonymous=settings.ldap_bind_dn is None or settings.ldap_secret is None,
+        )
+
+    def _rebind_service_account(self, conn) -> None:
+        """Rebind connection as the BIND_DN user."""
+        if settings.ldap_bind_dn is None or settings.ldap_secret is None:
+            conn.user, conn.password = None, None
+            conn.rebind(authentication=ANONYMOUS, read_server_info=False)
+        else:
+            conn.rebind(
                 user=settings.ldap_bind_dn,
                 password=settings.ldap_secret,
-                anonymous=settings.ldap_bind_dn is None or settings.ldap_secret is None,
+                read_server_info=False,
             )
+
+    @property
+    def connection(self):
+        if self.ldap_connection is None:
+            self.ldap_connection = self._connect_service_account()
         return self.ldap_connection
 
+    @contextmanager
+    def service_connection(self) -> Iterator[Connection]:
+        """Borrow a service connection from the pool.
+
+        A new connection is opened if the pool is empty and has not reached its
+        max size, otherwise it waits for a connection to be returned. Connections
+        that raised an LDAP error are closed instead of being returned.
+        """
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_connect = self._n_connections < self.pool_size
+                if can_connect:
+                    self._n_connections += 1
+            if can_connect:
+                try:
+                    conn = self._connect_service_account()
+                except Exception:
+                    with self._pool_lock:
+                        self._n_connections -= 1
+                    raise
+            else:
+                conn = self._pool.get(timeout=settings.ldap_connection_timeout)
+        try:
+            yield conn
+        except LDAPException:
+            self._discard(conn)
+            raise
+        except BaseException:
+            self._pool.put(conn)
+            raise
+        else:
+            self._pool.put(conn)
+
+    def _discard(self, conn) -> None:
+        """Close a broken connection and free its slot in the pool."""
+        with self._pool_lock:
+            self._n_connections -= 1
+        try:
+            conn.unbind()
+        except LDAPException:
+            pass
+
     def authenticate(
         self,
         username: str,
@@ -123,41 +199,67 @@ class LDAPConnection:
         search_filter: str | None = settings.ldap_search_filter,
         search_scope=SUBTREE,
     ):
-        is_authenticated: bool = False
-        if not is_valid_dn(username):
-            # try to lookup user DN
-            user_filter = f"({attribute}={username})"
-            LOG.info("Invalid DN provided, %s, try lookup DN", username)
-            if search_filter is not None:
-                user_filter = f"(&{user_filter}{search_filter})"
-
-            # if lookup fail return false
-            try:
-                self.connection.search(
-                    search_base=base_dn,
-                    search_filter=user_filter,
-                    search_scope=search_scope,
-                    attributes=[attribute],
-                )
-                response = self.connection.response
-                username = response[0]["dn"]  # update DN
-            except (LDAPInvalidDnError, LDAPInvalidFilterError, IndexError) as error:
-                LOG.warning(
-                    "Failed to lookup DN for user %s; error: %s", username, error
-                )
-                return False
+        """Verify user credentials by binding as the user.
 
+        The DN of the user is looked up with the search attribute if the username
+        is not a valid DN.
+        """
+        # an empty password would result in an unauthenticated bind
+        if not password:
+            return False
         try:
-            conn_obj = self.connect(username, password)
-            conn_obj.unbind()
-            is_authenticated = True
-        except LDAPBindError as error:
-            LOG.warning("Failed to authenticate user: %s; error: %s", username, error)
-            is_authenticated = False
-        return is_authenticated
+            with self.service_connection() as conn:
+                if not is_valid_dn(username):
+                    # try to lookup user DN
+                    user_filter = f"({attribute}={username})"
+                    LOG.info("Invalid DN provided, %s, try lookup DN", username)
+                    if search_filter is not None:
+                        user_filter = f"(&{user_filter}{search_filter})"
+
+                    # if lookup fail return false
+                    try:
+                        conn.search(
+                            search_base=base_dn,
+                            search_filter=user_filter,
+                            search_scope=search_scope,
+                            attributes=[attribute],
+                        )
+                        username = conn.response[0]["dn"]  # update DN
+                    except (
+                        LDAPInvalidDnError,
+                        LDAPInvalidFilterError,
+                        IndexError,
+                    ) as error:
+                        LOG.warning(
+                            "Failed to lookup DN for user %s; error: %s",
+                            username,
+                            error,
+                        )
+                        return False
+
+                # verify the credentials on the pooled connection
+                try:
+                    is_authenticated = conn.rebind(
+                        user=username, password=password, read_server_info=False
+                    )
+                except LDAPBindError as error:
+                    LOG.warning(
+                        "Failed to authenticate user: %s; error: %s", username, error
+                    )
+                    is_authenticated = False
+                self._rebind_service_account(conn)
+        except queue.Empty:
+            LOG.error("No LDAP connection available for authenticating %s", username)
+            return False
+        return bool(is_authenticated)
 
     def teardown(self):
-        """Teardown admin connection to LDAP server."""
+        """Teardown admin connections to LDAP server."""
+        while True:
+            try:
+                self._discard(self._pool.get_nowait())
+            except queue.Empty:
+                break
         if self.ldap_connection is not None:
             self.ldap_connection.unbind()
         else:
@@ -6,20 +6,27 @@ import mimetypes
 import os
 import pathlib
 import re
-from collections import defaultdict
+import secrets
+from collections import OrderedDict, defaultdict
+from email.utils import formatdate, parsedate_to_datetime
 from enum import Enum
-from typing import List, Tuple
+from typing import AsyncIterator, Dict, List, Tuple
+from urllib.parse import quote
 
+import anyio
 import pandas as pd
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from prp.models.phenotype import GeneBase, PredictionSoftware, VariantBase
 from prp.models.typing import TypingMethod
 
+from .config import settings
 from .models.qc import SampleQcClassification
 from .models.sample import SampleInDatabase
 
 LOG = logging.getLogger(__name__)
-BYTE_RANGE_RE = re.compile(r"bytes=(\d+)-(\d+)?$")
+BYTE_RANGE_SPEC_RE = re.compile(r"^\s*(\d*)-(\d*)\s*$")
+MAX_BYTE_RANGES = 50
+FILE_CHUNK_SIZE = 64 * 1024  # bytes
 
 TARGETED_ANTIBIOTICS = {
     "rifampicin": {"abbrev": "rif", "split_res_level": False},
@@ -67,62 +74,333 @@ def is_file_readable(file_path: str) -> bool:
     return True
 
 
-def parse_byte_range(byte_range: str) -> Tuple[int, int]:
-    """Returns the two numbers in 'bytes=123-456' or throws ValueError.
-    The last number or both numbers may be None.
-    """
-    if byte_range.strip() == "":
-        return None, None
+def parse_byte_ranges(byte_range: str) -> List[Tuple[int | None, int | None]]:
+    """Parse one or more byte ranges, ie 'bytes=0-99,200-,-500'.
 
-    m = BYTE_RANGE_RE.match(byte_range)
-    if not m:
-        raise InvalidRangeError(f"Invalid byte range {byte_range}")
+    The first number is None for suffix ranges, the last N bytes of a file, and
+    the last number is None for ranges to the end of the file.
 
-    first, last = [x and int(x) for x in m.groups()]
-    if last and last < first:
+    :param byte_range: Value of the Range header
+    :type byte_range: str
+    :raises InvalidRangeError: if the header is malformed or has too many ranges
+    :return: List of ranges
+    :rtype: List[Tuple[int | None, int | None]]
+    """
+    unit, _, ranges = byte_range.partition("=")
+    if unit.strip() != "bytes" or ranges.strip() == "":
         raise InvalidRangeError(f"Invalid byte range {byte_range}")
-    return first, last
+    parsed = []
+    for spec in ranges.split(","):
+        m = BYTE_RANGE_SPEC_RE.match(spec)
+        if not m or m.groups() == ("", ""):
+            raise InvalidRangeError(f"Invalid byte range {byte_range}")
+        first, last = [int(x) if x else None for x in m.groups()]
+        if first is not None and last is not None and last < first:
+            raise InvalidRangeError(f"Invalid byte range {byte_range}")
+        parsed.append((first, last))
+    if len(parsed) > MAX_BYTE_RANGES:
+        raise InvalidRangeError(f"Too many byte ranges, max is {MAX_BYTE_RANGES}")
+    return parsed
+
+
+def _resolve_byte_ranges(
+    ranges: List[Tuple[int | None, int | None]], file_len: int
+) -> List[Tuple[int, int]]:
+    """Convert ranges to inclusive offsets and drop ranges outside the file."""
+    resolved = []
+    for first, last in ranges:
+        if first is None:
+            # suffix range
+            if last == 0:
+                continue
+            first, last = max(file_len - last, 0), file_len - 1
+        elif first >= file_len:
+            continue
+        elif last is None or last >= file_len:
+            last = file_len - 1
+        resolved.append((first, last))
+    if len(resolved) == 0:
+        raise RangeOutOfBoundsError("Requested Range Not Satisfiable")
+    return resolved
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """Create an ETag from the modification time and size of a file."""
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _etag_matches(etag: str, header: str, weak: bool = True) -> bool:
+    """Check if an ETag is in an If-None-Match or If-Range header."""
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            if not weak:
+                continue
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _is_modified_since(mtime: float, header: str) -> bool:
+    """Check if a file was modified after the date of an If-Modified-Since header."""
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return True  # ignore invalid dates
+    return int(mtime) > since.timestamp()
 
 
-def send_partial_file(path: str, range_header: str) -> Response:
-    """Send partial file as a response.
+def _read_head(path: str | pathlib.Path, length: int) -> bytes:
+    """Read the first bytes of a file."""
+    with open(path, "rb") as file_handle:
+        return file_handle.read(length)
 
-    :param path: File path
-    :type path: str
-    :param range_header: byte range, ie bytes=123-456
-    :type range_header: str
-    :raises RangeOutOfBoundsError: Error if the byte range is out of bounds.
-    :return: Exception
-    :rtype: Response
-    """
-    byte_range = parse_byte_range(range_header)
-    first, last = byte_range
 
-    data = None
-    with open(path, "rb") as file_handle:
-        fs = os.fstat(file_handle.fileno())
-        file_len = fs[6]
-        if first >= file_len:
-            raise RangeOutOfBoundsError("Requested Range Not Satisfiable")
+class FileBlockCache:
+    """LRU cache of small files and of the first block of large files.
 
-        if last is None or last >= file_len:
-            last = file_len - 1
-        response_length = last - first + 1
+    IGV reads index files, annotations and the header of alignment files at the
+    start of every session. Entries are keyed by path, modification time and
+    size so a changed file is read again, and the cache is bounded by the total
+    size of the cached data.
+    """
 
-        file_handle.seek(first)
-        data = file_handle.read(response_length)
+    def __init__(
+        self,
+        max_size: int = settings.file_cache_max_size,
+        max_file_size: int = settings.file_cache_max_file_size,
+        head_size: int = settings.file_cache_head_size,
+    ):
+        """Setup cache.
+
+        :param max_size: Max total size of cached data, in bytes, 0 disables the cache
+        :param max_file_size: Cache whole files up to this size, in bytes
+        :param head_size: Cache the first bytes of larger files, in bytes
+        """
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+        self.head_size = head_size
+        self._entries: OrderedDict[Tuple[str, int, int], bytes] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def cached_length(self, file_len: int) -> int:
+        """Get the number of bytes from the start of a file that can be cached."""
+        length = file_len if file_len <= self.max_file_size else self.head_size
+        return min(length, file_len) if length <= self.max_size else 0
+
+    async def get(
+        self,
+        path: str | pathlib.Path,
+        stat_result: os.stat_result,
+        first: int,
+        last: int,
+    ) -> bytes | None:
+        """Get bytes first to last, inclusive, of a file.
+
+        The cached block is read from disk on a miss. None is returned if the
+        range is outside of what can be cached.
+        """
+        if last >= self.cached_length(stat_result.st_size):
+            return None
+        key = (str(path), stat_result.st_mtime_ns, stat_result.st_size)
+        block = self._entries.get(key)
+        if block is None:
+            self.misses += 1
+            block = await anyio.to_thread.run_sync(
+                _read_head, path, self.cached_length(stat_result.st_size)
+            )
+            self._put(key, block)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return block[first : last + 1]
+
+    def _put(self, key: Tuple[str, int, int], block: bytes) -> None:
+        """Add block and evict old versions of the file and least recently used blocks."""
+        for old_key in [k for k in self._entries if k[0] == key[0]]:
+            self._size -= len(self._entries.pop(old_key))
+        self._entries[key] = block
+        self._size += len(block)
+        while self._size > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def clear(self) -> None:
+        """Remove all cached blocks and reset the statistics."""
+        self._entries.clear()
+        self._size = 0
+        self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int | float]:
+        """Get cache usage and hit rate."""
+        n_requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / n_requests if n_requests else 0.0,
+            "entries": len(self._entries),
+            "size": self._size,
+            "max_size": self.max_size,
+        }
+
+
+file_cache = FileBlockCache()
+
+
+async def iter_file_range(
+    path: str | pathlib.Path, first: int, last: int, chunk_size: int = FILE_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Read bytes first to last, inclusive, of a file in chunks without blocking."""
+    async with await anyio.open_file(path, "rb") as file_handle:
+        await file_handle.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = await file_handle.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def _iter_multipart_ranges(
+    path: str | pathlib.Path,
+    parts: List[Tuple[bytes, int, int, bytes | None]],
+    boundary: str,
+) -> AsyncIterator[bytes]:
+    """Stream ranges of a file as a multipart/byteranges body."""
+    for part_header, first, last, block in parts:
+        yield part_header
+        if block is not None:
+            yield block
+        else:
+            async for chunk in iter_file_range(path, first, last):
+                yield chunk
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+def _content_disposition(filename: str) -> str:
+    """Format the Content-Disposition header of a file attachment."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+async def send_file(
+    path: str | pathlib.Path,
+    range_header: str | None = None,
+    if_none_match: str | None = None,
+    if_modified_since: str | None = None,
+    if_range: str | None = None,
+    filename: str | None = None,
+) -> Response:
+    """Send a file, or byte ranges of it, as a streaming response.
+
+    The file is read in chunks in a worker thread to not block the event loop
+    or load large ranges in memory. Small files and the start of large files
+    are served from the file cache. Responses have strong ETag and Last-Modified
+    headers and conditional requests are answered with 304 Not Modified.
+    Multiple ranges are sent as a multipart/byteranges response.
 
-    response_headers = {
-        "Content-type": "application/octet-stream",
-        "Accept-Ranges": "bytes",
-        "Content-Range": f"bytes {first}-{last}/{file_len}",
-        "Content-Length": str(response_length),
+    :param path: File path
+    :type path: str | pathlib.Path
+    :param range_header: byte ranges, ie bytes=123-456
+    :type range_header: str | None
+    :param if_none_match: Value of If-None-Match header
+    :type if_none_match: str | None
+    :param if_modified_since: Value of If-Modified-Since header
+    :type if_modified_since: str | None
+    :param if_range: Value of If-Range header
+    :type if_range: str | None
+    :param filename: File name to send in the Content-Disposition header
+    :type filename: str | None
+    :raises InvalidRangeError: Error if the byte range is malformed.
+    :raises RangeOutOfBoundsError: Error if the byte range is out of bounds.
+    :return: File response
+    :rtype: Response
+    """
+    stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    file_len = stat_result.st_size
+    validators = {
+        "ETag": file_etag(stat_result),
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
     }
-    return Response(
-        content=data,
+    # answer conditional requests, If-None-Match takes precedence
+    if if_none_match is not None:
+        if _etag_matches(validators["ETag"], if_none_match):
+            return Response(status_code=304, headers=validators)
+    elif if_modified_since is not None:
+        if not _is_modified_since(stat_result.st_mtime, if_modified_since):
+            return Response(status_code=304, headers=validators)
+
+    # send the whole file if the range is for another version of the file
+    if range_header is not None and if_range is not None:
+        if if_range.strip().startswith(("W/", '"')):
+            is_same = _etag_matches(validators["ETag"], if_range, weak=False)
+        else:
+            is_same = if_range.strip() == validators["Last-Modified"]
+        if not is_same:
+            range_header = None
+
+    if range_header is None or range_header.strip() == "":
+        # cached and streamed files are sent with the same headers
+        headers = {**validators, "Accept-Ranges": "bytes"}
+        if filename is not None:
+            headers["Content-Disposition"] = _content_disposition(filename)
+        media_type = mimetypes.guess_type(str(filename or path))[0] or "text/plain"
+        content = None
+        if file_len > 0:
+            content = await file_cache.get(path, stat_result, 0, file_len - 1)
+        if content is None:
+            return FileResponse(
+                path, media_type=media_type, stat_result=stat_result, headers=headers
+            )
+        return Response(content=content, media_type=media_type, headers=headers)
+
+    ranges = _resolve_byte_ranges(parse_byte_ranges(range_header), file_len)
+    media_type = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+    headers = {**validators, "Accept-Ranges": "bytes"}
+    if len(ranges) == 1:
+        first, last = ranges[0]
+        headers["Content-Range"] = f"bytes {first}-{last}/{file_len}"
+        headers["Content-Length"] = str(last - first + 1)
+        block = await file_cache.get(path, stat_result, first, last)
+        if block is not None:
+            return Response(
+                content=block, status_code=206, media_type=media_type, headers=headers
+            )
+        return StreamingResponse(
+            iter_file_range(path, first, last),
+            status_code=206,
+            media_type=media_type,
+            headers=headers,
+        )
+
+    # multiple ranges
+    boundary = secrets.token_hex(16)
+    parts = []
+    content_length = len(f"--{boundary}--\r\n")
+    for first, last in ranges:
+        part_header = (
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {first}-{last}/{file_len}\r\n\r\n"
+        ).encode()
+        block = await file_cache.get(path, stat_result, first, last)
+        parts.append((part_header, first, last, block))
+        content_length += len(part_header) + last - first + 1 + 2
+    headers["Content-Length"] = str(content_length)
+    return StreamingResponse(
+        _iter_multipart_ranges(path, parts, boundary),
         status_code=206,
-        media_type=mimetypes.guess_type(path)[0],
-        headers=response_headers,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers,
     )
 
 
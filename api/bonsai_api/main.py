@@ -6,8 +6,10 @@ import logging.config as logging_config
 from fastapi import FastAPI
 
 from .config import settings
+from .crud.sample import sample_executor
 from .extensions.ldap_extension import ldap_connection
 from .internal.middlewares import configure_cors
+from .redis import redis
 from .routers import (
     auth,
     cluster,
@@ -55,6 +57,9 @@ if not settings.api_authentication:
 if settings.use_ldap_auth:
     app.add_event_handler("startup", ldap_connection.init_app)
     app.add_event_handler("shutdown", ldap_connection.teardown)
+app.add_event_handler("shutdown", redis.close)
+if sample_executor is not None:
+    app.add_event_handler("shutdown", sample_executor.shutdown)
 
 
 # add api routes
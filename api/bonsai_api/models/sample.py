@@ -1,6 +1,7 @@
 """Data model definition of input/ output data"""
 
 from datetime import datetime
+from enum import Enum
 from typing import Dict, List, Optional, Union
 
 from prp.models import PipelineResult
@@ -13,9 +14,12 @@ from prp.models.phenotype import (
     VariantBase,
     VirulenceGene,
 )
-from prp.models.species import SpeciesPrediction
+from prp.models.sample import MethodIndex as PipelineMethodIndex
+from prp.models.species import SpeciesPrediction, SppMethodIndex
 from prp.models.typing import (
+    EmmTypingMethodIndex,
     ResultLineageBase,
+    ShigaTypingMethodIndex,
     TbProfilerLineage,
     TypingMethod,
     TypingResultCgMlst,
@@ -23,11 +27,16 @@ from prp.models.typing import (
     TypingResultMlst,
     TypingSoftware,
 )
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
 
 from ..models.qc import SampleQcClassification, VaraintRejectionReason
 from ..models.tags import Tag
-from .base import DBModelMixin, ModifiedAtRWModel, MultipleRecordsResponseModel
+from .base import (
+    DBModelMixin,
+    ModifiedAtRWModel,
+    MultipleRecordsResponseModel,
+    RWModel,
+)
 from .qc import QcClassification
 
 CURRENT_SCHEMA_VERSION = 1
@@ -134,6 +143,17 @@ class SampleInDatabase(
     snv_variants: List[VariantInDb] | None = None
 
 
+class SampleTagInput(RWModel):  # pylint: disable=too-few-public-methods
+    """Fields of a sample that its tags are computed from."""
+
+    sample_id: str
+    species_prediction: List[SppMethodIndex]
+    typing_result: List[
+        Union[ShigaTypingMethodIndex, EmmTypingMethodIndex, PipelineMethodIndex]
+    ] = []
+    element_type_result: List[MethodIndex] = []
+
+
 class SampleSummary(
     DBModelMixin, SampleBase, PipelineResult
 ):  # pylint: disable=too-few-public-methods
@@ -142,6 +162,70 @@ class SampleSummary(
     major_specie: SpeciesPrediction = Field(...)
 
 
+# same fields as SampleInDatabase but only the sample id is required
+SampleProjection = create_model(
+    "SampleProjection",
+    __base__=RWModel,
+    __doc__="Sample with a subset of its fields.",
+    id=(str | None, None),
+    sample_id=(str, ...),
+    **{
+        name: (Optional[field.annotation], None)
+        for name, field in SampleInDatabase.model_fields.items()
+        if name not in ("id", "sample_id")
+    },
+)
+
+
+class SampleView(str, Enum):
+    """Named subsets of the sample fields."""
+
+    SUMMARY = "summary"
+    AMR = "amr"
+    TYPING = "typing"
+    QC = "qc"
+    IGV = "igv"
+
+
+SAMPLE_VIEW_FIELDS: Dict[SampleView, List[str]] = {
+    SampleView.SUMMARY: [
+        "sample_id",
+        "sample_name",
+        "lims_id",
+        "sequencing",
+        "pipeline",
+        "species_prediction",
+        "qc_status",
+        "tags",
+        "comments",
+        "location",
+        "created_at",
+        "modified_at",
+    ],
+    SampleView.AMR: [
+        "sample_id",
+        "species_prediction",
+        "element_type_result",
+        "snv_variants",
+        "sv_variants",
+        "indel_variants",
+        "reference_genome",
+        "read_mapping",
+    ],
+    SampleView.TYPING: ["sample_id", "species_prediction", "typing_result"],
+    SampleView.QC: ["sample_id", "qc", "qc_status"],
+    SampleView.IGV: [
+        "sample_id",
+        "reference_genome",
+        "read_mapping",
+        "genome_annotation",
+        "element_type_result",
+        "snv_variants",
+        "sv_variants",
+    ],
+}
+
+
 class MultipleSampleRecordsResponseModel(
     MultipleRecordsResponseModel
 ):  # pylint: disable=too-few-public-methods
@@ -30,3 +30,4 @@ class MsTreeMethods(Enum):  # pylint: disable=too-few-public-methods
     NEIGHBOR_JOINING = "NJ"
     RAPID_NJ = "RapidNJ"
     NINJA = "ninja"
+    MSTREE_APPROX = "MSTreeApprox"
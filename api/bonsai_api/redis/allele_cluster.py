@@ -1,21 +1,162 @@
 """Functions relating to scheduling allele clustering jobs."""
 
+import json
 import logging
-from typing import List
+from functools import lru_cache
+from typing import Dict, List
 
 import pandas as pd
+from pydantic import BaseModel
 
-from . import ClusterMethod, SubmittedJob
-from .queue import redis
+from ..config import settings
+from . import ClusterMethod, MsTreeMethods, SubmittedJob
+from .queue import CLUSTER_RESULT_TTL, JobPriority, enqueue_unique, redis
 
 LOG = logging.getLogger(__name__)
 
+# margin between the predicted runtime and the job timeout
+JOB_TIMEOUT_MARGIN = 2.0
+MIN_JOB_TIMEOUT = 5 * 60  # seconds
+DEFAULT_JOB_TIMEOUT = 30 * 60  # seconds, used for methods without a model
+MIN_MEMORY = 50 * 1024 * 1024  # bytes
+
+
+class ResourceLimitExceeded(Exception):
+    """Raised when a clustering job would exceed the worker capacity."""
+
+
+class ConsumptionModel(BaseModel):  # pylint: disable=too-few-public-methods
+    """Coefficients for predicting the runtime and memory of a clustering job.
+
+    The models are polynomials in the number of unique profiles (n), the number
+    of loci and the number of processes used by the worker. The memory is the
+    largest of the polynomial and an alternative linear model. The defaults are
+    the Linux coefficients of the GrapeTree estimator in the allele cluster service.
+    """
+
+    time_loci_linear: float = 0  # n_loci * n
+    time_quadratic: float = 0  # n^2
+    time_loci: float = 0  # n_loci * n^2 / n_proc
+    time_cubic: float = 0  # n^3
+    time_const: float = 0
+    memory_linear: float = 0  # n
+    memory_loci_linear: float = 0  # n_loci * n
+    memory_quadratic: float = 0  # n^2
+    memory_cubic: float = 0  # n^3
+    memory_const: float = 0
+    memory_alt_linear: float = 0  # n, alternative model
+    memory_alt_const: float = 0
+
+
+class ResourceEstimate(BaseModel):  # pylint: disable=too-few-public-methods
+    """Predicted resource consumption of a clustering job."""
+
+    runtime: float  # seconds
+    memory: float  # bytes
+
+
+_SYMMETRIC_MODEL = ConsumptionModel(
+    time_quadratic=2.272428e-6,
+    time_loci=2.52492e-9,
+    time_const=32.625,
+    memory_quadratic=66.297,
+    memory_const=429570000,
+)
+DEFAULT_CONSUMPTION_MODELS: Dict[str, ConsumptionModel] = {
+    MsTreeMethods.MSTREE_V1.value: _SYMMETRIC_MODEL,
+    MsTreeMethods.MSTREE_V2.value: ConsumptionModel(
+        time_quadratic=2.431284e-6,
+        time_loci=2.701426667e-9,
+        time_const=33.753,
+        memory_quadratic=103.77,
+        memory_const=516625000,
+    ),
+    MsTreeMethods.NEIGHBOR_JOINING.value: ConsumptionModel(
+        time_cubic=1.1042e-8,
+        memory_cubic=0.058292,
+        memory_alt_linear=1.39e6,
+        memory_alt_const=-9.86e8,
+    ),
+    MsTreeMethods.RAPID_NJ.value: _SYMMETRIC_MODEL,
+    MsTreeMethods.NINJA.value: _SYMMETRIC_MODEL,
+    MsTreeMethods.MSTREE_APPROX.value: ConsumptionModel(
+        time_loci_linear=9.11e-7,
+        time_const=1.61,
+        memory_linear=19192.5,
+        memory_loci_linear=175.0,
+        memory_const=186142820,
+    ),
+}
+
+
+@lru_cache(maxsize=1)
+def get_consumption_models() -> Dict[str, ConsumptionModel]:
+    """Get consumption models, optionally updated with calibrated coefficients.
+
+    The calibration file is produced by the allele cluster service benchmarks.
+    """
+    models = dict(DEFAULT_CONSUMPTION_MODELS)
+    if settings.allele_cluster_calibration_file is not None:
+        LOG.info(
+            "Loading allele cluster calibration from %s",
+            settings.allele_cluster_calibration_file,
+        )
+        with open(settings.allele_cluster_calibration_file, encoding="utf-8") as inpt:
+            calibration = json.load(inpt)
+        for method, coefficients in calibration.items():
+            models[method] = ConsumptionModel(**coefficients)
+    return models
+
+
+def estimate_consumption(
+    method: str, n_profiles: int, n_loci: int, n_proc: int
+) -> ResourceEstimate | None:
+    """Predict runtime and memory consumption of a clustering job.
+
+    :param method: MSTree clustering method
+    :type method: str
+    :param n_profiles: Number of unique allele profiles
+    :type n_profiles: int
+    :param n_loci: Number of loci in the profile
+    :type n_loci: int
+    :param n_proc: Number of processes used by the worker
+    :type n_proc: int
+    :return: The estimate or None if there are no model for the method
+    :rtype: ResourceEstimate | None
+    """
+    model = get_consumption_models().get(method)
+    if model is None:
+        return None
+    n = float(n_profiles)
+    runtime = (
+        model.time_loci_linear * n_loci * n
+        + model.time_quadratic * n**2
+        + model.time_loci * n_loci * n**2 / n_proc
+        + model.time_cubic * n**3
+        + model.time_const
+    )
+    memory = max(
+        model.memory_linear * n
+        + model.memory_loci_linear * n_loci * n
+        + model.memory_quadratic * n**2
+        + model.memory_cubic * n**3
+        + model.memory_const,
+        model.memory_alt_linear * n + model.memory_alt_const,
+    )
+    return ResourceEstimate(runtime=max(runtime, 5), memory=max(memory, MIN_MEMORY))
+
 
 def schedule_cluster_samples(
-    profiles: List[str], cluster_method: ClusterMethod
+    profiles: List[str],
+    cluster_method: ClusterMethod,
+    priority: JobPriority = JobPriority.HIGH,
 ) -> SubmittedJob:
     """Schedule clustering on the provided allele profile.
 
+    The job is routed to the small or large job queue depending on its predicted
+    resource consumption.
+
+    :raises ResourceLimitExceeded: if the job would exceed the worker capacity
     :return: Information of submitted job
     :rtype: SubmittedJob
     """
@@ -28,14 +169,47 @@ def schedule_cluster_samples(
         sample_ids.append(profile.sample_id)
         allele_profile.append(profile.allele_profile())
     # convert to pandas dataframe
-    profile_tsv = (
+    profile_df = (
         pd.DataFrame(allele_profile, index=sample_ids)
         .dropna(axis=1, how="all")  # remove cols with all nulls
         .fillna("-")  # replace nulls with MStree null char, "-"
-        .to_csv(sep="\t")  # convert to tsv string
     )
-    job = redis.allele.enqueue(
-        task, profile=profile_tsv, method=cluster_method.value, job_timeout="30m"
+
+    # predict resource consumption on the non-redundant profiles
+    estimate = estimate_consumption(
+        cluster_method.value,
+        n_profiles=len(profile_df.drop_duplicates()),
+        n_loci=profile_df.shape[1],
+        n_proc=settings.allele_cluster_n_proc,
+    )
+    if estimate is None:
+        queue = redis.get_queue("allele", priority)
+        job_timeout = DEFAULT_JOB_TIMEOUT
+    else:
+        if (
+            estimate.runtime > settings.allele_cluster_max_runtime
+            or estimate.memory > settings.allele_cluster_max_memory
+        ):
+            msg = (
+                f"Clustering {len(sample_ids)} samples with {cluster_method.value} "
+                f"is predicted to use {estimate.memory / 1024**3:.1f} GB memory "
+                f"and {estimate.runtime / 60:.0f} min, which exceeds the worker capacity."
+            )
+            LOG.warning(msg)
+            raise ResourceLimitExceeded(msg)
+        is_small = (
+            estimate.runtime <= settings.allele_cluster_small_job_runtime
+            and estimate.memory <= settings.allele_cluster_small_job_memory
+        )
+        queue = redis.get_queue("allele" if is_small else "allele_large", priority)
+        job_timeout = max(int(estimate.runtime * JOB_TIMEOUT_MARGIN), MIN_JOB_TIMEOUT)
+    job = enqueue_unique(
+        queue,
+        task,
+        profile=profile_df.to_csv(sep="\t"),  # convert to tsv string
+        method=cluster_method.value,
+        job_timeout=job_timeout,
+        result_ttl=CLUSTER_RESULT_TTL,
     )
-    LOG.debug("Submitting job, %s to %s", task, job.worker_name)
+    LOG.debug("Submitting job, %s to %s", task, queue.name)
     return SubmittedJob(id=job.id, task=task)
@@ -0,0 +1,191 @@
+"""Cache of clustering results.
+
+Clustering the same samples with the same method gives the same result as long
+as the samples are not changed. Results are stored in redis under a key that
+is derived from the typing method, the cluster method, the sample ids and the
+data version of each sample. Submitting an identical clustering request then
+returns a finished pseudo-job instead of scheduling a new job.
+
+Cached results, and jobs that will populate the cache, are indexed by sample
+id so they can be invalidated when a sample is updated or deleted.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Sequence
+
+from rq.exceptions import NoSuchJobError
+
+from ..config import settings
+from . import SubmittedJob
+from .queue import JobStatus, JobStatusCodes, redis
+
+LOG = logging.getLogger(__name__)
+
+CACHED_JOB_PREFIX = "cached-"
+RESULT_KEY = "bonsai:cluster_cache:result:{}"
+PENDING_JOB_KEY = "bonsai:cluster_cache:job:{}"
+SAMPLE_INDEX_KEY = "bonsai:cluster_cache:sample:{}"
+ENTRIES_KEY = "bonsai:cluster_cache:entries"
+
+
+def cluster_cache_key(
+    typing_method: Enum,
+    cluster_method: Enum,
+    sample_versions: Dict[str, str | None],
+) -> str:
+    """Create a key that identifies a clustering request.
+
+    :param typing_method: Data the samples are clustered on
+    :type typing_method: Enum
+    :param cluster_method: Clustering method
+    :type cluster_method: Enum
+    :param sample_versions: Data version of each sample
+    :type sample_versions: Dict[str, str | None]
+    :return: Hex digest of the request
+    :rtype: str
+    """
+    request = {
+        "typing_method": typing_method.value,
+        "cluster_method": cluster_method.value,
+        "samples": sorted(sample_versions.items()),
+    }
+    content = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def is_cached_job(job_id: str) -> bool:
+    """Check if job id refers to a cached result."""
+    return job_id.startswith(CACHED_JOB_PREFIX)
+
+
+def get_cached_cluster_job(cache_key: str) -> SubmittedJob | None:
+    """Get a pseudo-job for a cached result if it exists."""
+    entry = redis.connection.get(RESULT_KEY.format(cache_key))
+    if entry is None:
+        return None
+    LOG.debug("Using cached clustering result %s", cache_key)
+    return SubmittedJob(
+        id=f"{CACHED_JOB_PREFIX}{cache_key}", task=json.loads(entry)["task"]
+    )
+
+
+async def get_cached_job_status(job_id: str) -> JobStatus:
+    """Get the status of a cached pseudo-job.
+
+    :raises NoSuchJobError: if the result has expired or been invalidated
+    """
+    cache_key = job_id.removeprefix(CACHED_JOB_PREFIX)
+    entry = await redis.async_connection.get(RESULT_KEY.format(cache_key))
+    if entry is None:
+        raise NoSuchJobError(f"No such job: {job_id}")
+    entry = json.loads(entry)
+    created_at = datetime.fromisoformat(entry["created_at"])
+    return JobStatus(
+        status=JobStatusCodes.FINISHED,
+        queue=entry["queue"],
+        result=entry["result"],
+        submitted_at=created_at,
+        started_at=created_at,
+        finished_at=created_at,
+    )
+
+
+def register_cluster_job(
+    job: SubmittedJob, cache_key: str, sample_ids: Sequence[str]
+) -> None:
+    """Remember which cache entry the result of a scheduled job belongs to."""
+    pending = {"cache_key": cache_key, "task": job.task, "sample_ids": sample_ids}
+    pending_key = PENDING_JOB_KEY.format(job.id)
+    with redis.connection.pipeline() as pipe:
+        pipe.set(pending_key, json.dumps(pending), ex=settings.cluster_cache_ttl)
+        _index_samples(pipe, sample_ids, pending_key)
+        pipe.execute()
+
+
+def store_cluster_result(job_id: str, job_info: JobStatus) -> bool:
+    """Store the result of a finished job if it was registered for caching.
+
+    :return: True if the result was stored
+    :rtype: bool
+    """
+    pending_key = PENDING_JOB_KEY.format(job_id)
+    pending = redis.connection.get(pending_key)
+    if pending is None:
+        return False
+    pending = json.loads(pending)
+    entry = json.dumps(
+        {
+            "task": pending["task"],
+            "queue": job_info.queue,
+            "result": job_info.result,
+            "created_at": (job_info.finished_at or datetime.now()).isoformat(),
+        }
+    )
+    if len(entry) > settings.cluster_cache_max_result_size:
+        LOG.debug("Result of job %s is too large to cache", job_id)
+        redis.connection.delete(pending_key)
+        return False
+
+    result_key = RESULT_KEY.format(pending["cache_key"])
+    with redis.connection.pipeline() as pipe:
+        pipe.set(result_key, entry, ex=settings.cluster_cache_ttl)
+        pipe.delete(pending_key)
+        _index_samples(pipe, pending["sample_ids"], result_key, replaces=pending_key)
+        now = datetime.now().timestamp()
+        pipe.zadd(ENTRIES_KEY, {result_key: now})
+        # forget entries that have expired
+        pipe.zremrangebyscore(ENTRIES_KEY, 0, now - settings.cluster_cache_ttl)
+        pipe.execute()
+    _evict_oldest()
+    LOG.debug("Cached result of job %s as %s", job_id, pending["cache_key"])
+    return True
+
+
+def invalidate_samples(sample_ids: Sequence[str]) -> int:
+    """Remove cached results and pending jobs that include any of the samples.
+
+    :return: The number of removed cache entries
+    :rtype: int
+    """
+    index_keys = [SAMPLE_INDEX_KEY.format(sample_id) for sample_id in sample_ids]
+    keys = set()
+    for index_key in index_keys:
+        keys.update(redis.connection.smembers(index_key))
+    with redis.connection.pipeline() as pipe:
+        if keys:
+            pipe.delete(*keys)
+            pipe.zrem(ENTRIES_KEY, *keys)
+        pipe.delete(*index_keys)
+        pipe.execute()
+    if keys:
+        LOG.debug("Invalidated %d cached clustering results", len(keys))
+    return len(keys)
+
+
+def _index_samples(
+    pipe, sample_ids: Sequence[str], key: str, replaces: str | None = None
+) -> None:
+    """Add key to the index of each sample, optionally replacing another key."""
+    for sample_id in sample_ids:
+        index_key = SAMPLE_INDEX_KEY.format(sample_id)
+        if replaces is not None:
+            pipe.srem(index_key, replaces)
+        pipe.sadd(index_key, key)
+        pipe.expire(index_key, settings.cluster_cache_ttl)
+
+
+def _evict_oldest() -> None:
+    """Remove the oldest results when the cache exceeds its max number of entries."""
+    n_over = redis.connection.zcard(ENTRIES_KEY) - settings.cluster_cache_max_entries
+    if n_over <= 0:
+        return
+    oldest = redis.connection.zrange(ENTRIES_KEY, 0, n_over - 1)
+    if oldest:
+        with redis.connection.pipeline() as pipe:
+            pipe.delete(*oldest)
+            pipe.zrem(ENTRIES_KEY, *oldest)
+            pipe.execute()
@@ -0,0 +1,63 @@
+"""Subscribe to job status transitions and progress published by the workers."""
+
+import logging
+from typing import AsyncIterator
+
+from .cluster_cache import get_cached_job_status, is_cached_job
+from .queue import JobStatus, JobStatusCodes, check_redis_job_status, redis
+
+LOG = logging.getLogger(__name__)
+
+# channel where the workers publish job status transitions and progress
+JOB_EVENTS_CHANNEL = "bonsai:job:{}"
+DONE_STATUSES = {
+    JobStatusCodes.FINISHED,
+    JobStatusCodes.FAILED,
+    JobStatusCodes.STOPPED,
+    JobStatusCodes.CANCELED,
+}
+
+
+async def job_status_events(
+    job_id: str, heartbeat: float = 15.0
+) -> AsyncIterator[JobStatus | None]:
+    """Yield the status of a job each time it changes until the job is done.
+
+    The status is checked when a worker publish a transition or the progress
+    of the job, and every heartbeat seconds in case a message was missed. None
+    is yielded when nothing has changed to keep the connection alive. The job
+    result is only fetched once, when the job has finished.
+
+    :param job_id: Redis job id
+    :type job_id: str
+    :param heartbeat: Max time between status checks, in seconds
+    :type heartbeat: float
+    :return: Job status or None for heartbeats
+    :rtype: AsyncIterator[JobStatus | None]
+    """
+    if is_cached_job(job_id):
+        yield await get_cached_job_status(job_id)
+        return
+
+    pubsub = redis.async_connection.pubsub()
+    try:
+        # subscribe before checking the status to not miss transitions
+        await pubsub.subscribe(JOB_EVENTS_CHANNEL.format(job_id))
+        status, progress = None, None
+        while True:
+            info = await check_redis_job_status(job_id)
+            if info.status != status or info.progress != progress:
+                status, progress = info.status, info.progress
+                yield info
+            else:
+                yield None
+            if status in DONE_STATUSES:
+                return
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=heartbeat
+            )
+            if message is not None:
+                LOG.debug("Job %s published %s", job_id, message["data"])
+    finally:
+        # return the connection to the pool
+        await pubsub.aclose()
@@ -1,37 +1,96 @@
 """Operations on minhash signatures."""
 
 import logging
-from typing import List
+from typing import Dict, List, Tuple
 
-from rq import Retry
+from rq import Queue, Retry
 from rq.job import Dependency
 
 from . import ClusterMethod, SubmittedJob, TypingMethod
-from .queue import redis
+from .queue import (
+    CLUSTER_RESULT_TTL,
+    SIMILARITY_RESULT_TTL,
+    JobPriority,
+    enqueue_unique,
+    redis,
+)
 
 LOG = logging.getLogger(__name__)
 
 
-def schedule_add_genome_signature(sample_id: str, signature) -> SubmittedJob | str:
+def schedule_add_genome_signature(
+    sample_id: str,
+    signature,
+    priority: JobPriority = JobPriority.LOW,
+    job_id: str | None = None,
+) -> SubmittedJob | str:
     """Schedule adding signature to index."""
     task = "minhash_service.tasks.add_signature"
-    job = redis.minhash.enqueue(
-        task, sample_id=sample_id, signature=signature, job_timeout="30m"
+    job = redis.get_queue("minhash", priority).enqueue(
+        task,
+        sample_id=sample_id,
+        signature=signature,
+        job_timeout="30m",
+        job_id=job_id,
     )
     LOG.debug("Submitting job, %s to %s", task, job.worker_name)
     return SubmittedJob(id=job.id, task=task)
 
 
-def schedule_remove_genome_signature(sample_id: str) -> SubmittedJob | str:
+def schedule_add_genome_signatures(
+    signatures: Dict[str, bytes], priority: JobPriority = JobPriority.LOW
+) -> Tuple[Dict[str, SubmittedJob], SubmittedJob]:
+    """Schedule adding the signatures of multiple samples to the index.
+
+    The signature jobs are enqueued in one pipeline and all samples are added to
+    the index by one job that runs when every signature has been written.
+
+    :param signatures: Signature of each sample
+    :type signatures: Dict[str, bytes]
+    :return: Signature job of each sample and the index job
+    :rtype: Tuple[Dict[str, SubmittedJob], SubmittedJob]
+    """
+    task = "minhash_service.tasks.add_signature"
+    jobs = redis.get_queue("minhash", priority).enqueue_many(
+        [
+            Queue.prepare_data(
+                task,
+                kwargs={"sample_id": sample_id, "signature": signature},
+                timeout="30m",
+            )
+            for sample_id, signature in signatures.items()
+        ]
+    )
+    signature_jobs = {
+        sample_id: SubmittedJob(id=job.id, task=task)
+        for sample_id, job in zip(signatures, jobs)
+    }
+    LOG.debug("Submitting %d jobs, %s", len(jobs), task)
+    index_job = schedule_add_genome_signature_to_index(
+        list(signatures),
+        depends_on=[job.id for job in jobs],
+        priority=priority,
+    )
+    return signature_jobs, index_job
+
+
+def schedule_remove_genome_signature(
+    sample_id: str, priority: JobPriority = JobPriority.LOW
+) -> SubmittedJob | str:
     """Schedule adding signature to index."""
     task = "minhash_service.tasks.remove_signature"
-    job = redis.minhash.enqueue(task, sample_id=sample_id, job_timeout="30m")
+    job = redis.get_queue("minhash", priority).enqueue(
+        task, sample_id=sample_id, job_timeout="30m"
+    )
     LOG.debug("Submitting job, %s to %s", task, job.worker_name)
     return SubmittedJob(id=job.id, task=task)
 
 
 def schedule_add_genome_signature_to_index(
-    sample_ids: List[str], depends_on: List[str] = None, **enqueue_kwargs
+    sample_ids: List[str],
+    depends_on: List[str] = None,
+    priority: JobPriority = JobPriority.LOW,
+    **enqueue_kwargs,
 ) -> SubmittedJob:
     """
     Schedule adding signature to index.
@@ -52,7 +111,7 @@ def schedule_add_genome_signature_to_index(
         )
 
     # submit job
-    job = redis.minhash.enqueue(
+    job = redis.get_queue("minhash", priority).enqueue(
         task, sample_ids=sample_ids, job_timeout="30m", **submit_kwargs
     )
     LOG.debug("Submitting job, %s to %s", task, job.worker_name)
@@ -60,7 +119,10 @@ def schedule_add_genome_signature_to_index(
 
 
 def schedule_remove_genome_signature_from_index(
-    sample_ids: List[str], depends_on: List[str] = None, **enqueue_kwargs
+    sample_ids: List[str],
+    depends_on: List[str] = None,
+    priority: JobPriority = JobPriority.LOW,
+    **enqueue_kwargs,
 ) -> SubmittedJob:
     """
     Schedule removing signature from index.
@@ -81,7 +143,7 @@ def schedule_remove_genome_signature_from_index(
         )
 
     # submit job
-    job = redis.minhash.enqueue(
+    job = redis.get_queue("minhash", priority).enqueue(
         task, sample_ids=sample_ids, job_timeout="30m", **submit_kwargs
     )
     LOG.debug("Submitting job, %s to %s", task, job.worker_name)
@@ -89,37 +151,49 @@ def schedule_remove_genome_signature_from_index(
 
 
 def schedule_find_similar_samples(
-    sample_id: str, min_similarity: float, limit: int | None = None
+    sample_id: str,
+    min_similarity: float,
+    limit: int | None = None,
+    priority: JobPriority = JobPriority.HIGH,
 ) -> SubmittedJob:
     """Schedule find similar samples job.
 
     min_similarity - minimum similarity score to be included
     """
     task = "minhash_service.tasks.similar"
-    job = redis.minhash.enqueue(
+    job = enqueue_unique(
+        redis.get_queue("minhash", priority),
         task,
         sample_id=sample_id,
         min_similarity=min_similarity,
         limit=limit,
         job_timeout="30m",
+        result_ttl=SIMILARITY_RESULT_TTL,
     )
     LOG.debug("Submitting job, %s to %s", task, job.worker_name)
     return SubmittedJob(id=job.id, task=task)
 
 
 def schedule_cluster_samples(
-    sample_ids: List[str], cluster_method: ClusterMethod
+    sample_ids: List[str],
+    cluster_method: ClusterMethod,
+    priority: JobPriority = JobPriority.HIGH,
+    sample_versions: Dict[str, str | None] | None = None,
 ) -> SubmittedJob:
-    """Schedule find similar samples job.
+    """Schedule cluster samples job.
 
-    min_similarity - minimum similarity score to be included
+    sample_versions - data version of each sample, a job that is in flight is
+    only reused if the signatures have not changed since it was submitted
     """
     task = "minhash_service.tasks.cluster"
-    job = redis.minhash.enqueue(
+    job = enqueue_unique(
+        redis.get_queue("minhash", priority),
         task,
         sample_ids=sample_ids,
         cluster_method=cluster_method.value,
         job_timeout="30m",
+        result_ttl=CLUSTER_RESULT_TTL,
+        data_versions=sample_versions,
     )
     LOG.debug("Submitting job, %s to %s", task, job.worker_name)
     return SubmittedJob(id=job.id, task=task)
@@ -131,6 +205,7 @@ def schedule_find_similar_and_cluster(
     typing_method: TypingMethod,
     cluster_method: ClusterMethod,
     limit: int | None = None,
+    priority: JobPriority = JobPriority.HIGH,
 ) -> SubmittedJob:
     """Schedule a job to find similar samples and cluster the results
 
@@ -140,13 +215,15 @@ def schedule_find_similar_and_cluster(
     """
     if typing_method == TypingMethod.MINHASH:
         task = "minhash_service.tasks.find_similar_and_cluster"
-        job = redis.minhash.enqueue(
+        job = enqueue_unique(
+            redis.get_queue("minhash", priority),
             task,
             sample_id=sample_id,
             min_similarity=min_similarity,
             limit=limit,
             cluster_method=cluster_method.value,
             job_timeout="30m",
+            result_ttl=CLUSTER_RESULT_TTL,
         )
         LOG.debug("Submitting job, %s to %s", task, job.worker_name)
     else:
@@ -1,18 +1,64 @@
 """Functions for managing redis connections."""
 
+import hashlib
+import json
 import logging
+import time
 from datetime import datetime
 from enum import Enum
-from typing import Any
+from typing import Any, Dict, List, Sequence
+from uuid import uuid4
 
 from bonsai_api.config import settings
 from pydantic import BaseModel
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from rq import Queue
+from rq.exceptions import NoSuchJobError
 from rq.job import Job
+from rq.results import Result
+
+from .serializer import ResultSerializer
 
 LOG = logging.getLogger(__name__)
 
+# serializer of jobs and results, must be the same as the workers use
+serializer = ResultSerializer(
+    result_dir=settings.result_dir,
+    compress_threshold=settings.result_compress_threshold,
+    spill_threshold=settings.result_spill_threshold,
+    spill_ttl=settings.result_spill_ttl,
+)
+# time results are kept in redis, in seconds
+DEFAULT_RESULT_TTL = 10 * 60
+CLUSTER_RESULT_TTL = 60 * 60
+SIMILARITY_RESULT_TTL = 30 * 60
+
+INFLIGHT_KEY = "bonsai:inflight:{}"
+INFLIGHT_TTL = 24 * 60 * 60  # seconds
+# time a fingerprint can be claimed before its job is enqueued
+INFLIGHT_CLAIM_TIMEOUT = 10  # seconds
+INFLIGHT_POLL_INTERVAL = 0.05  # seconds
+# delete a fingerprint only if it is still claimed by the same job
+RELEASE_INFLIGHT_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class JobPriority(str, Enum):
+    """Priority lanes of the worker queues.
+
+    Interactive jobs that users wait on are sent to the high priority queue and
+    bulk operations to the low priority queue. Workers drain the high priority
+    queue first.
+    """
+
+    HIGH = "high"
+    LOW = "low"
+
 
 class RedisQueue:  # pylint: disable=too-few-public-methods
     """Worker queue interface."""
@@ -20,9 +66,41 @@ class RedisQueue:  # pylint: disable=too-few-public-methods
     def __init__(self):
         """Setup connection and define queues."""
         self.connection = Redis(settings.redis_host, settings.redis_port)
-        self.minhash: Queue = Queue("minhash", connection=self.connection)
-        self.ska: Queue = Queue("ska", connection=self.connection)
-        self.allele: Queue = Queue("allele_cluster", connection=self.connection)
+        # non-blocking connection for use on the API event loop
+        self.async_connection = AsyncRedis(
+            host=settings.redis_host,
+            port=int(settings.redis_port),
+            max_connections=settings.redis_max_connections,
+        )
+        self.minhash: Queue = self._create_queue("minhash")
+        self.minhash_low: Queue = self._create_queue("minhash_low")
+        self.ska: Queue = self._create_queue("ska")
+        self.ska_low: Queue = self._create_queue("ska_low")
+        self.allele: Queue = self._create_queue("allele_cluster")
+        self.allele_low: Queue = self._create_queue("allele_cluster_low")
+        self.allele_large: Queue = self._create_queue("allele_cluster_large")
+        self.allele_large_low: Queue = self._create_queue("allele_cluster_large_low")
+
+    async def close(self):
+        """Close connections of the async connection pool."""
+        await self.async_connection.aclose()
+
+    def _create_queue(self, name: str) -> Queue:
+        return Queue(name, connection=self.connection, serializer=serializer)
+
+    def get_queue(self, name: str, priority: JobPriority = JobPriority.HIGH) -> Queue:
+        """Get the queue of a service with the given priority.
+
+        :param name: Name of the high priority queue attribute, e.g. "minhash"
+        :type name: str
+        :param priority: Job priority
+        :type priority: JobPriority
+        :return: The queue
+        :rtype: Queue
+        """
+        if priority == JobPriority.LOW:
+            name = f"{name}_low"
+        return getattr(self, name)
 
 
 redis = RedisQueue()
@@ -41,6 +119,22 @@ class JobStatusCodes(str, Enum):
     FAILED = "failed"
 
 
+class StageTiming(BaseModel):  # pylint: disable=too-few-public-methods
+    """Elapsed time of a stage of a job."""
+
+    name: str
+    elapsed: float | None  # seconds, None for the current stage
+
+
+class JobProgress(BaseModel):  # pylint: disable=too-few-public-methods
+    """Progress reported by the worker running the job."""
+
+    stage: str | None
+    fraction: float  # fraction done of the current stage
+    elapsed: float  # seconds in the current stage
+    stages: List[StageTiming] = []
+
+
 class JobStatus(BaseModel):  # pylint: disable=too-few-public-methods
     """Container for basic job information."""
 
@@ -50,21 +144,203 @@ class JobStatus(BaseModel):  # pylint: disable=too-few-public-methods
     submitted_at: datetime
     started_at: datetime | None
     finished_at: datetime | None
+    progress: JobProgress | None = None
 
 
-def check_redis_job_status(job_id: str) -> JobStatus:
-    """Check status of a job."""
-    job = Job.fetch(job_id, connection=redis.connection)
+def _to_job_status(job: Job, result: Result | None = None) -> JobStatus:
+    """Create job status from a job and its latest result."""
     job_info = JobStatus(
-        status=job.get_status(refresh=True),
+        status=job.get_status(refresh=False),
         queue=job.origin,
-        task=job.func_name,
-        result=job.return_value(),
+        result=None if result is None else result.return_value,
         submitted_at=job.enqueued_at,
         started_at=job.started_at,
         finished_at=job.ended_at,
+        progress=job.meta.get("progress"),
     )
     # LOG stacktraces for failed jobs
     if job_info.status == JobStatusCodes.FAILED:
-        LOG.warning("Redis job %s; %s", JobStatusCodes.FAILED, job.exc_info)
+        exc_info = None if result is None else result.exc_string
+        LOG.warning("Redis job %s; %s", JobStatusCodes.FAILED, exc_info)
     return job_info
+
+
+async def _fetch_jobs(job_ids: Sequence[str]) -> List[Job | None]:
+    """Fetch multiple jobs in one pipelined call without blocking the event loop."""
+    async with redis.async_connection.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hgetall(Job.key_for(job_id))
+        responses = await pipe.execute()
+    jobs = []
+    for job_id, data in zip(job_ids, responses):
+        if data:
+            # restore parses the job hash and does not use the connection
+            job = Job(job_id, connection=redis.connection, serializer=serializer)
+            job.restore(data)
+            jobs.append(job)
+        else:
+            jobs.append(None)
+    return jobs
+
+
+async def _fetch_latest_results(jobs: Sequence[Job]) -> Dict[str, Result]:
+    """Fetch the latest result of multiple jobs in one pipelined call."""
+    async with redis.async_connection.pipeline(transaction=False) as pipe:
+        for job in jobs:
+            pipe.xrevrange(Result.get_key(job.id), "+", "-", count=1)
+        responses = await pipe.execute()
+    results = {}
+    for job, response in zip(jobs, responses):
+        if response:
+            result_id, payload = response[0]
+            results[job.id] = Result.restore(
+                job.id,
+                result_id.decode(),
+                payload,
+                connection=redis.connection,
+                serializer=serializer,
+            )
+    return results
+
+
+async def check_redis_jobs_status(
+    job_ids: Sequence[str], include_results: bool = True
+) -> Dict[str, JobStatus | None]:
+    """Check status of multiple jobs.
+
+    The jobs are fetched in one pipelined call and the results of finished and
+    failed jobs in another.
+
+    :param job_ids: Redis job ids
+    :type job_ids: Sequence[str]
+    :param include_results: Fetch results of finished jobs
+    :type include_results: bool
+    :return: Job information, None for jobs that does not exist
+    :rtype: Dict[str, JobStatus | None]
+    """
+    jobs = await _fetch_jobs(job_ids)
+    done = [
+        job
+        for job in jobs
+        if job is not None
+        and (
+            (
+                include_results
+                and job.get_status(refresh=False) == JobStatusCodes.FINISHED
+            )
+            or job.get_status(refresh=False) == JobStatusCodes.FAILED
+        )
+    ]
+    results = await _fetch_latest_results(done) if done else {}
+    statuses = {}
+    for job_id, job in zip(job_ids, jobs):
+        statuses[job_id] = (
+            None if job is None else _to_job_status(job, results.get(job_id))
+        )
+    return statuses
+
+
+async def check_redis_job_status(job_id: str) -> JobStatus:
+    """Check status of a job.
+
+    The result is only fetched for finished jobs.
+
+    :raises NoSuchJobError: if the job does not exist
+    """
+    info = (await check_redis_jobs_status([job_id]))[job_id]
+    if info is None:
+        raise NoSuchJobError(f"No such job: {job_id}")
+    return info
+
+
+IN_FLIGHT_STATUSES = {
+    JobStatusCodes.QUEUED,
+    JobStatusCodes.STARTED,
+    JobStatusCodes.DEFERRED,
+    JobStatusCodes.SCHEDULED,
+}
+
+
+def job_fingerprint(
+    queue: Queue, task: str, data_versions: Dict[str, Any] | None = None, **kwargs
+) -> str:
+    """Create a fingerprint of a job from its task, arguments and data versions."""
+    content = json.dumps(
+        {
+            "queue": queue.name,
+            "task": task,
+            "kwargs": kwargs,
+            "data_versions": data_versions,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _fetch_job(job_id: str) -> Job | None:
+    """Get job if it exists."""
+    try:
+        return Job.fetch(job_id, connection=redis.connection, serializer=serializer)
+    except NoSuchJobError:
+        return None
+
+
+def _release_inflight(inflight_key: str, job_id: str) -> bool:
+    """Release a fingerprint if it is still claimed by the job."""
+    return bool(redis.connection.eval(RELEASE_INFLIGHT_SCRIPT, 1, inflight_key, job_id))
+
+
+def enqueue_unique(
+    queue: Queue,
+    task: str,
+    job_timeout: int | str,
+    result_ttl: int = DEFAULT_RESULT_TTL,
+    data_versions: Dict[str, Any] | None = None,
+    **kwargs,
+) -> Job:
+    """Enqueue a job unless an identical job is already queued or running.
+
+    Identical jobs have the same queue, task and arguments, and read the same
+    versions of the data. If such a job is queued or running the submitter is
+    attached to it instead of a new job being enqueued.
+
+    :param queue: Queue to enqueue the job to
+    :type queue: Queue
+    :param task: Task to run
+    :type task: str
+    :param job_timeout: Job timeout
+    :type job_timeout: int | str
+    :param result_ttl: Time the result is kept, in seconds
+    :type result_ttl: int
+    :param data_versions: Versions of the data read by the task, not passed to it
+    :type data_versions: Dict[str, Any] | None
+    :return: The new or the existing job
+    :rtype: Job
+    """
+    inflight_key = INFLIGHT_KEY.format(
+        job_fingerprint(queue, task, data_versions, **kwargs)
+    )
+    job_id = uuid4().hex
+    # claim the fingerprint, or attach to the job that holds it
+    while not redis.connection.set(inflight_key, job_id, nx=True, ex=INFLIGHT_TTL):
+        existing_id = redis.connection.get(inflight_key)
+        if existing_id is None:
+            continue  # released in between, try to claim it again
+        existing_id = existing_id.decode()
+        existing_job = _fetch_job(existing_id)
+        if existing_job is None:
+            claimed_for = INFLIGHT_TTL - redis.connection.ttl(inflight_key)
+            if claimed_for < INFLIGHT_CLAIM_TIMEOUT:
+                # claimed by a submitter that has not enqueued the job yet
+                time.sleep(INFLIGHT_POLL_INTERVAL)
+                continue
+            LOG.warning("Releasing abandoned claim of job %s", existing_id)
+        elif existing_job.get_status(refresh=False) in IN_FLIGHT_STATUSES:
+            LOG.debug("Attaching to identical job %s of %s", existing_job.id, task)
+            return existing_job
+        # the previous job is done, release the fingerprint and try again
+        _release_inflight(inflight_key, existing_id)
+    return queue.enqueue(
+        task, job_id=job_id, job_timeout=job_timeout, result_ttl=result_ttl, **kwargs
+    )
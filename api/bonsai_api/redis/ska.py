@@ -7,22 +7,26 @@ from rq import Retry
 from rq.job import Dependency
 
 from . import ClusterMethod, SubmittedJob, TypingMethod
-from .queue import redis
+from .queue import CLUSTER_RESULT_TTL, JobPriority, enqueue_unique, redis
 
 LOG = logging.getLogger(__name__)
 
 
 def schedule_cluster_samples(
-    index_files: List[str], cluster_method: ClusterMethod
+    index_files: List[str],
+    cluster_method: ClusterMethod,
+    priority: JobPriority = JobPriority.HIGH,
 ) -> SubmittedJob:
     """Schedule SNV clustering uisng SKA."""
     task = "ska_service.tasks.cluster"
     LOG.debug("Schedule SKA clustering of %s with %s", index_files, cluster_method)
-    job = redis.ska.enqueue(
+    job = enqueue_unique(
+        redis.get_queue("ska", priority),
         task,
         indexes=index_files,
         cluster_method=cluster_method.value,
         job_timeout="30m",
+        result_ttl=CLUSTER_RESULT_TTL,
     )
     LOG.debug("Submitting job, %s to %s", task, job.worker_name)
     return SubmittedJob(id=job.id, task=task)
@@ -5,11 +5,13 @@ from pathlib import Path
 from typing import Dict
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import ConfigDict, Field
 
 from ..crud.errors import EntryNotFound
 from ..crud.sample import (
     TypingProfileOutput,
+    get_sample_data_versions,
     get_signature_path_for_samples,
     get_ska_index_path_for_samples,
     get_typing_profiles,
@@ -23,11 +25,20 @@ from ..redis import (
     SubmittedJob,
     TypingMethod,
 )
+from ..redis.allele_cluster import (
+    ResourceLimitExceeded,
+)
 from ..redis.allele_cluster import (
     schedule_cluster_samples as schedule_allele_cluster_samples,
 )
+from ..redis.cluster_cache import (
+    cluster_cache_key,
+    get_cached_cluster_job,
+    register_cluster_job,
+)
 from ..redis.minhash import schedule_add_genome_signature_to_index
 from ..redis.minhash import schedule_cluster_samples as schedule_minhash_cluster_samples
+from ..redis.queue import JobPriority
 from ..redis.ska import schedule_cluster_samples as schedule_ska_cluster_samples
 
 LOG = logging.getLogger(__name__)
@@ -50,6 +61,8 @@ class ClusterInput(RWModel):  # pylint: disable=too-few-public-methods
     sample_ids: list[str] = Field(..., min_length=2, alias="sampleIds")
     distance: DistanceMethod | None = None
     method: ClusterMethod | MsTreeMethods
+    # bulk clustering should use the low priority queue
+    priority: JobPriority = JobPriority.HIGH
 
     model_config = ConfigDict(use_enum_values=False)
 
@@ -74,17 +87,34 @@ async def cluster_samples(
     :param cluster_input: clustering input data
     :type cluster_input: ClusterInput
     :raises HTTPException: Raised if some sample was not found
-    :return: Information on scheduled job
+    :raises HTTPException: Raised if the job would exceed the worker capacity
+    :return: Information on scheduled job, or a finished job if the result is cached
     :rtype: SubmittedJob
     """
+    # return cached result if the samples have been clustered before
+    sample_versions = await get_sample_data_versions(db, cluster_input.sample_ids)
+    cache_key = cluster_cache_key(typing_method, cluster_input.method, sample_versions)
+    cached_job = await run_in_threadpool(get_cached_cluster_job, cache_key)
+    if cached_job is not None:
+        return cached_job
+
     if typing_method == TypingMethod.MINHASH:
-        job = schedule_minhash_cluster_samples(
-            cluster_input.sample_ids, cluster_input.method
+        job = await run_in_threadpool(
+            schedule_minhash_cluster_samples,
+            cluster_input.sample_ids,
+            cluster_input.method,
+            cluster_input.priority,
+            sample_versions,
         )
     elif typing_method == TypingMethod.SKA:
         # query database for index file paths using the sample ids and distpatch cluster job to queue
         index_files = await get_ska_index_path_for_samples(db, cluster_input.sample_ids)
-        job = schedule_ska_cluster_samples(index_files, cluster_input.method)
+        job = await run_in_threadpool(
+            schedule_ska_cluster_samples,
+            index_files,
+            cluster_input.method,
+            cluster_input.priority,
+        )
     else:
         try:
             profiles: TypingProfileOutput = await get_typing_profiles(
@@ -95,7 +125,21 @@ async def cluster_samples(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=error,
             ) from error
-        job = schedule_allele_cluster_samples(profiles, cluster_input.method)
+        try:
+            job = await run_in_threadpool(
+                schedule_allele_cluster_samples,
+                profiles,
+                cluster_input.method,
+                cluster_input.priority,
+            )
+        except ResourceLimitExceeded as error:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(error),
+            ) from error
+    await run_in_threadpool(
+        register_cluster_job, job, cache_key, cluster_input.sample_ids
+    )
     return job
 
 
@@ -136,5 +180,7 @@ async def index_genome_signatures(index_input: IndexInput) -> Dict[str, str]:
             detail=msg,
         )
     signature_paths = [Path(sig["genome_signature"]) for sig in signatures]
-    job_id: str = schedule_add_genome_signature_to_index(signature_paths)
+    job_id: str = await run_in_threadpool(
+        schedule_add_genome_signature_to_index, signature_paths
+    )
     return {"job_id": job_id}
@@ -4,8 +4,10 @@ from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, Security, status
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 from pymongo.errors import DuplicateKeyError
 
+from ..config import settings
 from ..crud.errors import EntryNotFound, UpdateDocumentError
 from ..crud.group import append_sample_to_group
 from ..crud.group import create_group as create_group_record
@@ -194,4 +196,7 @@ async def get_samples_in_group(
         prediction_result=prediction_result,
         qc_metrics=qc_metrics,
     )
+    if settings.trusted_reads:
+        # serialize the aggregated documents without validating them again
+        return ORJSONResponse(db_obj.model_dump(by_alias=True))
     return db_obj
@@ -1,10 +1,27 @@
 """Routes for interacting with submitted jobs."""
 
 import logging
+from typing import Dict, List
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import Field
+from rq.exceptions import NoSuchJobError
 
-from ..redis.queue import JobStatus, check_redis_job_status
+from ..models.base import RWModel
+from ..redis.cluster_cache import (
+    get_cached_job_status,
+    is_cached_job,
+    store_cluster_result,
+)
+from ..redis.events import job_status_events
+from ..redis.queue import (
+    JobStatus,
+    JobStatusCodes,
+    check_redis_job_status,
+    check_redis_jobs_status,
+)
 
 LOG = logging.getLogger(__name__)
 
@@ -26,5 +43,89 @@ async def check_job_status(job_id: str) -> JobStatus:
     :return: Job information.
     :rtype: JobStatus
     """
-    info = check_redis_job_status(job_id=job_id)
+    if is_cached_job(job_id):
+        return await get_cached_job_status(job_id)
+    info = await check_redis_job_status(job_id=job_id)
+    if info.status == JobStatusCodes.FINISHED:
+        await run_in_threadpool(store_cluster_result, job_id, info)
     return info
+
+
+class JobStatusQuery(RWModel):  # pylint: disable=too-few-public-methods
+    """Input data model for checking the status of multiple jobs."""
+
+    job_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    include_results: bool = True
+
+
+@router.post("/jobs/status", status_code=status.HTTP_200_OK, tags=DEFAULT_TAGS)
+async def check_jobs_status(query: JobStatusQuery) -> Dict[str, JobStatus | None]:
+    """Entrypoint for checking status of multiple jobs.
+
+    The results are only included for finished jobs if include_results is set.
+
+    :param query: Job ids and options
+    :type query: JobStatusQuery
+    :return: Job information by job id, null for jobs that does not exist.
+    :rtype: Dict[str, JobStatus | None]
+    """
+    job_ids = [job_id for job_id in query.job_ids if not is_cached_job(job_id)]
+    statuses = await check_redis_jobs_status(
+        job_ids, include_results=query.include_results
+    )
+    for job_id in query.job_ids:
+        if is_cached_job(job_id):
+            try:
+                info = await get_cached_job_status(job_id)
+            except NoSuchJobError:
+                info = None
+            if info is not None and not query.include_results:
+                info.result = None
+            statuses[job_id] = info
+        elif query.include_results and statuses[job_id] is not None:
+            if statuses[job_id].status == JobStatusCodes.FINISHED:
+                await run_in_threadpool(store_cluster_result, job_id, statuses[job_id])
+    return {job_id: statuses[job_id] for job_id in query.job_ids}
+
+
+@router.get("/job/status/{job_id}/events", tags=DEFAULT_TAGS)
+async def stream_job_status(job_id: str) -> StreamingResponse:
+    """Entrypoint for streaming status transitions of a job as Server-Sent Events.
+
+    A "status" event with the job information is sent each time the status
+    changes. The stream is closed when the job is done and the result is
+    included in the last event.
+
+    :param job_id: Redis job id
+    :type job_id: str
+    :raises HTTPException: 404 if the job does not exist
+    :return: Stream of job status events.
+    :rtype: StreamingResponse
+    """
+    events = job_status_events(job_id)
+    # get the first status before streaming to respond 404 for unknown jobs
+    try:
+        first = await anext(events)
+    except NoSuchJobError as error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found",
+        ) from error
+
+    async def format_event(info: JobStatus | None) -> str:
+        if info is None:
+            return ": keep-alive\n\n"
+        if info.status == JobStatusCodes.FINISHED:
+            await run_in_threadpool(store_cluster_result, job_id, info)
+        return f"event: status\ndata: {info.model_dump_json()}\n\n"
+
+    async def event_stream():
+        yield await format_event(first)
+        async for info in events:
+            yield await format_event(info)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,17 +2,17 @@
 
 import logging
 import pathlib
-from typing import Annotated
+from typing import Annotated, Dict
 
 from fastapi import APIRouter, Header, HTTPException, Query, status
-from fastapi.responses import FileResponse
 
 from ..config import settings
 from ..io import (
     InvalidRangeError,
     RangeOutOfBoundsError,
+    file_cache,
     is_file_readable,
-    send_partial_file,
+    send_file,
 )
 from ..models.antibiotics import ANTIBIOTICS
 from ..models.qc import VARIANT_REJECTION_REASONS
@@ -38,10 +38,19 @@ async def get_variant_rejection():
     return VARIANT_REJECTION_REASONS
 
 
+@router.get("/resources/file_cache", tags=DEFAULT_TAGS)
+async def get_file_cache_stats() -> Dict[str, int | float]:
+    """Get hit rate and size of the cache of index, annotation and alignment files."""
+    return file_cache.stats()
+
+
 @router.get("/resources/genome/info", tags=DEFAULT_TAGS)
 async def get_genome_resources(
     file: str = Query(..., description="Name of the annotation file with suffix"),
     range: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
+    if_range: Annotated[str | None, Header()] = None,
 ) -> str:
     """Genome sequence and annotated genes for a given reference genome."""
     base_path = pathlib.Path(settings.reference_genomes_dir)
@@ -63,20 +72,24 @@ async def get_genome_resources(
             detail=f"Error occured reading {file}.",
         )
 
-    # send file if byte range is not set
-    if range is None:
-        response = FileResponse(file_path, filename=file_path.name)
-    else:
-        try:
-            response = send_partial_file(file_path, range)
-        except InvalidRangeError as error:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=str(error),
-            ) from error
-        except RangeOutOfBoundsError as error:
-            raise HTTPException(
-                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
-                detail=str(error),
-            ) from error
+    # send the file, or the requested byte ranges of it
+    try:
+        response = await send_file(
+            file_path,
+            range,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
+            if_range=if_range,
+            filename=file_path.name,
+        )
+    except InvalidRangeError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+    except RangeOutOfBoundsError as error:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=str(error),
+        ) from error
     return response
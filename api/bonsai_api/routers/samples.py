@@ -1,8 +1,11 @@
 """Routers for reading or manipulating sample information."""
 
+import asyncio
 import logging
 import pathlib
-from typing import Annotated, Any, Dict, Union
+from collections import deque
+from typing import Annotated, Any, AsyncIterator, Dict, Literal, Union
+from uuid import uuid4
 
 from fastapi import (
     APIRouter,
@@ -13,10 +16,13 @@ from fastapi import (
     HTTPException,
     Path,
     Query,
+    Request,
     Security,
     status,
 )
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from prp.models import PipelineResult
 from prp.models.phenotype import (
     AMRMethodIndex,
@@ -27,14 +33,31 @@ from prp.models.phenotype import (
 from prp.models.sample import MethodIndex, ShigaTypingMethodIndex
 from pydantic import BaseModel, Field
 from pymongo.errors import DuplicateKeyError
+from redis.exceptions import RedisError
 
-from ..crud.sample import EntryNotFound, add_comment, add_location
+from ..config import settings
+from ..crud.errors import UpdateConflictError
+from ..crud.sample import (
+    EntryNotFound,
+    add_comment,
+    add_genome_signature_jobs,
+    add_location,
+)
 from ..crud.sample import create_sample as create_sample_record
+from ..crud.sample import create_samples as create_sample_records
 from ..crud.sample import delete_samples as delete_samples_from_db
-from ..crud.sample import get_sample, get_samples_summary
+from ..crud.sample import (
+    get_sample,
+    get_sample_document,
+    get_sample_fields,
+    get_sample_projection,
+    get_samples_summary,
+)
 from ..crud.sample import hide_comment as hide_comment_for_sample
-from ..crud.sample import update_sample as crud_update_sample
 from ..crud.sample import (
+    prepare_samples_in_executor,
+    resolve_sample_fields,
+    update_sample_fields,
     update_sample_qc_classification,
     update_variant_annotation_for_sample,
 )
@@ -44,7 +67,7 @@ from ..io import (
     InvalidRangeError,
     RangeOutOfBoundsError,
     is_file_readable,
-    send_partial_file,
+    send_file,
 )
 from ..models.base import MultipleRecordsResponseModel
 from ..models.location import LocationOutputDatabase
@@ -53,8 +76,8 @@ from ..models.sample import (
     SAMPLE_ID_PATTERN,
     Comment,
     CommentInDatabase,
-    SampleInCreate,
     SampleInDatabase,
+    SampleView,
 )
 from ..models.user import UserOutputDatabase
 from ..redis import ClusterMethod, TypingMethod
@@ -62,6 +85,7 @@ from ..redis.minhash import (
     SubmittedJob,
     schedule_add_genome_signature,
     schedule_add_genome_signature_to_index,
+    schedule_add_genome_signatures,
     schedule_find_similar_and_cluster,
     schedule_find_similar_samples,
 )
@@ -88,6 +112,23 @@ class SearchBody(BaseModel):  # pylint: disable=too-few-public-methods
     skip: int = 0
 
 
+class BulkSampleOutcome(BaseModel):  # pylint: disable=too-few-public-methods
+    """Outcome of creating one sample in a bulk upload."""
+
+    index: int = Field(..., description="Position of the result in the upload")
+    sample_id: str | None
+    status: Literal["created", "invalid", "failed"]
+    detail: str | None = None
+
+
+class BulkUploadResponse(BaseModel):  # pylint: disable=too-few-public-methods
+    """Result of a bulk upload of samples."""
+
+    n_created: int
+    samples: list[BulkSampleOutcome]
+    index_job: str | None = Field(None, description="Job indexing the signatures")
+
+
 DEFAULT_TAGS = [
     "samples",
 ]
@@ -123,6 +164,9 @@ async def samples_summary(
         include_samples=sid,
         qc_metrics=qc_metrics,
     )
+    if settings.trusted_reads:
+        # serialize the aggregated documents without validating them again
+        return ORJSONResponse(db_obj.model_dump(by_alias=False))
     return db_obj
 
 
@@ -145,6 +189,92 @@ async def create_sample(
     return {"type": "success", "sample_id": db_obj.sample_id}
 
 
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into non-empty lines."""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+@router.post(
+    "/samples/bulk",
+    status_code=status.HTTP_200_OK,
+    tags=DEFAULT_TAGS,
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+            "required": True,
+        }
+    },
+)
+async def create_samples_in_bulk(
+    request: Request,
+    db: Database = Depends(get_db),
+    current_user: UserOutputDatabase = Security(  # pylint: disable=unused-argument
+        get_current_active_user, scopes=[WRITE_PERMISSION]
+    ),
+) -> BulkUploadResponse:
+    """Create multiple samples from newline delimited JSON pipeline results.
+
+    Each line can include the minhash signature of the sample, "minhash_signature",
+    and the path to its SKA index, "ska_index". Results are validated in batches
+    while the upload is read, all valid samples are inserted even if some fail,
+    and the signatures are added to the index by one job. At most
+    bulk_upload_max_pending batches are validated or waiting to be inserted.
+    """
+    outcomes = []
+    signatures = {}
+
+    async def _create_batch(prepared):
+        samples = await prepared
+        errors = await create_sample_records(db, samples)
+        for position, sample in enumerate(samples):
+            outcome = BulkSampleOutcome(
+                index=len(outcomes), sample_id=sample.sample_id, status="created"
+            )
+            if sample.error is not None:
+                outcome.status, outcome.detail = "invalid", sample.error
+            elif position in errors:
+                outcome.status, outcome.detail = "failed", errors[position]
+            elif sample.signature is not None:
+                signatures[sample.sample_id] = sample.signature
+            outcomes.append(outcome)
+
+    # validate batches in the process pool while the rest is received
+    pending, batch = deque(), []
+    async for line in _iter_lines(request.stream()):
+        batch.append(line)
+        if len(batch) == settings.bulk_upload_batch_size:
+            pending.append(asyncio.ensure_future(prepare_samples_in_executor(batch)))
+            batch = []
+        if len(pending) == settings.bulk_upload_max_pending:
+            await _create_batch(pending.popleft())
+    if batch:
+        pending.append(asyncio.ensure_future(prepare_samples_in_executor(batch)))
+    while pending:
+        await _create_batch(pending.popleft())
+
+    index_job = None
+    if signatures:
+        signature_jobs, index_job = await run_in_threadpool(
+            schedule_add_genome_signatures, signatures
+        )
+        await add_genome_signature_jobs(
+            db, {sample_id: job.id for sample_id, job in signature_jobs.items()}
+        )
+    return BulkUploadResponse(
+        n_created=sum(outcome.status == "created" for outcome in outcomes),
+        samples=outcomes,
+        index_job=None if index_job is None else index_job.id,
+    )
+
+
 @router.delete("/samples/", status_code=status.HTTP_200_OK, tags=DEFAULT_TAGS)
 async def delete_many_samples(
     sample_ids: list[str],
@@ -164,23 +294,52 @@ async def delete_many_samples(
     return result
 
 
-@router.get("/samples/{sample_id}", response_model_by_alias=False, tags=DEFAULT_TAGS)
+@router.get(
+    "/samples/{sample_id}",
+    response_model=SampleInDatabase,
+    response_model_by_alias=False,
+    tags=DEFAULT_TAGS,
+)
 async def read_sample(
     sample_id: str = SAMPLE_ID_PATH,
+    view: SampleView | None = Query(None, description="Named subset of fields"),
+    include: list[str] = Query([], description="Fields to include"),
+    exclude: list[str] = Query([], description="Fields to exclude"),
     db: Database = Depends(get_db),
     current_user: UserOutputDatabase = Security(  # pylint: disable=unused-argument
         get_current_active_user, scopes=[READ_PERMISSION]
     ),
-) -> SampleInDatabase:
-    """Read sample with sample id from database."""
+) -> SampleInDatabase | Response:
+    """Read sample with sample id from database.
+
+    The complete sample is returned unless a view or fields to include or
+    exclude are given, then only those fields are read from the database.
+    """
     try:
-        sample_obj = await get_sample(db, sample_id)
+        fields = resolve_sample_fields(view, include, exclude)
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error)
+        ) from error
+    try:
+        if settings.trusted_reads:
+            # serialize the stored document without validating it again
+            return ORJSONResponse(await get_sample_document(db, sample_id, fields))
+        if fields is None:
+            sample_obj = await get_sample(db, sample_id)
+        else:
+            sample_obj = await get_sample_projection(db, sample_id, fields)
     except EntryNotFound as error:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(error),
         ) from error
-    return sample_obj
+    if fields is None:
+        return sample_obj
+    # requested fields that are not set in the database are returned as null
+    return JSONResponse(
+        jsonable_encoder(sample_obj, include={"id", *fields}, by_alias=False)
+    )
 
 
 class UpdateSampleInputModel(BaseModel):
@@ -238,7 +397,7 @@ async def create_genome_signatures_sample(
     """Entrypoint for uploading a genome signature to the database."""
     # verify that sample are in database
     try:
-        sample = await get_sample(db, sample_id)
+        sample = await get_sample_fields(db, sample_id, ["genome_signature"])
     except EntryNotFound as error:
         raise HTTPException(
             status_code=404, detail=format_error_message(error)
@@ -248,20 +407,43 @@ async def create_genome_signatures_sample(
     sig_exist_err = HTTPException(
         status_code=409, detail="Signature is already added to sample"
     )
-    if sample.genome_signature is not None:
+    if sample.get("genome_signature") is not None:
         raise sig_exist_err
 
-    add_sig_job = schedule_add_genome_signature(sample_id, signature)
-    index_job = schedule_add_genome_signature_to_index(
-        [sample_id],
-        depends_on=[add_sig_job.id],
-    )
+    # claim the sample for the signature job before it is enqueued, so that
+    # concurrent uploads cannot both schedule a job
+    add_sig_job_id = uuid4().hex
+    try:
+        await update_sample_fields(
+            db,
+            sample_id,
+            set_fields={"genome_signature": add_sig_job_id},
+            expected_modified_at=sample["modified_at"],
+            expected_fields={"genome_signature": None},
+        )
+    except UpdateConflictError as error:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=str(error)
+        ) from error
 
-    # updated sample in database with signature object jobid
-    # recast the data to proper object
-    sample_obj = {**sample.model_dump(), **{"genome_signature": add_sig_job.id}}
-    upd_sample_data = SampleInCreate(**sample_obj)
-    await crud_update_sample(db, upd_sample_data)
+    try:
+        add_sig_job = await run_in_threadpool(
+            schedule_add_genome_signature, sample_id, signature, job_id=add_sig_job_id
+        )
+        index_job = await run_in_threadpool(
+            schedule_add_genome_signature_to_index,
+            [sample_id],
+            depends_on=[add_sig_job.id],
+        )
+    except RedisError:
+        # release the claim if the job could not be enqueued
+        await update_sample_fields(
+            db,
+            sample_id,
+            set_fields={"genome_signature": None},
+            expected_fields={"genome_signature": add_sig_job_id},
+        )
+        raise
 
     return {
         "id": sample_id,
@@ -279,7 +461,7 @@ async def add_ska_index_to_sample(
     """Entrypoint for associating a SKA index with the sample."""
     # verify that sample are in database
     try:
-        sample = await get_sample(db, sample_id)
+        sample = await get_sample_fields(db, sample_id, ["ska_index"])
     except EntryNotFound as error:
         raise HTTPException(
             status_code=404, detail=format_error_message(error)
@@ -289,14 +471,21 @@ async def add_ska_index_to_sample(
     idx_exist_err = HTTPException(
         status_code=409, detail="Sample is already associated with an SKA index."
     )
-    if sample.ska_index is not None:
+    if sample.get("ska_index") is not None:
         raise idx_exist_err
 
-    # updated sample in database with signature object jobid
-    # recast the data to proper object
-    sample_obj = {**sample.model_dump(), **{"ska_index": index}}
-    upd_sample_data = SampleInCreate(**sample_obj)
-    await crud_update_sample(db, upd_sample_data)
+    # updated sample in database with the index path
+    try:
+        await update_sample_fields(
+            db,
+            sample_id,
+            set_fields={"ska_index": index},
+            expected_modified_at=sample["modified_at"],
+        )
+    except UpdateConflictError as error:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=str(error)
+        ) from error
 
     return {"sample_id": sample_id, "index_file": index}
 
@@ -306,6 +495,9 @@ async def get_sample_read_mapping(
     sample_id: str,
     index: bool = Query(False),
     range: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
+    if_range: Annotated[str | None, Header()] = None,
     db: Database = Depends(get_db),
 ) -> str:
     """Get read mapping results for a sample."""
@@ -334,22 +526,25 @@ async def get_sample_read_mapping(
             detail="Alignment file could not be processed",
         )
 
-    # send file if byte range is not set
-    if range is None:
-        response = FileResponse(file_path)
-    else:
-        try:
-            response = send_partial_file(file_path, range)
-        except InvalidRangeError as error:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=str(error),
-            ) from error
-        except RangeOutOfBoundsError as error:
-            raise HTTPException(
-                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
-                detail=str(error),
-            ) from error
+    # send the file, or the requested byte ranges of it
+    try:
+        response = await send_file(
+            file_path,
+            range,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
+            if_range=if_range,
+        )
+    except InvalidRangeError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+    except RangeOutOfBoundsError as error:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=str(error),
+        ) from error
     return response
 
 
@@ -358,6 +553,9 @@ async def get_vcf_files_for_sample(
     sample_id: str = Path(...),
     variant_type: VariantType = Query(...),
     range: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
+    if_range: Annotated[str | None, Header()] = None,
     db: Database = Depends(get_db),
 ) -> str:
     """Get vcfs associated with the sample."""
@@ -392,22 +590,25 @@ async def get_vcf_files_for_sample(
             detail="Alignment file could not be processed",
         )
 
-    # send file if byte range is not set
-    if range is None:
-        response = FileResponse(file_path)
-    else:
-        try:
-            response = send_partial_file(file_path, range)
-        except InvalidRangeError as error:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=str(error),
-            ) from error
-        except RangeOutOfBoundsError as error:
-            raise HTTPException(
-                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
-                detail=str(error),
-            ) from error
+    # send the file, or the requested byte ranges of it
+    try:
+        response = await send_file(
+            file_path,
+            range,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
+            if_range=if_range,
+        )
+    except InvalidRangeError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error),
+        ) from error
+    except RangeOutOfBoundsError as error:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=str(error),
+        ) from error
     return response
 
 
@@ -420,18 +621,13 @@ async def add_vcf_to_sample(
     """Entrypoint for uploading varants in vcf format to the sample."""
     # verify that sample are in database
     try:
-        sample = await get_sample(db, sample_id)
+        await get_sample_fields(db, sample_id, [])
     except EntryNotFound as error:
         raise HTTPException(
             status_code=404, detail=format_error_message(error)
         ) from error
 
-    # updated sample in database with signature object jobid
-    # recast the data to proper object
-    sample_obj = {**sample.model_dump(), **{"str_variants": ""}}
-    upd_sample_data = SampleInCreate(**sample_obj)
-    await crud_update_sample(db, upd_sample_data)
-
+    # the variants are not parsed or stored yet
     return {"id": sample_id, "n_variants": 0}
 
 
@@ -484,6 +680,10 @@ async def update_variant_annotation(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(error),
         ) from error
+    except UpdateConflictError as error:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=str(error)
+        ) from error
     return sample_info
 
 
@@ -592,7 +792,8 @@ async def find_similar_samples(
     """
     LOG.info("ref: %s, body: %s, cluster: %s", sample_id, body, body.cluster)
     if body.cluster:
-        submission_info: SubmittedJob = schedule_find_similar_and_cluster(
+        submission_info: SubmittedJob = await run_in_threadpool(
+            schedule_find_similar_and_cluster,
             sample_id,
             min_similarity=body.similarity,
             limit=body.limit,
@@ -600,7 +801,8 @@ async def find_similar_samples(
             cluster_method=body.cluster_method,
         )
     else:
-        submission_info: SubmittedJob = schedule_find_similar_samples(
+        submission_info: SubmittedJob = await run_in_threadpool(
+            schedule_find_similar_samples,
             sample_id,
             min_similarity=body.similarity,
             limit=body.limit,
@@ -0,0 +1,86 @@
+"""Test scheduling of allele clustering jobs."""
+
+import pytest
+from bonsai_api.crud.sample import TypingProfileAggregate
+from bonsai_api.redis import MsTreeMethods
+from bonsai_api.redis.allele_cluster import (
+    ResourceLimitExceeded,
+    estimate_consumption,
+    schedule_cluster_samples,
+)
+from bonsai_api.redis.queue import JobPriority
+
+
+def _profiles(n_samples, n_loci):
+    """Create distinct allele profiles."""
+    return [
+        TypingProfileAggregate(
+            sample_id=f"sample_{i}",
+            typing_result={f"locus_{j}": i * n_loci + j for j in range(n_loci)},
+        )
+        for i in range(n_samples)
+    ]
+
+
+def test_estimate_increase_with_samples():
+    """Test that the predicted consumption grows with the number of samples."""
+    small = estimate_consumption("MSTreeV2", n_profiles=100, n_loci=3000, n_proc=5)
+    large = estimate_consumption("MSTreeV2", n_profiles=10000, n_loci=3000, n_proc=5)
+    assert small.runtime < large.runtime
+    assert small.memory < large.memory
+    # the approximate tree should scale to large collections
+    approx = estimate_consumption("MSTreeApprox", 100000, 3000, 5)
+    exact = estimate_consumption("MSTree", 100000, 3000, 5)
+    assert approx.runtime < exact.runtime
+    assert approx.memory < exact.memory
+    # methods without a model should not be estimated
+    assert estimate_consumption("single", 100, 3000, 5) is None
+
+
+@pytest.mark.parametrize("method", list(MsTreeMethods))
+@pytest.mark.parametrize("n_profiles", [10, 1000, 20000])
+def test_estimate_matches_allele_cluster_service(method, n_profiles):
+    """Test that the estimate is the same as the one of the clustering service."""
+    ms_trees = pytest.importorskip("allele_cluster_service.ms_trees")
+    params = ms_trees.ClusterConfig(method=method.value).method_params()
+    runtime, memory = ms_trees.estimate_Consumption(
+        "Linux", params["method"], params["matrix_type"], 5, 3000, n_profiles
+    )
+    estimate = estimate_consumption(method.value, n_profiles, n_loci=3000, n_proc=5)
+    assert estimate.runtime == pytest.approx(runtime)
+    assert estimate.memory == pytest.approx(memory)
+
+
+@pytest.mark.parametrize(
+    "max_memory,queue_name",
+    [(4 * 1024**3, "allele"), (400 * 1024**2, "allele_large")],
+)
+@pytest.mark.parametrize("priority", [JobPriority.HIGH, JobPriority.LOW])
+def test_schedule_routes_jobs_on_size(mocker, max_memory, queue_name, priority):
+    """Test that jobs are sent to the small or large queue depending on size."""
+    mock_redis = mocker.patch("bonsai_api.redis.allele_cluster.redis")
+    mocker.patch("bonsai_api.redis.queue.redis")  # no identical jobs are running
+    mocker.patch(
+        "bonsai_api.redis.allele_cluster.settings.allele_cluster_small_job_memory",
+        max_memory,
+    )
+    mock_redis.get_queue.return_value.enqueue.return_value.id = "job"
+    schedule_cluster_samples(_profiles(5, 10), MsTreeMethods.MSTREE_V2, priority)
+
+    mock_redis.get_queue.assert_called_once_with(queue_name, priority)
+    queue = mock_redis.get_queue.return_value
+    queue.enqueue.assert_called_once()
+    # job timeout should be based on the predicted runtime
+    assert isinstance(queue.enqueue.call_args.kwargs["job_timeout"], int)
+
+
+def test_schedule_rejects_too_large_jobs(mocker):
+    """Test that jobs exceeding the worker capacity are rejected."""
+    mock_redis = mocker.patch("bonsai_api.redis.allele_cluster.redis")
+    mocker.patch(
+        "bonsai_api.redis.allele_cluster.settings.allele_cluster_max_memory",
+        1024**2,
+    )
+    with pytest.raises(ResourceLimitExceeded):
+        schedule_cluster_samples(_profiles(5, 10), MsTreeMethods.MSTREE_V2)
+    mock_redis.get_queue.assert_not_called()
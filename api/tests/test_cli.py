@@ -1,7 +1,7 @@
 """Test Bonsai CLI commands."""
 
 import pandas as pd
-from bonsai_api.cli import export
+from bonsai_api.cli import export, update_tags
 from bonsai_api.io import TARGETED_ANTIBIOTICS
 from click.testing import CliRunner
 
@@ -30,3 +30,14 @@ def test_export_sample(mocker, sample_database_context):
             ]
         )
         assert len(df) == n_antibiotics + 3  # + lineage, qc, and spp pred
+
+
+def test_update_tags(mocker, sample_database_context):
+    """Test that the tags of all samples are recomputed and written."""
+    mocker.patch("bonsai_api.cli.get_db_connection", lambda: sample_database_context)
+
+    runner = CliRunner()
+    result = runner.invoke(update_tags, ["--workers", "1"])
+
+    assert result.exit_code == 0
+    assert "Updated tags for 1 samples" in result.output
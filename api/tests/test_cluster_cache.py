@@ -0,0 +1,147 @@
+"""Test caching of clustering results."""
+
+from datetime import datetime
+
+import pytest
+from bonsai_api.redis import MsTreeMethods, SubmittedJob, TypingMethod
+from bonsai_api.redis.cluster_cache import (
+    cluster_cache_key,
+    get_cached_cluster_job,
+    get_cached_job_status,
+    invalidate_samples,
+    register_cluster_job,
+    store_cluster_result,
+)
+from bonsai_api.redis.queue import JobStatus, JobStatusCodes
+
+
+class InMemoryRedis:
+    """Minimal in memory replacement of the redis commands used by the cache."""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.scores = {}
+
+    def pipeline(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self):
+        pass
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            key = key.decode() if isinstance(key, bytes) else key
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+
+    def expire(self, key, ttl):
+        pass
+
+    def sadd(self, key, value):
+        self.sets.setdefault(key, set()).add(value.encode())
+
+    def srem(self, key, value):
+        self.sets.get(key, set()).discard(value.encode())
+
+    def smembers(self, key):
+        return self.sets.get(key, set())
+
+    def zadd(self, key, mapping):
+        self.scores.update(mapping)
+
+    def zcard(self, key):
+        return len(self.scores)
+
+    def zrange(self, key, start, end):
+        return sorted(self.scores, key=self.scores.get)[start : end + 1]
+
+    def zrem(self, key, *members):
+        for member in members:
+            member = member.decode() if isinstance(member, bytes) else member
+            self.scores.pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        pass
+
+
+class AsyncInMemoryRedis:
+    """Async view of the in memory store."""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def get(self, key):
+        return self.store.get(key)
+
+
+@pytest.fixture()
+def cache_redis(mocker):
+    """Replace the redis connection with an in memory store."""
+    mock_redis = mocker.patch("bonsai_api.redis.cluster_cache.redis")
+    mock_redis.connection = InMemoryRedis()
+    mock_redis.async_connection = AsyncInMemoryRedis(mock_redis.connection)
+    return mock_redis.connection
+
+
+def _finished_job(result):
+    now = datetime.now()
+    return JobStatus(
+        status=JobStatusCodes.FINISHED,
+        queue="allele_cluster",
+        result=result,
+        submitted_at=now,
+        started_at=now,
+        finished_at=now,
+    )
+
+
+def test_cache_key_is_independent_of_sample_order():
+    """Test that the cache key identifies the samples, method and data version."""
+    cgmlst, mstree = TypingMethod.CGMLST, MsTreeMethods.MSTREE_V2
+    key = cluster_cache_key(cgmlst, mstree, {"s1": "v1", "s2": "v1"})
+    assert key == cluster_cache_key(cgmlst, mstree, {"s2": "v1", "s1": "v1"})
+    assert key != cluster_cache_key(cgmlst, mstree, {"s1": "v1", "s2": "v2"})
+    assert key != cluster_cache_key(
+        cgmlst, MsTreeMethods.NEIGHBOR_JOINING, {"s1": "v1", "s2": "v1"}
+    )
+
+
+async def test_finished_job_is_cached_and_invalidated(cache_redis):
+    """Test that the result of a finished job is returned until a sample changes."""
+    job = SubmittedJob(id="job-1", task="allele_cluster_service.tasks.cluster")
+    register_cluster_job(job, "key", ["s1", "s2"])
+    assert get_cached_cluster_job("key") is None
+
+    assert store_cluster_result("job-1", _finished_job("(s1:1,s2:1);"))
+    cached_job = get_cached_cluster_job("key")
+    assert cached_job.id == "cached-key"
+    assert cached_job.task == job.task
+    status = await get_cached_job_status(cached_job.id)
+    assert status.status == JobStatusCodes.FINISHED
+    assert status.result == "(s1:1,s2:1);"
+
+    # updating a sample invalidates the cached result
+    assert invalidate_samples(["s2"]) == 1
+    assert get_cached_cluster_job("key") is None
+
+
+def test_jobs_of_changed_samples_are_not_cached(cache_redis):
+    """Test that a job is not cached if a sample changed while it was running."""
+    job = SubmittedJob(id="job-1", task="minhash_service.tasks.cluster")
+    register_cluster_job(job, "key", ["s1", "s2"])
+    invalidate_samples(["s1"])
+    assert not store_cluster_result("job-1", _finished_job("(s1:1,s2:1);"))
+    assert get_cached_cluster_job("key") is None
@@ -1,6 +1,14 @@
 """Test IO functions."""
 
-from bonsai_api.io import TARGETED_ANTIBIOTICS, sample_to_kmlims
+import pytest
+from bonsai_api.config import settings
+from bonsai_api.io import (
+    TARGETED_ANTIBIOTICS,
+    InvalidRangeError,
+    file_cache,
+    parse_byte_ranges,
+    sample_to_kmlims,
+)
 
 
 def test_sample_to_kmlims(mtuberculosis_sample):
@@ -17,3 +25,117 @@ def test_sample_to_kmlims(mtuberculosis_sample):
     # test that,
     # the targeted antibiotics were reported
     assert len(result) == n_exp_antibiotics + 3  # + lineage, qc, and spp pred
+
+
+@pytest.fixture()
+def genome_file(mocker, tmp_path):
+    """Reference genome file served by the API."""
+    mocker.patch.object(settings, "reference_genomes_dir", str(tmp_path))
+    path = tmp_path / "ref.fasta"
+    path.write_bytes(bytes(range(256)) * 1024)
+    return path
+
+
+@pytest.mark.parametrize(
+    "byte_range, expected",
+    [
+        ("bytes=0-99", [(0, 99)]),
+        ("bytes=100-", [(100, None)]),
+        ("bytes=-500", [(None, 500)]),
+        ("bytes=0-9, 20-29", [(0, 9), (20, 29)]),
+    ],
+)
+def test_parse_byte_ranges(byte_range, expected):
+    """Test parsing of single, open, suffix and multiple byte ranges."""
+    assert parse_byte_ranges(byte_range) == expected
+
+
+@pytest.mark.parametrize("byte_range", ["bytes=9-0", "bytes=-", "lines=0-9", "bytes="])
+def test_parse_invalid_byte_ranges(byte_range):
+    """Test that malformed byte ranges are rejected."""
+    with pytest.raises(InvalidRangeError):
+        parse_byte_ranges(byte_range)
+
+
+def test_send_file_ranges(fastapi_client, genome_file):
+    """Test that single and multiple byte ranges are streamed."""
+    url = "/resources/genome/info?file=ref.fasta"
+    content = genome_file.read_bytes()
+
+    response = fastapi_client.get(url, headers={"Range": "bytes=1000-70000"})
+    assert response.status_code == 206
+    assert response.content == content[1000:70001]
+    assert response.headers["content-range"] == f"bytes 1000-70000/{len(content)}"
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    response = fastapi_client.get(url, headers={"Range": "bytes=0-9,-10"})
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges")
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert content[:10] in response.content
+    assert f"bytes {len(content) - 10}-{len(content) - 1}/".encode() in response.content
+
+    response = fastapi_client.get(url, headers={"Range": f"bytes={len(content)}-"})
+    assert response.status_code == 416
+
+
+def test_send_file_conditional_requests(fastapi_client, genome_file):
+    """Test that unchanged files are not sent again."""
+    url = "/resources/genome/info?file=ref.fasta"
+    response = fastapi_client.get(url)
+    assert response.status_code == 200
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    response = fastapi_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = fastapi_client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # the whole file is sent if the range is for an older version of the file
+    headers = {"Range": "bytes=0-9", "If-Range": '"outdated"'}
+    response = fastapi_client.get(url, headers=headers)
+    assert response.status_code == 200
+    headers["If-Range"] = etag
+    response = fastapi_client.get(url, headers=headers)
+    assert response.status_code == 206
+
+
+def test_file_cache(fastapi_client, genome_file, mocker):
+    """Test that small files are served from the cache until they change."""
+    mocker.patch.object(file_cache, "max_file_size", 1024**2)
+    file_cache.clear()
+    url = "/resources/genome/info?file=ref.fasta"
+    content = genome_file.read_bytes()
+
+    for _ in range(2):
+        response = fastapi_client.get(url, headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.content == content[10:20]
+    response = fastapi_client.get(url)
+    assert response.content == content
+    stats = fastapi_client.get("/resources/file_cache").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+
+    # a changed file is read again
+    genome_file.write_bytes(b"changed")
+    response = fastapi_client.get(url)
+    assert response.content == b"changed"
+    assert file_cache.stats()["misses"] == 2
+    assert file_cache.stats()["entries"] == 1
+
+
+def test_cached_file_has_same_headers(fastapi_client, genome_file, mocker):
+    """Test that a cached file is sent with the same headers as a streamed file."""
+    url = "/resources/genome/info?file=ref.fasta"
+    mocker.patch.object(file_cache, "max_file_size", 0)
+    file_cache.clear()
+    streamed = fastapi_client.get(url)
+    mocker.patch.object(file_cache, "max_file_size", 1024**2)
+    fastapi_client.get(url)
+    hits = file_cache.stats()["hits"]
+    cached = fastapi_client.get(url)
+    assert file_cache.stats()["hits"] == hits + 1
+
+    assert cached.content == streamed.content
+    assert streamed.headers["accept-ranges"] == "bytes"
+    assert {**cached.headers, "date": None} == {**streamed.headers, "date": None}
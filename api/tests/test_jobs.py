@@ -0,0 +1,126 @@
+"""Test job status routes."""
+
+import json
+from datetime import datetime
+
+from bonsai_api.redis.events import job_status_events
+from bonsai_api.redis.queue import JobStatus, JobStatusCodes
+from rq.exceptions import NoSuchJobError
+
+
+def _job_status(status, result=None):
+    now = datetime.now()
+    return JobStatus(
+        status=status,
+        queue="minhash",
+        result=result,
+        submitted_at=now,
+        started_at=None,
+        finished_at=None,
+    )
+
+
+class FakePubSub:
+    """Pub/sub that delivers a message for each queued transition."""
+
+    def __init__(self, n_messages):
+        self.n_messages = n_messages
+
+    async def subscribe(self, channel):
+        self.channel = channel
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        if self.n_messages == 0:
+            return None
+        self.n_messages -= 1
+        return {"data": b'{"status": "changed"}'}
+
+    async def aclose(self):
+        pass
+
+
+async def test_job_status_events(mocker):
+    """Test that status transitions are yielded until the job is done."""
+    # one transition is published and the other is found on heartbeat
+    pubsub = FakePubSub(n_messages=1)
+    mock_redis = mocker.patch("bonsai_api.redis.events.redis")
+    mock_redis.async_connection.pubsub.return_value = pubsub
+    statuses = [
+        _job_status(JobStatusCodes.QUEUED),
+        _job_status(JobStatusCodes.QUEUED),  # heartbeat without transition
+        _job_status(JobStatusCodes.STARTED),
+        _job_status(JobStatusCodes.FINISHED, result="(a:1,b:1);"),
+    ]
+    mocker.patch("bonsai_api.redis.events.check_redis_job_status", side_effect=statuses)
+
+    events = [event async for event in job_status_events("job-1", heartbeat=0)]
+    assert pubsub.channel == "bonsai:job:job-1"
+    assert [event.status if event else None for event in events] == [
+        JobStatusCodes.QUEUED,
+        None,
+        JobStatusCodes.STARTED,
+        JobStatusCodes.FINISHED,
+    ]
+    assert events[-1].result == "(a:1,b:1);"
+
+
+def test_stream_job_status(mocker, fastapi_client):
+    """Test that job status is streamed as Server-Sent Events."""
+
+    async def events(job_id):
+        yield _job_status(JobStatusCodes.STARTED)
+        yield None
+        yield _job_status(JobStatusCodes.FINISHED, result="(a:1,b:1);")
+
+    mocker.patch("bonsai_api.routers.jobs.job_status_events", events)
+    store_result = mocker.patch("bonsai_api.routers.jobs.store_cluster_result")
+    response = fastapi_client.get("/job/status/job-1/events")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = response.text.strip().split("\n\n")
+    assert messages[1] == ": keep-alive"
+    data = [json.loads(msg.split("data: ")[1]) for msg in messages if "data: " in msg]
+    assert [info["status"] for info in data] == ["started", "finished"]
+    assert data[-1]["result"] == "(a:1,b:1);"
+    store_result.assert_called_once()
+
+
+def test_check_jobs_status(mocker, fastapi_client):
+    """Test checking the status of multiple jobs in one request."""
+    statuses = {
+        "job-1": _job_status(JobStatusCodes.QUEUED),
+        "job-2": _job_status(JobStatusCodes.FINISHED, result="(a:1,b:1);"),
+        "missing": None,
+    }
+    check_status = mocker.patch(
+        "bonsai_api.routers.jobs.check_redis_jobs_status", return_value=statuses
+    )
+    store_result = mocker.patch("bonsai_api.routers.jobs.store_cluster_result")
+
+    response = fastapi_client.post(
+        "/jobs/status", json={"job_ids": ["job-1", "job-2", "missing"]}
+    )
+    assert response.status_code == 200
+    check_status.assert_awaited_once_with(
+        ["job-1", "job-2", "missing"], include_results=True
+    )
+    statuses = response.json()
+    assert statuses["job-1"]["status"] == "queued"
+    assert statuses["job-2"]["result"] == "(a:1,b:1);"
+    assert statuses["missing"] is None
+    # finished jobs are stored in the cluster cache
+    store_result.assert_called_once()
+
+
+def test_stream_job_status_not_found(mocker, fastapi_client):
+    """Test that streaming the status of an unknown job returns 404."""
+    mock_redis = mocker.patch("bonsai_api.redis.events.redis")
+    mock_redis.async_connection.pubsub.return_value = FakePubSub(n_messages=0)
+    mocker.patch(
+        "bonsai_api.redis.events.check_redis_job_status",
+        side_effect=NoSuchJobError("No such job: job-1"),
+    )
+
+    response = fastapi_client.get("/job/status/job-1/events")
+    assert response.status_code == 404
@@ -0,0 +1,47 @@
+"""Test LDAP authentication."""
+
+import pytest
+from bonsai_api.extensions.ldap_extension import LDAPConnection
+from ldap3.core.exceptions import LDAPSocketOpenError
+
+
+@pytest.fixture()
+def ldap(mocker):
+    """LDAP extension that creates mocked connections."""
+    ldap = LDAPConnection(pool_size=2)
+    connect = mocker.patch.object(ldap, "connect")
+    connect.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+    return ldap
+
+
+def test_connections_are_reused_between_logins(ldap):
+    """Test that logins rebind a pooled connection instead of connecting."""
+    dn = "cn=user,dc=example,dc=com"
+    assert ldap.authenticate(dn, "secret")
+    assert ldap.authenticate(dn, "secret")
+    assert ldap.connect.call_count == 1
+
+    conn = ldap._pool.get_nowait()
+    user_bind, service_bind = conn.rebind.call_args_list[-2:]
+    assert user_bind.kwargs["user"] == dn
+    # connection is rebound to the service account before it is returned
+    assert service_bind.kwargs.get("user") != dn
+
+
+def test_failed_logins(ldap):
+    """Test that failed binds and empty passwords are rejected."""
+    dn = "cn=user,dc=example,dc=com"
+    assert not ldap.authenticate(dn, "")
+    with ldap.service_connection() as conn:
+        conn.rebind.side_effect = [False, True]
+    assert not ldap.authenticate(dn, "wrong")
+
+
+def test_broken_connections_are_discarded(ldap):
+    """Test that a connection that raised an LDAP error is not reused."""
+    with pytest.raises(LDAPSocketOpenError):
+        with ldap.service_connection() as conn:
+            raise LDAPSocketOpenError("connection lost")
+    with ldap.service_connection() as new_conn:
+        assert new_conn is not conn
+    conn.unbind.assert_called_once()
@@ -0,0 +1,297 @@
+"""Test helpers for submitting jobs to the redis queue."""
+
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from bonsai_api.redis.queue import (
+    INFLIGHT_TTL,
+    check_redis_job_status,
+    check_redis_jobs_status,
+    enqueue_unique,
+    job_fingerprint,
+    serializer,
+)
+from bonsai_api.redis.serializer import ResultSerializer
+from redis import Redis
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+from rq.results import Result
+
+
+class InflightStore:
+    """In memory replacement of the redis commands used for fingerprints."""
+
+    def __init__(self):
+        self.values = {}
+        self.claimed_at = {}
+        self.lock = threading.Lock()
+
+    def set(self, key, value, nx=False, ex=None):
+        with self.lock:
+            if nx and key in self.values:
+                return None
+            self.values[key] = value.encode()
+            self.claimed_at[key] = time.monotonic()
+            return True
+
+    def get(self, key):
+        with self.lock:
+            return self.values.get(key)
+
+    def ttl(self, key):
+        with self.lock:
+            if key not in self.values:
+                return -2
+            return INFLIGHT_TTL - int(time.monotonic() - self.claimed_at[key])
+
+    def eval(self, script, numkeys, key, value):
+        """Run the compare-and-delete script."""
+        with self.lock:
+            if self.values.get(key) != value.encode():
+                return 0
+            del self.values[key]
+            return 1
+
+
+@pytest.fixture()
+def queue(mocker):
+    """Queue with mocked redis connection."""
+    mock_redis = mocker.patch("bonsai_api.redis.queue.redis")
+    mock_redis.connection = InflightStore()
+    mock_queue = mocker.MagicMock()
+    mock_queue.name = "minhash"
+    mock_queue.enqueue.side_effect = lambda task, job_id, **kwargs: mocker.MagicMock(
+        id=job_id
+    )
+    return mock_queue
+
+
+def test_job_fingerprint():
+    """Test that jobs with the same task and arguments have the same fingerprint."""
+    queue = type("Queue", (), {"name": "minhash"})
+    fingerprint = job_fingerprint(queue, "task", sample_ids=["s1"], method="single")
+    assert fingerprint == job_fingerprint(
+        queue, "task", method="single", sample_ids=["s1"]
+    )
+    assert fingerprint != job_fingerprint(
+        queue, "task", sample_ids=["s1"], method="complete"
+    )
+
+
+@pytest.mark.parametrize(
+    "existing_status,is_attached",
+    [("queued", True), ("started", True), ("finished", False)],
+)
+def test_identical_jobs_are_attached(mocker, queue, existing_status, is_attached):
+    """Test that identical submissions are attached to the queued or running job."""
+    first = enqueue_unique(queue, "task", job_timeout="30m", sample_ids=["s1"])
+    fetch = mocker.patch("bonsai_api.redis.queue.Job.fetch")
+    fetch.return_value.id = first.id
+    fetch.return_value.get_status.return_value = existing_status
+
+    second = enqueue_unique(queue, "task", job_timeout="30m", sample_ids=["s1"])
+    assert (second.id == first.id) is is_attached
+    assert queue.enqueue.call_count == (1 if is_attached else 2)
+
+
+def test_different_jobs_are_enqueued(mocker, queue):
+    """Test that jobs with different arguments or abandoned claims are enqueued."""
+    first = enqueue_unique(queue, "task", job_timeout="30m", sample_ids=["s1"])
+    second = enqueue_unique(queue, "task", job_timeout="30m", sample_ids=["s2"])
+    assert first.id != second.id
+
+    mocker.patch("bonsai_api.redis.queue.Job.fetch", side_effect=NoSuchJobError)
+    mocker.patch("bonsai_api.redis.queue.INFLIGHT_CLAIM_TIMEOUT", 0)
+    third = enqueue_unique(queue, "task", job_timeout="30m", sample_ids=["s1"])
+    assert third.id != first.id
+    assert queue.enqueue.call_count == 3
+
+
+def test_jobs_reading_changed_data_are_enqueued(mocker, queue):
+    """Test that a job is not reused once the data it reads has changed."""
+    first = enqueue_unique(
+        queue, "task", job_timeout="30m", data_versions={"s1": "1"}, sample_ids=["s1"]
+    )
+    fetch = mocker.patch("bonsai_api.redis.queue.Job.fetch")
+    fetch.return_value.id = first.id
+    fetch.return_value.get_status.return_value = "queued"
+
+    second = enqueue_unique(
+        queue, "task", job_timeout="30m", data_versions={"s1": "2"}, sample_ids=["s1"]
+    )
+    assert second.id != first.id
+    # the versions are not passed to the task
+    assert "data_versions" not in queue.enqueue.call_args.kwargs
+    assert queue.enqueue.call_count == 2
+
+
+def test_claimed_job_is_not_released_before_enqueued(mocker, queue):
+    """Test that a claim whose job is not yet enqueued is waited for."""
+    first = enqueue_unique(queue, "task", job_timeout="30m", sample_ids=["s1"])
+    # the job becomes visible after the second submitter has polled once
+    queued_job = mocker.MagicMock(id=first.id)
+    queued_job.get_status.return_value = "queued"
+    mocker.patch(
+        "bonsai_api.redis.queue.Job.fetch", side_effect=[NoSuchJobError, queued_job]
+    )
+
+    second = enqueue_unique(queue, "task", job_timeout="30m", sample_ids=["s1"])
+    assert second.id == first.id
+    assert queue.enqueue.call_count == 1
+
+
+def test_concurrent_submissions_enqueue_one_job(mocker, queue):
+    """Test that concurrent identical submissions result in a single job."""
+    jobs = {}
+
+    def enqueue(task, job_id, **kwargs):
+        time.sleep(0.01)  # widen the window between claim and enqueue
+        job = mocker.MagicMock(id=job_id)
+        job.get_status.return_value = "queued"
+        jobs[job_id] = job
+        return job
+
+    def fetch(job_id, **kwargs):
+        if job_id not in jobs:
+            raise NoSuchJobError
+        return jobs[job_id]
+
+    queue.enqueue.side_effect = enqueue
+    mocker.patch("bonsai_api.redis.queue.Job.fetch", side_effect=fetch)
+    mocker.patch("bonsai_api.redis.queue.INFLIGHT_POLL_INTERVAL", 0.001)
+
+    n_submitters = 16
+    barrier = threading.Barrier(n_submitters)
+    job_ids = []
+
+    def submit():
+        barrier.wait()
+        job = enqueue_unique(queue, "task", job_timeout="30m", sample_ids=["s1"])
+        job_ids.append(job.id)
+
+    threads = [threading.Thread(target=submit) for _ in range(n_submitters)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert queue.enqueue.call_count == 1
+    assert len(job_ids) == n_submitters
+    assert set(job_ids) == set(jobs)
+
+
+class JobStore:
+    """In memory replacement of the async redis commands used for job status."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.results = {}
+        self.commands = []
+
+    def add_job(self, job_id, status, meta=None, result=None):
+        """Store a job hash, and its result, in the format used by rq."""
+        job = Job.create(
+            "tasks.cluster", id=job_id, connection=Redis(), serializer=serializer
+        )
+        job.origin = "ska"
+        job.enqueued_at = datetime.now()
+        job.meta = meta or {}
+        job._status = status  # pylint: disable=protected-access
+        self.jobs[Job.key_for(job_id)] = {
+            key.encode(): value if isinstance(value, bytes) else str(value).encode()
+            for key, value in job.to_dict().items()
+        }
+        if result is not None:
+            payload = Result(
+                job_id, Result.Type.SUCCESSFUL, None, return_value=result
+            ).serialize()
+            self.results[Result.get_key(job_id)] = [
+                (b"1-0", {k.encode(): str(v).encode() for k, v in payload.items()})
+            ]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.commands = []
+
+    def hgetall(self, key):
+        self.commands.append(self.jobs.get(key, {}))
+
+    def xrevrange(self, key, start, end, count=None):
+        self.commands.append(self.results.get(key, []))
+
+    async def execute(self):
+        return self.commands
+
+
+@pytest.fixture()
+def job_store(mocker):
+    """Job status lookups with a mocked async redis connection."""
+    mock_redis = mocker.patch("bonsai_api.redis.queue.redis")
+    mock_redis.async_connection = JobStore()
+    return mock_redis.async_connection
+
+
+async def test_job_status_include_progress(job_store):
+    """Test that progress reported by the worker is included in the job status."""
+    progress = {
+        "stage": "align",
+        "fraction": 0.0,
+        "elapsed": 2.5,
+        "stages": [
+            {"name": "merge", "elapsed": 10.1},
+            {"name": "align", "elapsed": None},
+        ],
+    }
+    job_store.add_job("job-1", "started", meta={"progress": progress})
+    info = await check_redis_job_status("job-1")
+    assert info.status == "started"
+    assert info.progress.stage == "align"
+    assert [stage.name for stage in info.progress.stages] == ["merge", "align"]
+
+    with pytest.raises(NoSuchJobError):
+        await check_redis_job_status("missing")
+
+
+async def test_check_jobs_status(job_store):
+    """Test that the results are only fetched for finished jobs."""
+    job_store.add_job("job-1", "queued")
+    job_store.add_job("job-2", "finished", result="(a:1,b:1);")
+    statuses = await check_redis_jobs_status(["job-1", "job-2", "missing"])
+    assert statuses["job-1"].status == "queued"
+    assert statuses["job-1"].result is None
+    assert statuses["job-2"].result == "(a:1,b:1);"
+    assert statuses["missing"] is None
+
+    statuses = await check_redis_jobs_status(["job-2"], include_results=False)
+    assert statuses["job-2"].status == "finished"
+    assert statuses["job-2"].result is None
+
+
+@pytest.mark.parametrize(
+    "value, spilled",
+    [
+        ("(a:1,b:1);", False),  # stored as plain pickle
+        ("(a:1,b:1);" * 1000, False),  # compressed
+        (os.urandom(4096).hex(), True),  # compressed and spilled to disk
+    ],
+)
+def test_result_serializer(value, spilled, tmp_path):
+    """Test that large results are compressed or spilled and restored."""
+    serializer = ResultSerializer(
+        result_dir=tmp_path, compress_threshold=1024, spill_threshold=4096
+    )
+    data = serializer.dumps(value)
+    assert len(data) < len(value) or len(value) < 1024
+    assert serializer.loads(data) == value
+    assert len(list(tmp_path.glob("*.bin"))) == int(spilled)
+    # values pickled by the default rq serializer can still be read
+    assert serializer.loads(pickle.dumps(value)) == value
@@ -0,0 +1,464 @@
+"""Test CRUD operations on samples."""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from bonsai_api.config import settings
+from bonsai_api.crud.errors import EntryNotFound, UpdateConflictError
+from bonsai_api.crud.sample import (
+    get_sample_fields,
+    get_samples,
+    prepare_samples,
+    update_sample_fields,
+    update_tags_of_all_samples,
+    update_variant_annotation_for_sample,
+    variant_annotation_updates,
+)
+from bonsai_api.models.base import MultipleRecordsResponseModel
+from bonsai_api.models.qc import VariantAnnotation
+from bonsai_api.models.sample import SAMPLE_VIEW_FIELDS, SampleView
+from bonsai_api.redis import SubmittedJob
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from redis.exceptions import RedisError
+
+SAMPLE_ID = "test_mtuberculosis_1"
+
+
+@pytest.fixture(autouse=True)
+def no_cache(mocker):
+    """Disable invalidation of the clustering cache."""
+    mocker.patch("bonsai_api.crud.sample.invalidate_samples")
+
+
+async def test_update_sample_fields(sample_database):
+    """Test that fields are updated if the sample has not been modified."""
+    sample = await get_sample_fields(sample_database, SAMPLE_ID, ["ska_index"])
+    assert sample["ska_index"] is None
+
+    modified_at = await update_sample_fields(
+        sample_database,
+        SAMPLE_ID,
+        set_fields={"ska_index": "/data/sample.skf"},
+        expected_modified_at=sample["modified_at"],
+    )
+    sample = await get_sample_fields(sample_database, SAMPLE_ID, ["ska_index"])
+    assert sample == {"ska_index": "/data/sample.skf", "modified_at": modified_at}
+
+    # updates based on an outdated version of the sample are rejected
+    with pytest.raises(UpdateConflictError):
+        await update_sample_fields(
+            sample_database,
+            SAMPLE_ID,
+            set_fields={"genome_signature": "job-1"},
+            expected_modified_at=modified_at.replace(year=2000),
+        )
+    with pytest.raises(EntryNotFound):
+        await update_sample_fields(
+            sample_database, "missing", set_fields={"ska_index": "/data/sample.skf"}
+        )
+
+
+async def test_update_sample_fields_expected_fields(sample_database):
+    """Test that fields are only updated if they have the expected values."""
+    await update_sample_fields(
+        sample_database,
+        SAMPLE_ID,
+        set_fields={"genome_signature": "job-1"},
+        expected_fields={"genome_signature": None},
+    )
+    with pytest.raises(UpdateConflictError):
+        await update_sample_fields(
+            sample_database,
+            SAMPLE_ID,
+            set_fields={"genome_signature": "job-2"},
+            expected_fields={"genome_signature": None},
+        )
+    sample = await get_sample_fields(sample_database, SAMPLE_ID, ["genome_signature"])
+    assert sample["genome_signature"] == "job-1"
+
+
+async def test_create_genome_signature(mocker, fastapi_client, sample_database):
+    """Test that the sample is claimed before the signature job is enqueued."""
+    add_signature = mocker.patch(
+        "bonsai_api.routers.samples.schedule_add_genome_signature",
+        side_effect=lambda sample_id, signature, job_id: SubmittedJob(
+            id=job_id, task="add_signature"
+        ),
+    )
+    mocker.patch(
+        "bonsai_api.routers.samples.schedule_add_genome_signature_to_index",
+        return_value=SubmittedJob(id="index-job", task="add_to_index"),
+    )
+
+    response = fastapi_client.post(
+        f"/samples/{SAMPLE_ID}/signature", files={"signature": b"[]"}
+    )
+    assert response.status_code == 200
+    job_id = response.json()["add_signature_job"]
+    sample = await get_sample_fields(sample_database, SAMPLE_ID, ["genome_signature"])
+    assert sample["genome_signature"] == job_id
+
+    # a signature can only be added once
+    response = fastapi_client.post(
+        f"/samples/{SAMPLE_ID}/signature", files={"signature": b"[]"}
+    )
+    assert response.status_code == 409
+    add_signature.assert_called_once()
+
+
+async def test_create_genome_signature_enqueue_failed(
+    mocker, fastapi_client, sample_database
+):
+    """Test that the claim on the sample is released if the job is not enqueued."""
+    mocker.patch(
+        "bonsai_api.routers.samples.schedule_add_genome_signature",
+        side_effect=RedisError,
+    )
+    with pytest.raises(RedisError):
+        fastapi_client.post(
+            f"/samples/{SAMPLE_ID}/signature", files={"signature": b"[]"}
+        )
+    sample = await get_sample_fields(sample_database, SAMPLE_ID, ["genome_signature"])
+    assert sample["genome_signature"] is None
+
+
+async def test_update_sample_fields_validation(sample_database):
+    """Test that only existing fields can be updated with values of the right type."""
+    with pytest.raises(ValueError, match="can not be updated"):
+        await update_sample_fields(sample_database, SAMPLE_ID, {"unknown": 1})
+    with pytest.raises(ValueError, match="can not be updated"):
+        await update_sample_fields(sample_database, SAMPLE_ID, {"sample_id": "new"})
+    with pytest.raises(ValidationError):
+        await update_sample_fields(sample_database, SAMPLE_ID, {"ska_index": [1]})
+    with pytest.raises(ValueError, match="is not a list"):
+        await update_sample_fields(
+            sample_database, SAMPLE_ID, push_fields={"ska_index": "path"}
+        )
+
+
+def test_variant_annotation_updates():
+    """Test that variants are annotated with array filters."""
+    annotation = VariantAnnotation(
+        variant_ids=["tbprofiler-1", "snv_variants-2", "tbprofiler-3"],
+        verified="passed",
+        phenotypes=["rifampicin"],
+        resistance_lvl="high",
+    )
+    modified_at = datetime(2024, 1, 1)
+    updates = variant_annotation_updates(SAMPLE_ID, annotation, "admin", modified_at)
+
+    tbprofiler_path = "element_type_result.$[res0].result.variants.$[var0]"
+    array_filters = [
+        {"res0.software": "tbprofiler"},
+        {"var0.id": {"$in": [1, 3]}},
+        {"var1.id": {"$in": [2]}},
+    ]
+    phenotype = {
+        "name": "rifampicin",
+        "group": "rifamycin",
+        "type": "AMR",
+        "resistance_level": "high",
+        "reference": [],
+        "note": None,
+        "source": None,
+        "annotation_type": "user",
+        "annotation_author": "admin",
+    }
+    # predicted phenotypes are kept and user annotations replaced
+    keep_predicted = {"annotation_type": {"$ne": "tool"}}
+    assert updates == [
+        UpdateOne(
+            {"sample_id": SAMPLE_ID},
+            {
+                "$set": {
+                    "modified_at": modified_at,
+                    f"{tbprofiler_path}.verified": "passed",
+                    f"{tbprofiler_path}.reason": None,
+                    "snv_variants.$[var1].verified": "passed",
+                    "snv_variants.$[var1].reason": None,
+                },
+                "$pull": {
+                    f"{tbprofiler_path}.phenotypes": keep_predicted,
+                    "snv_variants.$[var1].phenotypes": keep_predicted,
+                },
+            },
+            array_filters=array_filters,
+        ),
+        # only pushed if the sample was not modified after the pull
+        UpdateOne(
+            {"sample_id": SAMPLE_ID, "modified_at": modified_at},
+            {
+                "$push": {
+                    f"{tbprofiler_path}.phenotypes": {"$each": [phenotype]},
+                    "snv_variants.$[var1].phenotypes": {"$each": [phenotype]},
+                }
+            },
+            array_filters=array_filters,
+        ),
+    ]
+
+    # nothing to update
+    annotation = VariantAnnotation(variant_ids=["tbprofiler-1"])
+    assert variant_annotation_updates(SAMPLE_ID, annotation, "admin", modified_at) == []
+
+
+@pytest.mark.parametrize(
+    "matched_counts,n_writes,error",
+    [
+        ([2], 1, None),
+        ([1, 2], 2, None),  # modified between the pull and the push
+        ([1, 1, 1], 3, UpdateConflictError),
+        ([0], 1, EntryNotFound),
+    ],
+)
+async def test_update_variant_annotation(
+    sample_database, mocker, matched_counts, n_writes, error
+):
+    """Test that annotations are applied again if the sample is modified meanwhile.
+
+    mongomock does not implement array filters, so the bulk write is mocked and
+    how MongoDB applies the updates is left to the end-to-end tests.
+    """
+    bulk_write = mocker.patch.object(
+        sample_database.sample_collection,
+        "bulk_write",
+        side_effect=[
+            mocker.MagicMock(matched_count=count, modified_count=count)
+            for count in matched_counts
+        ],
+    )
+    annotation = VariantAnnotation(
+        variant_ids=["tbprofiler-1"], verified="failed", phenotypes=["rifampicin"]
+    )
+    if error is None:
+        sample = await update_variant_annotation_for_sample(
+            sample_database, SAMPLE_ID, annotation, "admin"
+        )
+        assert sample.sample_id == SAMPLE_ID
+    else:
+        with pytest.raises(error):
+            await update_variant_annotation_for_sample(
+                sample_database, SAMPLE_ID, annotation, "admin"
+            )
+    assert bulk_write.call_count == n_writes
+
+
+def test_prepare_samples(mtuberculosis_sample_path):
+    """Test that uploaded results are validated and encoded."""
+    with open(mtuberculosis_sample_path) as inpt:
+        result = json.load(inpt)
+    result.update(minhash_signature=[{"name": "sig"}], ska_index="/data/s.skf")
+    lines = [
+        json.dumps(result).encode(),
+        b'{"sample_id": "bad"}',
+        b"[]",
+        json.dumps({**result, "ska_index": 5}).encode(),
+        b'{"sample_id": 5}',
+    ]
+
+    sample, missing_fields, not_object, bad_index, bad_id = prepare_samples(lines)
+    assert sample.sample_id == SAMPLE_ID
+    assert sample.document["ska_index"] == "/data/s.skf"
+    assert "minhash_signature" not in sample.document
+    assert json.loads(sample.signature) == [{"name": "sig"}]
+    assert missing_fields.sample_id == "bad"
+    assert missing_fields.document is None and missing_fields.error
+    assert not_object.sample_id is None and not_object.error
+    assert bad_index.sample_id == SAMPLE_ID
+    assert bad_index.document is None and bad_index.error
+    assert bad_id.sample_id is None and bad_id.error
+
+
+async def test_create_samples_in_bulk(
+    mocker, fastapi_client, sample_database, mtuberculosis_sample_path
+):
+    """Test that valid samples are created and signatures are indexed in one job."""
+    with open(mtuberculosis_sample_path) as inpt:
+        result = json.load(inpt)
+    new_result = {**result, "sample_id": "new_sample", "minhash_signature": "[]"}
+    body = "\n".join(
+        [
+            json.dumps(new_result),
+            "not json",
+            "",
+            json.dumps(result),
+            json.dumps(new_result),
+        ]
+    ).encode()
+    schedule = mocker.patch(
+        "bonsai_api.routers.samples.schedule_add_genome_signatures",
+        return_value=(
+            {"new_sample": SubmittedJob(id="sig-job", task="add_signature")},
+            SubmittedJob(id="index-job", task="add_to_index"),
+        ),
+    )
+    # the existing sample and the second upload of the new sample are duplicates
+    await sample_database.sample_collection.create_index("sample_id", unique=True)
+
+    response = fastapi_client.post(
+        "/samples/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    upload = response.json()
+    assert upload["n_created"] == 1
+    assert [sample["status"] for sample in upload["samples"]] == [
+        "created",
+        "invalid",
+        "failed",
+        "failed",
+    ]
+    assert upload["samples"][2]["sample_id"] == SAMPLE_ID
+    assert upload["samples"][3]["sample_id"] == "new_sample"
+    assert upload["index_job"] == "index-job"
+    schedule.assert_called_once_with({"new_sample": b"[]"})
+
+
+async def test_create_samples_in_bulk_limits_pending_batches(mocker, fastapi_client):
+    """Test that a large upload does not validate all batches at once."""
+    mocker.patch.object(settings, "bulk_upload_batch_size", 1)
+    mocker.patch.object(settings, "bulk_upload_max_pending", 2)
+    in_flight, max_in_flight = 0, 0
+
+    async def prepare_samples(lines):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return []
+
+    prepare = mocker.patch(
+        "bonsai_api.routers.samples.prepare_samples_in_executor",
+        side_effect=prepare_samples,
+    )
+    body = "\n".join(json.dumps({"sample_id": f"s{idx}"}) for idx in range(20))
+
+    response = fastapi_client.post(
+        "/samples/bulk",
+        content=body.encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert prepare.call_count == 20
+    assert max_in_flight == 2
+
+
+async def test_update_tags_of_all_samples(sample_database):
+    """Test that tags are recomputed from the projected sample fields."""
+    collection = sample_database.sample_collection
+    await collection.update_one({"sample_id": SAMPLE_ID}, {"$set": {"tags": ["old"]}})
+    # sample without species prediction
+    await collection.insert_one({"sample_id": "no_species", "tags": ["old"]})
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        progress = [
+            counts
+            async for counts in update_tags_of_all_samples(
+                sample_database, executor, batch_size=1, max_pending=1
+            )
+        ]
+    assert progress == [(1, 0), (0, 1)]
+    sample = await collection.find_one({"sample_id": SAMPLE_ID})
+    assert sample["tags"] == []
+    sample = await collection.find_one({"sample_id": "no_species"})
+    assert sample["tags"] == ["old"]
+
+
+async def test_get_samples(sample_database):
+    """Test that samples are filtered, projected and paginated in the query."""
+    sample = await sample_database.sample_collection.find_one({}, {"_id": 0})
+    for sample_id in ["sample_2", "sample_3"]:
+        await sample_database.sample_collection.insert_one(
+            {**sample, "sample_id": sample_id}
+        )
+
+    samples = await get_samples(sample_database, include=[SAMPLE_ID, "sample_3"])
+    assert samples.records_total == 2
+    assert [samp.sample_id for samp in samples.data] == [SAMPLE_ID, "sample_3"]
+
+    samples = await get_samples(sample_database, limit=1, skip=1, fields=["sample_id"])
+    assert samples.records_total == 3
+    assert samples.data == [{"id": samples.data[0]["id"], "sample_id": "sample_2"}]
+
+
+def test_read_sample_fields(fastapi_client):
+    """Test reading a subset of the fields of a sample."""
+    full_sample = fastapi_client.get(f"/samples/{SAMPLE_ID}")
+    assert full_sample.status_code == 200
+
+    response = fastapi_client.get(f"/samples/{SAMPLE_ID}", params={"view": "igv"})
+    assert response.status_code == 200
+    sample = response.json()
+    assert set(sample) == {"id", *SAMPLE_VIEW_FIELDS[SampleView.IGV]}
+    assert sample["element_type_result"] == full_sample.json()["element_type_result"]
+    assert len(response.content) < len(full_sample.content)
+
+    response = fastapi_client.get(
+        f"/samples/{SAMPLE_ID}",
+        params={"include": ["qc", "tags"], "exclude": "tags"},
+    )
+    assert set(response.json()) == {"id", "sample_id", "qc"}
+
+    # all fields except the excluded
+    response = fastapi_client.get(
+        f"/samples/{SAMPLE_ID}", params={"exclude": "typing_result"}
+    )
+    assert "typing_result" not in response.json()
+    assert "element_type_result" in response.json()
+
+    response = fastapi_client.get(f"/samples/{SAMPLE_ID}", params={"include": "bad"})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("params", [{}, {"view": "summary"}])
+def test_trusted_read_matches_validated_read(mocker, fastapi_client, params):
+    """Test that unvalidated documents are returned as the validated sample."""
+    mocker.patch.object(settings, "trusted_reads", True)
+    trusted = fastapi_client.get(f"/samples/{SAMPLE_ID}", params=params).json()
+    mocker.patch.object(settings, "trusted_reads", False)
+    validated = fastapi_client.get(f"/samples/{SAMPLE_ID}", params=params).json()
+
+    assert trusted.pop("id") is not None
+    validated.pop("id")
+    assert trusted == validated
+
+
+@pytest.mark.parametrize(
+    "url,router", [("/samples/", "samples"), ("/groups/group-1/samples", "groups")]
+)
+def test_trusted_summary_read_matches_validated_read(
+    mocker, fastapi_client, url, router
+):
+    """Test that unvalidated sample summaries are returned as the validated ones."""
+    summary = MultipleRecordsResponseModel(
+        data=[
+            {
+                "id": "0" * 24,
+                "sample_id": SAMPLE_ID,
+                "created_at": datetime(2024, 1, 2, 3, 4, 5, 678000),
+                "species_prediction": {"scientific_name": "M. tuberculosis"},
+                "tags": [{"type": "virulence", "label": "stx2"}],
+            }
+        ],
+        records_total=1,
+    )
+    mocker.patch(
+        f"bonsai_api.routers.{router}.get_samples_summary", return_value=summary
+    )
+    mocker.patch(
+        "bonsai_api.routers.groups.get_group"
+    ).return_value.included_samples = [SAMPLE_ID]
+
+    mocker.patch.object(settings, "trusted_reads", True)
+    trusted = fastapi_client.get(url)
+    mocker.patch.object(settings, "trusted_reads", False)
+    validated = fastapi_client.get(url)
+
+    assert trusted.status_code == validated.status_code == 200
+    assert trusted.json() == validated.json()
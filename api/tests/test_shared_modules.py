@@ -0,0 +1,30 @@
+"""Test that the modules shared by the API and the worker services are identical.
+
+The services are packaged and built separately, so the modules are copied to
+each service instead of imported from a common package.
+"""
+
+import pathlib
+
+import pytest
+
+REPO_DIR = pathlib.Path(__file__).parents[2]
+SERVICES = ["allele_cluster_service", "minhash_service", "ska_service"]
+SHARED_MODULES = {
+    "serializer": [
+        REPO_DIR / "api" / "bonsai_api" / "redis" / "serializer.py",
+        *(REPO_DIR / service / service / "serializer.py" for service in SERVICES),
+    ],
+    "events": [REPO_DIR / service / service / "events.py" for service in SERVICES],
+    "progress": [REPO_DIR / service / service / "progress.py" for service in SERVICES],
+}
+
+
+@pytest.mark.parametrize("copies", SHARED_MODULES.values(), ids=SHARED_MODULES.keys())
+def test_shared_modules_are_identical(copies):
+    """Test that all copies of a shared module have the same content."""
+    if not all(path.is_file() for path in copies):
+        pytest.skip("The worker services are not in the source tree")
+    reference, *others = copies
+    for path in others:
+        assert path.read_text() == reference.read_text(), f"{path} differs"
@@ -0,0 +1,77 @@
+"""Test authentication of users."""
+
+import pytest
+from bonsai_api.config import ALGORITHM, settings
+from bonsai_api.crud import user as crud_user
+from bonsai_api.crud.user import (
+    create_user,
+    get_current_user,
+    get_role_permissions,
+    invalidate_cached_user,
+    update_user,
+)
+from bonsai_api.models.user import UserInputCreate
+from fastapi import HTTPException
+from fastapi.security import SecurityScopes
+from jose import jwt
+
+
+def test_role_permissions():
+    """Test that the permissions of multiple roles are combined."""
+    permissions = get_role_permissions(("user", "admin"))
+    assert {"samples:read", "samples:write", "users:write"} <= permissions
+    assert get_role_permissions(("unknown",)) == frozenset()
+
+
+async def test_uploader_permissions(mongo_database, mocker):
+    """Test that uploaders can create samples and groups but not read them."""
+    assert get_role_permissions(("uploader",)) == {"groups:write", "samples:write"}
+
+    user = UserInputCreate(
+        username="uploader",
+        email="uploader@example.com",
+        password="test",
+        roles=["uploader"],
+    )
+    await create_user(mongo_database, user)
+    token = jwt.encode({"sub": "uploader"}, settings.secret_key, algorithm=ALGORITHM)
+    mocker.patch.object(settings, "api_authentication", True)
+    invalidate_cached_user("uploader")
+
+    for scope in ["samples:write", "groups:write"]:
+        user = await get_current_user(SecurityScopes([scope]), token, mongo_database)
+        assert user.username == "uploader"
+    for scope in ["samples:read", "groups:read", "samples:update", "users:me"]:
+        with pytest.raises(HTTPException):
+            await get_current_user(SecurityScopes([scope]), token, mongo_database)
+
+
+async def test_authenticated_user_is_cached(mongo_database, mocker):
+    """Test that the user is only fetched from the database when not cached."""
+    user = UserInputCreate(
+        username="test", email="test@example.com", password="test", roles=["user"]
+    )
+    await create_user(mongo_database, user)
+    token = jwt.encode({"sub": "test"}, settings.secret_key, algorithm=ALGORITHM)
+    mocker.patch.object(settings, "api_authentication", True)
+    get_user = mocker.spy(crud_user, "get_user")
+    invalidate_cached_user("test")
+
+    scopes = SecurityScopes(scopes=["samples:read"])
+    first = await get_current_user(scopes, token, mongo_database)
+    second = await get_current_user(scopes, token, mongo_database)
+    assert first.username == second.username == "test"
+    assert get_user.call_count == 1
+
+    # scopes are checked for cached users
+    with pytest.raises(HTTPException):
+        await get_current_user(SecurityScopes(["users:write"]), token, mongo_database)
+
+    # updating the user invalidates the cache
+    await update_user(
+        mongo_database, "test", user.model_copy(update={"roles": ["admin"]})
+    )
+    user = await get_current_user(
+        SecurityScopes(["users:write"]), token, mongo_database
+    )
+    assert user.roles == ["admin"]
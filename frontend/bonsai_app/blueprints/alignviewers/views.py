@@ -46,7 +46,7 @@ def igv(sample_id: str, variant_id: str | None = None):
         stop(int/None): stop of the genomic interval to be displayed
     """
     token = TokenObject(**current_user.get_id())
-    sample_obj = get_sample_by_id(token, sample_id=sample_id)
+    sample_obj = get_sample_by_id(token, sample_id=sample_id, view="igv")
     # make igv tracks to display
     display_obj = controllers.make_igv_tracks(
         sample_obj,
@@ -71,13 +71,8 @@ async function clusterSamplesInBasket(element) {
         // inform user that clustering has started
         throwSmallToast(`Clustering samples: ${sampleIds.length}`, "info")
 
-        // start polling for updates
-        let result = await poll(
-            async () => fetchJobStatus(jobInfo.id),  // GET job status
-            validateJobStatus,  // validator
-            resultParser,       // parse results
-            3000                // interval time
-        )
+        // wait for the clustering to finish
+        let result = await waitForJob(jobInfo.id)
         hideSpinner(btn)
         // open dendrogram
         openGrapeTree({
@@ -42,6 +42,34 @@ function validateJobStatus(result) {
 // get result from job info object
 const resultParser = (result) => result.data.result
 
+function waitForJob(jobId, ms = 3000) {
+    // wait for job to finish using status events pushed by the api
+    // fallback to polling if the browser does not support Server-Sent Events
+    if ( typeof EventSource === 'undefined' ) {
+        return poll(async () => fetchJobStatus(jobId), validateJobStatus, resultParser, ms)
+    }
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${apiURL}/job/status/${jobId}/events`)
+        source.addEventListener('status', (event) => {
+            const jobInfo = JSON.parse(event.data)
+            console.log(`Job status: ${jobInfo.status}`)
+            if ( jobInfo.status === "finished" ) {
+                source.close()
+                resolve(jobInfo.result)
+            } else if ( ["failed", "stopped", "canceled"].includes(jobInfo.status) ) {
+                source.close()
+                reject(new Error(`Job ${jobInfo.status}`))
+            }
+        })
+        source.onerror = () => {
+            // fallback to polling if the stream could not be opened or was lost
+            source.close()
+            poll(async () => fetchJobStatus(jobId), validateJobStatus, resultParser, ms)
+                .then(resolve, reject)
+        }
+    })
+}
+
 // functions for hide/ showing spinner
 const showSpinner = (element) => {
     // show spinner and hide content
@@ -305,11 +305,15 @@ def get_samples_in_group(
 
 @api_authentication
 def get_sample_by_id(headers: CaseInsensitiveDict, **kwargs):
-    """Get sample from database by id"""
+    """Get sample from database by id.
+
+    Use view to only get a named subset of the sample fields.
+    """
     # conduct query
     sample_id = kwargs.get("sample_id")
     url = f"{settings.bonsai_api_url}/samples/{sample_id}"
-    resp = requests_get(url, headers=headers)
+    params = {} if kwargs.get("view") is None else {"view": kwargs["view"]}
+    resp = requests_get(url, headers=headers, params=params)
     current_app.logger.debug("Query API for sample %s", sample_id)
 
     resp.raise_for_status()
@@ -9,6 +9,14 @@ GENOME_SIGNATURE_DIR = getenv("DB_PATH", "/data/signature_db")
 REDIS_HOST = getenv("REDIS_HOST", "redis")
 REDIS_PORT = getenv("REDIS_PORT", "6379")
 REDIS_QUEUE = "minhash"
+# low priority queue for bulk operations, only processed when REDIS_QUEUE is empty
+REDIS_LOW_PRIORITY_QUEUE = "minhash_low"
+
+# Storage of job results, must match the configuration of the API
+RESULT_DIR = getenv("RESULT_DIR")
+RESULT_COMPRESS_THRESHOLD = int(getenv("RESULT_COMPRESS_THRESHOLD", 64 * 1024))
+RESULT_SPILL_THRESHOLD = int(getenv("RESULT_SPILL_THRESHOLD", 1024 * 1024))
+RESULT_SPILL_TTL = int(getenv("RESULT_SPILL_TTL", 24 * 60 * 60))
 
 # Logging configuration
 DICT_CONFIG = {
@@ -36,24 +36,34 @@ def to_newick(node, newick, parentdist, leaf_names) -> str:
     return newick
 
 
-def cluster_signatures(sample_ids: List[str], method: ClusterMethod):
+def cluster_signatures(sample_ids: List[str], method: ClusterMethod, progress=None):
     """Cluster multiple samples on their minhash signatures."""
 
     # load sequence signatures to memory
     siglist = []
     LOG.info("Cluster signatures with sample ids: %s", sample_ids)
-    for sample_id in sample_ids:
+    if progress is not None:
+        progress.start("load")
+    for sample_no, sample_id in enumerate(sample_ids, start=1):
         signature = read_signature(sample_id)
         siglist.extend(signature)  # append to all signatures
+        if progress is not None:
+            progress.update(sample_no / len(sample_ids))
 
     # create distance matrix
+    if progress is not None:
+        progress.start("distance")
     similarity = sourmash.compare.compare_all_pairs(
         siglist, ignore_abundance=True, n_jobs=1, return_ani=False
     )
     # cluster on similarity matrix
+    if progress is not None:
+        progress.start("linkage")
     linkage = hierarchy.linkage(similarity, method=method.value)
     tree = hierarchy.to_tree(linkage, False)
     # creae newick tree
+    if progress is not None:
+        progress.start("newick")
     labeltext = [str(item).replace(".fasta", "") for item in siglist]
     newick_tree = to_newick(tree, "", tree.dist, labeltext)
     return newick_tree
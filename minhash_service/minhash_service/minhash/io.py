@@ -138,7 +138,7 @@ def remove_signature(sample_id: str) -> bool:
     return False
 
 
-def add_signatures_to_index(sample_ids: List[str]) -> bool:
+def add_signatures_to_index(sample_ids: List[str], progress=None) -> bool:
     """Add genome signature file to sourmash index"""
 
     genome_index = get_sbt_index(check=False)
@@ -146,10 +146,14 @@ def add_signatures_to_index(sample_ids: List[str]) -> bool:
     lock = fasteners.InterProcessLock(sbt_lock_path)
     LOG.debug("Using lock: %s", sbt_lock_path)
 
+    if progress is not None:
+        progress.start("load")
     signatures = []
-    for sample_id in sample_ids:
+    for sample_no, sample_id in enumerate(sample_ids, start=1):
         signature = read_signature(sample_id)
         signatures.append(signature[0])
+        if progress is not None:
+            progress.update(sample_no / len(sample_ids))
 
     # add signature to existing index
     # acquire lock to append signatures to database
@@ -167,10 +171,16 @@ def add_signatures_to_index(sample_ids: List[str]) -> bool:
 
         # add generated signature to bloom tree
         LOG.info("Adding %d genome signatures to index", len(signatures))
-        for signature in signatures:
+        if progress is not None:
+            progress.start("index")
+        for signature_no, signature in enumerate(signatures, start=1):
             leaf = sourmash.sbtmh.SigLeaf(signature.md5sum(), signature)
             tree.add_node(leaf)
+            if progress is not None:
+                progress.update(signature_no / len(signatures))
         # save updated bloom tree
+        if progress is not None:
+            progress.start("save")
         try:
             index_path = get_sbt_index(check=False)
             tree.save(index_path)
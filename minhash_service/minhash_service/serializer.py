@@ -0,0 +1,102 @@
+"""Serializer for jobs and results that compress or spill large values.
+
+The serializer is shared by the API and the workers and must be configured
+with the same result directory in all services that spill results.
+
+Values are pickled and prefixed with a header that describes how they are
+stored.
+
+- Values smaller than compress_threshold are stored as plain pickles, which
+  is also the format of jobs created with the default rq serializer.
+- Larger values are compressed with zlib.
+- Compressed values larger than spill_threshold are written to a file in
+  result_dir, and only the file name is stored in redis.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import time
+import zlib
+from pathlib import Path
+
+LOG = logging.getLogger(__name__)
+
+COMPRESSED_HEADER = b"BNSZ"
+SPILLED_HEADER = b"BNSF"
+
+
+class ResultSerializer:
+    """Pickle serializer that compress large values and spill them to disk."""
+
+    def __init__(
+        self,
+        result_dir: str | None = None,
+        compress_threshold: int = 64 * 1024,
+        spill_threshold: int = 1024 * 1024,
+        spill_ttl: int = 24 * 60 * 60,
+    ):
+        """Setup serializer.
+
+        :param result_dir: Shared directory for large values, spilling is disabled if None
+        :param compress_threshold: Compress values larger than this, in bytes
+        :param spill_threshold: Spill compressed values larger than this, in bytes
+        :param spill_ttl: Remove spilled files older than this, in seconds
+        """
+        self.result_dir = None if result_dir is None else Path(result_dir)
+        self.compress_threshold = compress_threshold
+        self.spill_threshold = spill_threshold
+        self.spill_ttl = spill_ttl
+        self._last_cleanup = 0.0
+
+    def dumps(self, obj, *args, **kwargs) -> bytes:
+        """Serialize object."""
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) < self.compress_threshold:
+            return data
+        data = COMPRESSED_HEADER + zlib.compress(data)
+        if self.result_dir is None or len(data) < self.spill_threshold:
+            return data
+        return SPILLED_HEADER + self._spill(data).encode("utf-8")
+
+    def loads(self, data: bytes, *args, **kwargs):
+        """Deserialize object."""
+        if data.startswith(SPILLED_HEADER):
+            file_name = data[len(SPILLED_HEADER) :].decode("utf-8")
+            data = self._result_path(file_name).read_bytes()
+        if data.startswith(COMPRESSED_HEADER):
+            data = zlib.decompress(data[len(COMPRESSED_HEADER) :])
+        return pickle.loads(data)
+
+    def _result_path(self, file_name: str) -> Path:
+        if self.result_dir is None:
+            raise ValueError("Cannot load spilled value, result directory is not set")
+        return self.result_dir / file_name
+
+    def _spill(self, data: bytes) -> str:
+        """Write data to a file in the result directory and return the file name."""
+        file_name = f"{hashlib.sha256(data).hexdigest()}.bin"
+        path = self._result_path(file_name)
+        if not path.exists():
+            # write to temporary file first to not expose partial files
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+        else:
+            path.touch()
+        self._remove_expired()
+        return file_name
+
+    def _remove_expired(self):
+        """Remove spilled files that are older than the spill ttl, at most once per hour."""
+        now = time.time()
+        if now - self._last_cleanup < min(self.spill_ttl, 60 * 60):
+            return
+        self._last_cleanup = now
+        for path in self.result_dir.glob("*.bin"):
+            try:
+                if now - path.stat().st_mtime > self.spill_ttl:
+                    path.unlink()
+            except FileNotFoundError:
+                pass  # removed by another process
@@ -7,6 +7,7 @@ from .minhash.io import add_signatures_to_index
 from .minhash.io import remove_signature as remove_signature_file
 from .minhash.io import remove_signatures_from_index, write_signature
 from .minhash.similarity import SimilarSignatures, get_similar_signatures
+from .progress import JobProgress
 
 LOG = logging.getLogger(__name__)
 
@@ -48,7 +49,9 @@ def add_to_index(sample_ids: List[str]) -> str:
     :rtype: str
     """
     LOG.info("Indexing signatures...")
-    res = add_signatures_to_index(sample_ids)
+    progress = JobProgress()
+    res = add_signatures_to_index(sample_ids, progress=progress)
+    progress.finish()
     signatures = ", ".join(list(sample_ids))
     if res:
         msg = f"Appended {signatures}"
@@ -122,7 +125,9 @@ def cluster(sample_ids: List[str], cluster_method: str = "single") -> str:
         LOG.error(msg)
         raise ValueError(msg) from error
     # cluster
-    newick: str = cluster_signatures(sample_ids, method)
+    progress = JobProgress()
+    newick: str = cluster_signatures(sample_ids, method, progress=progress)
+    progress.finish()
     return newick
 
 
@@ -152,6 +157,8 @@ def find_similar_and_cluster(
         msg = f'"{cluster_method}" is not a valid cluster method'
         LOG.error(msg)
         raise ValueError(msg) from error
+    progress = JobProgress()
+    progress.start("search")
     sample_ids = get_similar_signatures(
         sample_id, min_similarity=min_similarity, limit=limit
     )
@@ -159,7 +166,11 @@ def find_similar_and_cluster(
     # if 1 or 0 samples were found, return emtpy newick
     if len(sample_ids) < 2:
         LOG.warning("Invalid number of samples found, %d", len(sample_ids))
+        progress.finish()
         return "()"
     # cluster samples
-    newick: str = cluster_signatures([sid.sample_id for sid in sample_ids], method)
+    newick: str = cluster_signatures(
+        [sid.sample_id for sid in sample_ids], method, progress=progress
+    )
+    progress.finish()
     return newick
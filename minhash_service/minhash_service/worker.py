@@ -1,4 +1,5 @@
 """Service entrypoint for minhash service."""
+
 import logging
 from logging.config import dictConfig
 
@@ -6,10 +7,24 @@ from redis import Redis
 from rq import Connection, Queue, Worker
 
 from . import config
+from .events import PublishingWorkerMixin
+from .serializer import ResultSerializer
 
 dictConfig(config.DICT_CONFIG)
 LOG = logging.getLogger(__name__)
 
+# serializer of jobs and results, must be the same as the API use
+serializer = ResultSerializer(
+    result_dir=config.RESULT_DIR,
+    compress_threshold=config.RESULT_COMPRESS_THRESHOLD,
+    spill_threshold=config.RESULT_SPILL_THRESHOLD,
+    spill_ttl=config.RESULT_SPILL_TTL,
+)
+
+
+class PublishingWorker(PublishingWorkerMixin, Worker):
+    """Worker that publish job status transitions with redis pub/sub."""
+
 
 def create_app():
     """Start a new worker instance."""
@@ -20,6 +35,10 @@ def create_app():
     # start worker with json serializer
     LOG.info("Starting worker...")
     with Connection(redis):
-        queue = Queue(config.REDIS_QUEUE)
-        worker = Worker([queue], connection=redis)
+        # the worker drains the queues in order
+        queues = [
+            Queue(config.REDIS_QUEUE, serializer=serializer),
+            Queue(config.REDIS_LOW_PRIORITY_QUEUE, serializer=serializer),
+        ]
+        worker = PublishingWorker(queues, connection=redis, serializer=serializer)
         worker.work()
@@ -1,20 +1,25 @@
 #! /usr/bin/env python
 """Upload sample to Bonsai."""
+import gzip
 import json
-from functools import wraps
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import TextIOWrapper
 from pathlib import Path
-from typing import Callable
 
 import click
 import requests
 import yaml
 from pydantic import BaseModel, Field, FilePath, ValidationError
+from requests.adapters import HTTPAdapter
 from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
 
 USER_ENV = "BONSAI_USER"
 PASSWD_ENV = "BONSAI_PASSWD"
-TIMEOUT = 10
+TIMEOUT = 60
+CHECKPOINT_FILE = ".bonsai_upload_checkpoint"
+CONFIG_PATTERNS = ("*.yaml", "*.yml")
 
 
 class SampleConfig(BaseModel):
@@ -45,7 +50,7 @@ class ExecutionContext(BaseModel):
     username: str
     password: str
     api_url: str
-    token: TokenObject | None = None
+    timeout: float = TIMEOUT
 
 
 def _rel_to_abs_path(path: Path | str, base_path: Path) -> Path:
@@ -76,17 +81,17 @@ def process_input_config(config_file: TextIOWrapper) -> SampleConfig:
     )
 
 
-def get_auth_token(ctx: ExecutionContext) -> TokenObject:
+def get_auth_token(ctx: ExecutionContext, session: requests.Session) -> TokenObject:
     """Get authentication token from api"""
     # configure header
     headers: CaseInsensitiveDict[str] = CaseInsensitiveDict()
     headers["Content-Type"] = "application/x-www-form-urlencoded"
     url = f"{ctx.api_url}/token"
-    resp = requests.post(
+    resp = session.post(
         url,
         data={"username": ctx.username, "password": ctx.password},
         headers=headers,
-        timeout=TIMEOUT,
+        timeout=ctx.timeout,
     )
     # controll that request
     resp.raise_for_status()
@@ -95,105 +100,112 @@ def get_auth_token(ctx: ExecutionContext) -> TokenObject:
     return token_obj
 
 
-def api_authentication(func: Callable) -> Callable:
-    """Use authentication token for api.
+class ApiClient:
+    """Authenticated connection pool to the Bonsai API that is shared between threads.
 
-    :param func: API function to wrap with API auth headers
-    :type func: Callable
-    :return: Wrapped API function
-    :rtype: Callable
+    Failed connections and gateway errors are retried with a backoff and the
+    authentication token is renewed once if it has expired.
     """
 
-    @wraps(func)
-    def wrapper(token_obj: TokenObject, *args, **kwargs) -> Callable:
-        """Add authentication headers to API requests.
-
-        :param token_obj: Auth token object
-        :type token_obj: TokenObject
-        :return: Wrapped API call function
-        :rtype: Callable
+    def __init__(self, ctx: ExecutionContext, pool_size: int = 1, retries: int = 3):
+        self.ctx = ctx
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=1,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+            # repeated requests are rejected with 409 by the API
+            allowed_methods=None,
+        )
+        adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.token: TokenObject | None = None
+        self._token_lock = threading.Lock()
+
+    def login(self, expired_token: TokenObject | None = None) -> None:
+        """Get a new authentication token unless another thread already has."""
+        with self._token_lock:
+            if self.token is expired_token:
+                self.token = get_auth_token(self.ctx, self.session)
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send an authenticated request to the API.
+
+        :raises requests.exceptions.HTTPError: if the API returned an error
         """
+        token = self.token
+        resp = self.session.request(
+            method,
+            f"{self.ctx.api_url}{path}",
+            headers=self._headers(token),
+            timeout=self.ctx.timeout,
+            **kwargs,
+        )
+        if resp.status_code == 401:
+            # token has expired
+            self.login(expired_token=token)
+            resp = self.session.request(
+                method,
+                f"{self.ctx.api_url}{path}",
+                headers=self._headers(self.token),
+                timeout=self.ctx.timeout,
+                **kwargs,
+            )
+        resp.raise_for_status()
+        return resp
+
+    @staticmethod
+    def _headers(token: TokenObject | None) -> CaseInsensitiveDict:
+        """Add authentication headers to API requests."""
         headers: CaseInsensitiveDict[str] = CaseInsensitiveDict()
         headers["Accept"] = "application/json"
-        headers["Authorization"] = f"{token_obj.type.capitalize()} {token_obj.token}"
-
-        return func(headers=headers, *args, **kwargs)
+        if token is not None:
+            headers["Authorization"] = f"{token.type.capitalize()} {token.token}"
+        return headers
 
-    return wrapper
 
-
-@api_authentication
-def upload_sample_result(
-    headers: CaseInsensitiveDict, ctx: ExecutionContext, cnf: SampleConfig
-) -> str:
+def upload_sample_result(client: ApiClient, sample_obj: dict) -> str:
     """Create a new sample."""
-    sample_obj = json.load(cnf.prp_result.open())
-    resp = requests.post(
-        f"{ctx.api_url}/samples/", headers=headers, json=sample_obj, timeout=TIMEOUT
-    )
-
-    resp.raise_for_status()
+    resp = client.request("POST", "/samples/", json=sample_obj)
     resp_data = resp.json()
     return resp_data["sample_id"]
 
 
-@api_authentication
-def upload_signature(
-    headers: CaseInsensitiveDict,
-    ctx: ExecutionContext,
-    cnf: SampleConfig,
-    sample_id: str,
-) -> str:
+def compress_signature(signature_path: Path) -> bytes:
+    """Read a signature file and gzip it unless it is already compressed."""
+    signature = signature_path.read_bytes()
+    if signature[:2] == b"\x1f\x8b":
+        return signature
+    return gzip.compress(signature)
+
+
+def upload_signature(client: ApiClient, cnf: SampleConfig, sample_id: str) -> str:
     """Upload a genome signature to sample."""
-    resp = requests.post(
-        f"{ctx.api_url}/samples/{sample_id}/signature",
-        headers=headers,
-        files={"signature": cnf.minhash_signature.open()},
-        timeout=TIMEOUT,
+    signature = compress_signature(cnf.minhash_signature)
+    resp = client.request(
+        "POST",
+        f"/samples/{sample_id}/signature",
+        files={"signature": (f"{cnf.minhash_signature.name}.gz", signature)},
     )
-
-    resp.raise_for_status()
     return resp.json()
 
 
-@api_authentication
-def add_ska_index(
-    headers: CaseInsensitiveDict,
-    ctx: ExecutionContext,
-    cnf: SampleConfig,
-    sample_id: str,
-) -> str:
+def add_ska_index(client: ApiClient, cnf: SampleConfig, sample_id: str) -> str:
     """Upload a genome signature to sample."""
     params: dict[str, str] = {"index": str(cnf.ska_index)}
-    resp = requests.post(
-        f"{ctx.api_url}/samples/{sample_id}/ska_index",
-        headers=headers,
-        params=params,
-        timeout=TIMEOUT,
-    )
-
-    resp.raise_for_status()
+    resp = client.request("POST", f"/samples/{sample_id}/ska_index", params=params)
     return resp.json()
 
 
-@api_authentication
-def add_sample_to_group(
-    headers: CaseInsensitiveDict,
-    ctx: ExecutionContext,
-    cnf: SampleConfig,
-    sample_id: str,
-) -> str:
+def add_sample_to_group(client: ApiClient, cnf: SampleConfig, sample_id: str) -> None:
     """Add sample to a group."""
-    resp = requests.put(
-        f"{ctx.api_url}/groups/{cnf.group_id}/sample",
-        headers=headers,
-        params={"sample_id": sample_id},
-        timeout=TIMEOUT,
+    # responds with 304 if the sample is already in the group
+    client.request(
+        "PUT", f"/groups/{cnf.group_id}/sample", params={"sample_id": sample_id}
     )
 
-    resp.raise_for_status()
-    return resp.json()
-
 
 def _process_generic_status_codes(error, sample_id):
     """Process generic http status codes."""
@@ -209,23 +221,21 @@ def _process_generic_status_codes(error, sample_id):
     return msg, is_major_error
 
 
-def upload_sample(ctx: ExecutionContext, cnf: SampleConfig) -> str:
+def upload_sample(client: ApiClient, cnf: SampleConfig) -> str:
     """Upload a sample with files for clustring."""
+    sample_obj = json.loads(cnf.prp_result.read_bytes())
+    sample_id = sample_obj.get("sample_id")
     try:
-        sample_id = upload_sample_result(  # pylint: disable=no-value-for-parameter
-            token_obj=ctx.token, ctx=ctx, cnf=cnf
-        )
+        sample_id = upload_sample_result(client, sample_obj)
     except requests.exceptions.HTTPError as error:
         if error.response.status_code == 409:
-            click.secho("Sample have already been uploaded", fg="yellow")
+            click.secho(f"Sample {sample_id} have already been uploaded", fg="yellow")
         else:
             msg, _ = _process_generic_status_codes(error, "")
             raise click.UsageError(msg) from error
     # upload minhash signature to sample
     try:
-        upload_signature(  # pylint: disable=no-value-for-parameter
-            token_obj=ctx.token, ctx=ctx, sample_id=sample_id, cnf=cnf
-        )
+        upload_signature(client, cnf, sample_id)
     except requests.exceptions.HTTPError as error:
         if error.response.status_code == 409:
             click.secho(
@@ -238,9 +248,7 @@ def upload_sample(ctx: ExecutionContext, cnf: SampleConfig) -> str:
     # add ska index path to sample
     if cnf.ska_index is not None:
         try:
-            add_ska_index(  # pylint: disable=no-value-for-parameter
-                token_obj=ctx.token, ctx=ctx, sample_id=sample_id, cnf=cnf
-            )
+            add_ska_index(client, cnf, sample_id)
         except requests.exceptions.HTTPError as error:
             if error.response.status_code == 409:
                 click.secho(
@@ -250,9 +258,101 @@ def upload_sample(ctx: ExecutionContext, cnf: SampleConfig) -> str:
             else:
                 msg, _ = _process_generic_status_codes(error, sample_id)
                 raise click.UsageError(msg) from error
+    # add sample to group if it was assigned one.
+    if cnf.assinged_to_group():
+        try:
+            add_sample_to_group(client, cnf, sample_id)
+        except requests.exceptions.HTTPError as error:
+            match error.response.status_code:
+                case 404:
+                    msg = f"Group with id {cnf.group_id} is not in Bonsai"
+                case 500:
+                    msg = "An unexpected error occured in Bonsai, check bonsai api logs"
+                case _:
+                    msg = f"An unknown error occurred; {str(error)}"
+            # raise error and abort execution
+            raise click.UsageError(msg) from error
     return sample_id
 
 
+def read_config(config_path: Path) -> SampleConfig:
+    """Read and validate an upload config file."""
+    try:
+        with config_path.open() as config_file:
+            return process_input_config(config_file)
+    except ValidationError as err:
+        err_json = json.loads(err.json())[0]
+        err_msg = f"Input config file {config_path} is invalid.\n{err_json['msg']}: {err_json['input']}"
+        raise click.BadArgumentUsage(err_msg) from err
+
+
+class Checkpoint:
+    """Record of uploaded sample configs used to resume an interrupted batch."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: set[str] = set()
+        if path.exists():
+            self.done = set(path.read_text().splitlines())
+        self._lock = threading.Lock()
+
+    def __contains__(self, config_path: Path) -> bool:
+        return str(config_path) in self.done
+
+    def add(self, config_path: Path) -> None:
+        """Mark a config as uploaded, written immediately to survive crashes."""
+        with self._lock, self.path.open("a") as outp:
+            outp.write(f"{config_path}\n")
+            self.done.add(str(config_path))
+
+
+def find_sample_configs(batch_dir: Path) -> list[Path]:
+    """Find all sample configs in a directory and its subdirectories."""
+    configs = {path for pattern in CONFIG_PATTERNS for path in batch_dir.rglob(pattern)}
+    return sorted(path.resolve() for path in configs)
+
+
+def upload_batch(
+    client: ApiClient, batch_dir: Path, checkpoint: Checkpoint, workers: int
+) -> int:
+    """Upload all samples in a directory with a bounded number of parallel uploads.
+
+    Uploaded samples are recorded in the checkpoint and skipped when the batch
+    is rerun.
+
+    :return: Number of samples that could not be uploaded
+    :rtype: int
+    """
+    all_configs = find_sample_configs(batch_dir)
+    configs = [path for path in all_configs if path not in checkpoint]
+    n_skipped = len(all_configs) - len(configs)
+    click.secho(
+        f"Uploading {len(configs)} samples, {n_skipped} already uploaded", fg="green"
+    )
+
+    def _upload(config_path: Path) -> str:
+        sample_id = upload_sample(client, read_config(config_path))
+        checkpoint.add(config_path)
+        return sample_id
+
+    n_failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_upload, path): path for path in configs}
+        for future in as_completed(futures):
+            config_path = futures[future]
+            try:
+                sample_id = future.result()
+            except click.ClickException as err:
+                n_failed += 1
+                click.secho(f"Failed to upload {config_path}: {err.message}", fg="red")
+            except requests.exceptions.RequestException as err:
+                n_failed += 1
+                click.secho(f"Failed to upload {config_path}: {err}", fg="red")
+            else:
+                click.echo(f"Uploaded {sample_id}")
+    return n_failed
+
+
 @click.command()
 @click.option("-a", "--api", required=True, type=str, help="Upload configuration")
 @click.option("-u", "--user", envvar=USER_ENV, type=str, help="Username")
@@ -261,12 +361,31 @@ def upload_sample(ctx: ExecutionContext, cnf: SampleConfig) -> str:
     "-i",
     "--input",
     "sample_conf",
-    required=True,
     type=click.File(),
     help="Upload configuration",
 )
-def cli(api, user, password, sample_conf):
-    """Upload a sample to Bonsai"""
+@click.option(
+    "-b",
+    "--batch",
+    "batch_dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Upload all sample configurations in a directory",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help=f"Record of uploaded samples, default {CHECKPOINT_FILE} in the batch directory",
+)
+@click.option(
+    "-w", "--workers", default=4, show_default=True, help="Parallel uploads in batch"
+)
+@click.option(
+    "--timeout", default=TIMEOUT, show_default=True, help="Request timeout, seconds"
+)
+def cli(
+    api, user, password, sample_conf, batch_dir, checkpoint, workers, timeout
+):  # pylint: disable=too-many-arguments
+    """Upload a sample, or a batch of samples, to Bonsai"""
     if user is None:
         raise click.BadOptionUsage(
             "user",
@@ -277,46 +396,42 @@ def cli(api, user, password, sample_conf):
             "password",
             f"No username set. Use either the --password option or env variable {PASSWD_ENV}",
         )
+    if (sample_conf is None) == (batch_dir is None):
+        raise click.UsageError("Use either the --input or the --batch option")
 
     # read upload config and verify content
-    try:
-        cnf: SampleConfig = process_input_config(sample_conf)
-    except ValidationError as err:
-        err_json = json.loads(err.json())[0]
-        err_msg = (
-            f"Input config file is invalid.\n{err_json['msg']}: {err_json['input']}"
-        )
-        raise click.BadArgumentUsage(err_msg)
+    if sample_conf is not None:
+        try:
+            cnf: SampleConfig = process_input_config(sample_conf)
+        except ValidationError as err:
+            err_json = json.loads(err.json())[0]
+            err_msg = (
+                f"Input config file is invalid.\n{err_json['msg']}: {err_json['input']}"
+            )
+            raise click.BadArgumentUsage(err_msg)
 
     # login
-    ctx = ExecutionContext(username=user, password=password, api_url=api)
-    # add token if
+    ctx = ExecutionContext(
+        username=user, password=password, api_url=api, timeout=timeout
+    )
+    client = ApiClient(ctx, pool_size=workers)
     try:
-        token = get_auth_token(ctx)
-    except ValueError as error:
+        client.login()
+    except (ValueError, requests.exceptions.HTTPError) as error:
         raise click.UsageError(str(error)) from error
 
-    # add token to ctx
-    ctx = ctx.model_copy(update={"token": token})
-    # upload sample
-    sample_id = upload_sample(ctx=ctx, cnf=cnf)
-    # add sample to group if it was assigned one.
-    if cnf.assinged_to_group():
-        try:
-            add_sample_to_group(  # pylint: disable=no-value-for-parameter
-                token_obj=ctx.token, ctx=ctx, cnf=cnf, sample_id=sample_id
+    if batch_dir is not None:
+        checkpoint = Checkpoint(checkpoint or batch_dir / CHECKPOINT_FILE)
+        n_failed = upload_batch(client, batch_dir, checkpoint, workers)
+        if n_failed > 0:
+            raise click.ClickException(
+                f"{n_failed} samples failed, rerun the command to resume the upload"
             )
-        except requests.exceptions.HTTPError as error:
-            match error.response.status_code:
-                case 404:
-                    msg = f"Group with id {cnf.group_id} is not in Bonsai"
-                case 500:
-                    msg = "An unexpected error occured in Bonsai, check bonsai api logs"
-                case _:
-                    msg = f"An unknown error occurred; {str(error)}"
-            # raise error and abort execution
-            raise click.UsageError(msg) from error
+        click.secho("All samples uploaded", fg="green")
+        return
 
+    # upload sample
+    upload_sample(client, cnf)
     # exit script
     click.secho("Sample uploaded", fg="green")
 
@@ -22,6 +22,12 @@ class Settings(BaseSettings):
     redis_host: str = "redis"
     redis_port: int = 6379
     redis_queue: str = "ska"
+    redis_low_priority_queue: str = "ska_low"
+    # storage of job results, must match the configuration of the API
+    result_dir: str | None = None
+    result_compress_threshold: int = 64 * 1024  # bytes
+    result_spill_threshold: int = 1024 * 1024  # bytes
+    result_spill_ttl: int = 24 * 60 * 60  # seconds
     # logging
     log_level: LogLevel = LogLevel.INFO
 
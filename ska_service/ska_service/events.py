@@ -0,0 +1,34 @@
+"""Publish job events with redis pub/sub.
+
+The API subscribes to the channel of a job to push updates to clients. This
+module is identical in all worker services.
+"""
+
+import json
+
+# channel where job events are published
+JOB_EVENTS_CHANNEL = "bonsai:job:{}"
+
+
+def publish_job_status(connection, job, **fields):
+    """Publish the current status of a job, with optional extra fields."""
+    message = json.dumps(
+        {"id": job.id, "status": job.get_status(refresh=False), **fields}
+    )
+    connection.publish(JOB_EVENTS_CHANNEL.format(job.id), message)
+
+
+class PublishingWorkerMixin:
+    """Publish job status transitions of a rq worker."""
+
+    def prepare_job_execution(self, job, *args, **kwargs):
+        super().prepare_job_execution(job, *args, **kwargs)
+        publish_job_status(self.connection, job)
+
+    def handle_job_success(self, job, *args, **kwargs):
+        super().handle_job_success(job, *args, **kwargs)
+        publish_job_status(self.connection, job)
+
+    def handle_job_failure(self, job, *args, **kwargs):
+        super().handle_job_failure(job, *args, **kwargs)
+        publish_job_status(self.connection, job)
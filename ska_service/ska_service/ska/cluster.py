@@ -46,22 +46,29 @@ def to_newick(node: hierarchy.ClusterNode, newick: str, parent_dist: float, leaf
     return newick
 
 
-def calc_snv_distance(aln: MultipleSeqAlignment) -> DistanceMatrix:
+def calc_snv_distance(aln: MultipleSeqAlignment, progress=None) -> DistanceMatrix:
     """Calculate pair-wise sample distance from aligned fasta sequences."""
     dm = DistanceMatrix(names=[al.name for al in aln])
-    for seq1, seq2 in itertools.combinations(aln, 2):
+    n_pairs = len(aln) * (len(aln) - 1) // 2
+    for pair_no, (seq1, seq2) in enumerate(itertools.combinations(aln, 2), start=1):
         n_missing = sum(a_seq != b_seq for a_seq, b_seq in zip(seq1, seq2) if not any([a_seq == '-', b_seq == '-']))
         dm[seq1.name, seq2.name] = n_missing
+        if progress is not None:
+            progress.update(pair_no / n_pairs)
     return dm
 
 
 
 
-def cluster_distances(dm: DistanceMatrix, method: ClusterMethod) -> str:
+def cluster_distances(dm: DistanceMatrix, method: ClusterMethod, progress=None) -> str:
     """Cluster two or more samples from a distance matrix."""
 
+    if progress is not None:
+        progress.start("linkage")
     linkage = hierarchy.linkage(dm.to_condensed(), method=method.value)
     tree = hierarchy.to_tree(linkage, False)
 
+    if progress is not None:
+        progress.start("newick")
     newick_tree = to_newick(tree, "", tree.dist, dm.names)
     return newick_tree
\ No newline at end of file
@@ -9,6 +9,7 @@ from Bio import AlignIO
 
 from . import ska
 from .config import settings
+from .progress import JobProgress
 from .ska.cluster import ClusterMethod, calc_snv_distance
 
 LOG = logging.getLogger(__name__)
@@ -37,18 +38,23 @@ def cluster(indexes: Sequence[Dict[str, str]], cluster_method: str = "single") -
         LOG.error(msg)
         raise ValueError(msg) from error
 
+    progress = JobProgress()
     with TemporaryDirectory() as tmp_dir:
         # merge indexes into a single file
+        progress.start("merge")
         merged_index = ska.merge(idx_paths, output=Path(tmp_dir).joinpath("merged.skf"))
 
         # align variants and return as multi fasta
+        progress.start("align")
         aln_file = ska.align(merged_index, filter_ambig=True, filter_constant=True)
 
         # calculate distance between samples from alignment and cluster
+        progress.start("distance")
         with open(aln_file) as inpt:
             aln = AlignIO.read(inpt, 'fasta')
-        dm = calc_snv_distance(aln)
-        nwk = ska.cluster_distances(dm, method)
+        dm = calc_snv_distance(aln, progress=progress)
+        nwk = ska.cluster_distances(dm, method, progress=progress)
+    progress.finish()
     return nwk
 
 
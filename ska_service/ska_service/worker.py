@@ -7,6 +7,8 @@ from redis import Redis
 from rq import Connection, Queue, Worker
 
 from .config import settings
+from .events import PublishingWorkerMixin
+from .serializer import ResultSerializer
 
 # Logging configuration
 DICT_CONFIG = {
@@ -37,6 +39,18 @@ DICT_CONFIG = {
 dictConfig(DICT_CONFIG)
 LOG = logging.getLogger(__name__)
 
+# serializer of jobs and results, must be the same as the API use
+serializer = ResultSerializer(
+    result_dir=settings.result_dir,
+    compress_threshold=settings.result_compress_threshold,
+    spill_threshold=settings.result_spill_threshold,
+    spill_ttl=settings.result_spill_ttl,
+)
+
+
+class PublishingWorker(PublishingWorkerMixin, Worker):
+    """Worker that publish job status transitions with redis pub/sub."""
+
 
 def create_app():
     """Start a new worker instance."""
@@ -47,6 +61,10 @@ def create_app():
     # start worker with json serializer
     LOG.info("Starting worker...")
     with Connection(redis):
-        queue = Queue(settings.redis_queue)
-        worker = Worker([queue], connection=redis)
+        # the worker drains the queues in order
+        queues = [
+            Queue(settings.redis_queue, serializer=serializer),
+            Queue(settings.redis_low_priority_queue, serializer=serializer),
+        ]
+        worker = PublishingWorker(queues, connection=redis, serializer=serializer)
         worker.work()